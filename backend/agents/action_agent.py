@@ -1,6 +1,7 @@
 from typing import Dict
 from backend.config import Config
 from ..agents.error_handler import ErrorHandler
+from ..utils.metrics import timed_stage
 from ..utils.logging_utils import setup_logging
 import logging
 
@@ -15,6 +16,7 @@ class ActionRecommenderAgent:
     def __init__(self):
         self.error_handler = ErrorHandler()
     
+    @timed_stage("action")
     def recommend_action(self, classification: Dict, reasoning: Dict) -> Dict:
         """
         Recommend a moderation action based on the classification label and confidence.
@@ -1,6 +1,7 @@
 import logging
 from typing import Dict, Any
 import traceback
+from ..utils.metrics import AGENT_ERRORS
 from ..utils.logging_utils import setup_logging
 import logging
 
@@ -30,10 +31,15 @@ class ErrorHandler:
             "TimeoutError": "The request timed out. Please try again.",
             "JSONDecodeError": "Invalid response format. Please try again.",
             "KeyError": "Missing required data in response.",
-            "ValueError": "Invalid input provided."
+            "ValueError": "Invalid input provided.",
+            "RateLimitError": "The AI service is busy. Please try again shortly.",
+            "RateLimitExceeded": "The AI service is busy. Please try again shortly.",
+            "APITimeoutError": "The request timed out. Please try again.",
+            "APIConnectionError": "Unable to connect to the AI service. Please try again later."
         }
         
         error_type = type(error).__name__
+        AGENT_ERRORS.inc(agent=context.split(".")[0], error_type=error_type)
         user_message = error_mappings.get(error_type, "An unexpected error occurred. Please try again.")
         
         return {
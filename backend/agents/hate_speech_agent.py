@@ -1,7 +1,11 @@
-from openai import AzureOpenAI
-from typing import Dict, Tuple
+from typing import Dict, List, Optional, Tuple
 from backend.config import Config
 from ..agents.error_handler import ErrorHandler
+from ..utils.llm_gateway import get_llm_gateway
+from ..agents.prefilter_agent import PreFilterAgent
+from ..utils.cache_utils import ClassificationCache
+from ..utils.metrics import AGENT_ERRORS, timed_stage
+import asyncio
 import json
 import logging
 import traceback
@@ -18,20 +22,181 @@ class HateSpeechDetectionAgent:
     Agent for classifying text as Hate, Toxic, Offensive, Neutral, or Ambiguous using Azure OpenAI.
     """
     def __init__(self):
-        self.client = AzureOpenAI(
-            api_key=Config.DIAL_API_KEY,
-            api_version=Config.DIAL_API_VERSION,
-            azure_endpoint=Config.DIAL_ENDPOINT
-        )
+        # Shared, pooled clients; calls go through the gateway for concurrency limits and retries
+        self.gateway = get_llm_gateway()
+        self.client = self.gateway.client
+        self.async_client = self.gateway.async_client
         self.error_handler = ErrorHandler()
+        self.cache = ClassificationCache() if Config.CLASSIFICATION_CACHE_ENABLED else None
+        self.prefilter = PreFilterAgent() if Config.PREFILTER_ENABLED else None
     
+    @timed_stage("classification")
     def classify_text(self, text: str) -> dict:
         """
         Classify text and return label, confidence, and explanation.
         Uses a prompt to instruct the LLM to return a JSON response.
+        Results for previously seen texts are served from the classification cache, and
+        confidently neutral texts are answered by the pre-filter when it is enabled.
         """
+        cached = self._precheck(text)
+        if cached is not None:
+            return cached
         try:
-            prompt = f"""
+            response = self.gateway.chat_completion(
+                model=Config.DEPLOYMENT_NAME,
+                temperature=0.1,
+                messages=self._build_messages(text)
+            )
+            return self._cache_set(text, self._parse_response(response))
+        except Exception as e:
+            return self._handle_exception(e)
+
+    @timed_stage("classification")
+    async def aclassify_text(self, text: str) -> dict:
+        """
+        Async variant of classify_text using the AsyncAzureOpenAI client.
+        Does not block the event loop while waiting for the LLM.
+        """
+        cached = await self._aprecheck(text)
+        if cached is not None:
+            return cached
+        try:
+            response = await self.gateway.achat_completion(
+                model=Config.DEPLOYMENT_NAME,
+                temperature=0.1,
+                messages=self._build_messages(text)
+            )
+            return await self._acache_set(text, self._parse_response(response))
+        except Exception as e:
+            return self._handle_exception(e)
+
+    @timed_stage("classification")
+    def classify_and_expand(self, text: str) -> dict:
+        """
+        Classify text and generate policy search keywords in a single structured completion.
+        Returns the classify_text result plus a "keywords" list used for retrieval.
+        Results are cached apart from classify_text's, so a cache hit carries keywords too;
+        only texts answered by the pre-filter come back without them.
+        """
+        cached = self._precheck(text, mode="fused")
+        if cached is not None:
+            return cached
+        try:
+            response = self.gateway.chat_completion(
+                model=Config.DEPLOYMENT_NAME,
+                temperature=0.1,
+                response_format={"type": "json_object"},
+                messages=self._build_fused_messages(text)
+            )
+            return self._cache_set(text, self._parse_response(response), mode="fused")
+        except Exception as e:
+            return self._handle_exception(e)
+
+    @timed_stage("classification")
+    async def aclassify_and_expand(self, text: str) -> dict:
+        """
+        Async variant of classify_and_expand.
+        """
+        cached = await self._aprecheck(text, mode="fused")
+        if cached is not None:
+            return cached
+        try:
+            response = await self.gateway.achat_completion(
+                model=Config.DEPLOYMENT_NAME,
+                temperature=0.1,
+                response_format={"type": "json_object"},
+                messages=self._build_fused_messages(text)
+            )
+            return await self._acache_set(text, self._parse_response(response), mode="fused")
+        except Exception as e:
+            return self._handle_exception(e)
+
+    @timed_stage("classification_batch")
+    def classify_batch(self, texts: List[str], mode: str = "standard") -> List[dict]:
+        """
+        Classify many short texts, packing up to CLASSIFICATION_BATCH_SIZE of them into one prompt.
+        Returns one result per input text, in order. Texts that are too long to pack, or whose
+        entry in the batched response is missing or malformed, fall back to classify_text.
+        With mode="fused" every result also carries retrieval keywords, as from classify_and_expand.
+        """
+        results = [self._precheck(text, mode) for text in texts]
+        packable, single = self._split_packable(texts, results)
+
+        for chunk in self._chunk(packable, Config.CLASSIFICATION_BATCH_SIZE):
+            try:
+                response = self.gateway.chat_completion(
+                    model=Config.DEPLOYMENT_NAME,
+                    temperature=0.1,
+                    messages=self._build_batch_messages([texts[i] for i in chunk], mode)
+                )
+                parsed = self._parse_batch_response(response, len(chunk))
+            except Exception as e:
+                logger.warning(f"Batched classification failed, falling back to single calls: {str(e)}")
+                parsed = [None] * len(chunk)
+            for index, result in zip(chunk, parsed):
+                results[index] = result
+                if result is None:
+                    single.append(index)
+                else:
+                    self._cache_set(texts[index], result, mode)
+
+        if single:
+            logger.info(f"Classifying {len(single)} texts individually")
+        classify_one = self.classify_and_expand if mode == "fused" else self.classify_text
+        for index in single:
+            results[index] = classify_one(texts[index])
+        return results
+
+    @timed_stage("classification_batch")
+    async def aclassify_batch(self, texts: List[str], mode: str = "standard",
+                              max_concurrency: Optional[int] = None) -> List[dict]:
+        """
+        Async variant of classify_batch. Packed prompts run concurrently; at most max_concurrency
+        (default CLASSIFICATION_FALLBACK_CONCURRENCY) single-text fallbacks run at a time.
+        """
+        results = list(await asyncio.gather(*(self._aprecheck(text, mode) for text in texts)))
+        packable, single = self._split_packable(texts, results)
+
+        async def classify_chunk(chunk: List[int]) -> List[Optional[dict]]:
+            try:
+                response = await self.gateway.achat_completion(
+                    model=Config.DEPLOYMENT_NAME,
+                    temperature=0.1,
+                    messages=self._build_batch_messages([texts[i] for i in chunk], mode)
+                )
+                return self._parse_batch_response(response, len(chunk))
+            except Exception as e:
+                logger.warning(f"Batched classification failed, falling back to single calls: {str(e)}")
+                return [None] * len(chunk)
+
+        chunks = list(self._chunk(packable, Config.CLASSIFICATION_BATCH_SIZE))
+        for chunk, parsed in zip(chunks, await asyncio.gather(*(classify_chunk(c) for c in chunks))):
+            for index, result in zip(chunk, parsed):
+                results[index] = result
+                if result is None:
+                    single.append(index)
+                else:
+                    await self._acache_set(texts[index], result, mode)
+
+        if single:
+            logger.info(f"Classifying {len(single)} texts individually")
+        semaphore = asyncio.Semaphore(max(1, max_concurrency or Config.CLASSIFICATION_FALLBACK_CONCURRENCY))
+        classify_one = self.aclassify_and_expand if mode == "fused" else self.aclassify_text
+
+        async def fallback(text: str) -> dict:
+            async with semaphore:
+                return await classify_one(text)
+
+        fallbacks = await asyncio.gather(*(fallback(texts[i]) for i in single))
+        for index, result in zip(single, fallbacks):
+            results[index] = result
+        return results
+
+    def _build_messages(self, text: str) -> List[Dict]:
+        """
+        Build the chat messages for a single-text classification request.
+        """
+        prompt = f"""
             Analyze the following text and classify it into one of these categories:
             - Hate: Contains hate speech targeting individuals or groups
             - Toxic: Harmful, abusive, or threatening language
@@ -48,57 +213,260 @@ class HateSpeechDetectionAgent:
                 "explanation": "Brief explanation of the classification"
             }}
             """
+        return [
+            {"role": "system", "content": "You are a content moderation expert."},
+            {"role": "user", "content": prompt}
+        ]
+
+    def _build_fused_messages(self, text: str) -> List[Dict]:
+        """
+        Build the chat messages for a combined classification and query expansion request.
+        """
+        prompt = f"""
+            Analyze the following text and classify it into one of these categories:
+            - Hate: Contains hate speech targeting individuals or groups
+            - Toxic: Harmful, abusive, or threatening language
+            - Offensive: Inappropriate but not necessarily harmful
+            - Neutral: Acceptable content
+            - Ambiguous: Unclear or context-dependent
             
-            response = self.client.chat.completions.create(
-                model=Config.DEPLOYMENT_NAME,
-                temperature=0.1,
-                messages=[
-                    {"role": "system", "content": "You are a content moderation expert."},
-                    {"role": "user", "content": prompt}
-                ]
-            )
-            print (f"Response from API: {response}")
-            if not response.choices or not response.choices[0].message.content:
-                return {
-                    "success": False,
-                    "message": "Empty response received from API"
-                }
-                
-            content = response.choices[0].message.content
-
-            # Clean Markdown formatting if present
-            if isinstance(content, str):
-                content = re.sub(r"^```[a-zA-Z]*\s*", "", content.strip())
-                content = re.sub(r"\s*```$", "", content.strip())
-
-            content = content.strip()
-            if not content.startswith('{'):
-                return {
-                    "success": False,
-                    "message": f"Invalid JSON response: {content}"
-                }
-                
-            result = json.loads(content)
-            # Ensure required keys exist
-            return {
+            Text to analyze: "{text}"
+            
+            Also list keywords and phrases that would help find the content moderation
+            policy documents relevant to this text and its classification.
+            
+            Respond in JSON format:
+            {{
+                "label": "classification",
+                "confidence": 0.95,
+                "explanation": "Two or three sentences explaining the classification",
+                "keywords": ["search term", "another search term"]
+            }}
+            """
+        return [
+            {"role": "system", "content": "You are a content moderation expert."},
+            {"role": "user", "content": prompt}
+        ]
+
+    def _build_batch_messages(self, texts: List[str], mode: str = "standard") -> List[Dict]:
+        """
+        Build the chat messages for a multi-text classification request; in "fused" mode
+        each entry also asks for policy search keywords.
+        Texts are embedded as a JSON array so quotes and newlines cannot break the prompt.
+        """
+        items = json.dumps([{"id": i, "text": text} for i, text in enumerate(texts)], ensure_ascii=False)
+        if mode == "fused":
+            keywords_request = """
+            For each text also list keywords and phrases that would help find the content
+            moderation policy documents relevant to it and its classification.
+            """
+            keywords_field = ',\n                    "keywords": ["search term", "another search term"]'
+        else:
+            keywords_request = keywords_field = ""
+        prompt = f"""
+            Analyze each of the following texts independently and classify it into one of these categories:
+            - Hate: Contains hate speech targeting individuals or groups
+            - Toxic: Harmful, abusive, or threatening language
+            - Offensive: Inappropriate but not necessarily harmful
+            - Neutral: Acceptable content
+            - Ambiguous: Unclear or context-dependent
+            
+            Texts to analyze (JSON array): {items}
+            {keywords_request}
+            Respond with only a JSON array containing exactly one object per text, in the same order:
+            [
+                {{
+                    "id": 0,
+                    "label": "classification",
+                    "confidence": 0.95,
+                    "explanation": "Brief explanation of the classification"{keywords_field}
+                }}
+            ]
+            """
+        return [
+            {"role": "system", "content": "You are a content moderation expert."},
+            {"role": "user", "content": prompt}
+        ]
+
+    def _parse_batch_response(self, response, expected: int) -> List[Optional[dict]]:
+        """
+        Parse a batched chat completion into one result per text.
+        Entries that are missing or malformed are returned as None so the caller can retry them singly.
+        """
+        parsed: List[Optional[dict]] = [None] * expected
+        if not response.choices or not response.choices[0].message.content:
+            return parsed
+
+        content = response.choices[0].message.content.strip()
+        # Tolerate Markdown fences and prose around the array
+        start, end = content.find("["), content.rfind("]")
+        if start == -1 or end <= start:
+            logger.warning("Batched classification response contained no JSON array")
+            return parsed
+        try:
+            items = json.loads(content[start:end + 1])
+        except json.JSONDecodeError as e:
+            logger.warning(f"Failed to parse batched classification response: {str(e)}")
+            return parsed
+
+        use_positions = len(items) == expected
+        for position, item in enumerate(items):
+            if not isinstance(item, dict):
+                continue
+            index = item.get("id", position if use_positions else None)
+            if not isinstance(index, int) or not 0 <= index < expected or parsed[index] is not None:
+                continue
+            label = item.get("label")
+            try:
+                confidence = float(item.get("confidence"))
+            except (TypeError, ValueError):
+                continue
+            if label not in Config.CLASSIFICATION_LABELS:
+                continue
+            parsed[index] = {
                 "success": True,
-                "label": result.get("label", "Ambiguous"),
-                "confidence": result.get("confidence", 0.0),
-                "explanation": result.get("explanation", "")
+                "label": label,
+                "confidence": confidence,
+                "explanation": item.get("explanation", "")
+            }
+            # Present only for fused batch responses
+            keywords = item.get("keywords")
+            if isinstance(keywords, list):
+                parsed[index]["keywords"] = [str(keyword) for keyword in keywords if keyword]
+        return parsed
+
+    def _split_packable(self, texts: List[str], results: List[Optional[dict]]) -> Tuple[List[int], List[int]]:
+        """
+        Split indices of texts without a result yet into those short enough to pack
+        into a batch prompt and the rest.
+        """
+        packable, single = [], []
+        for index, text in enumerate(texts):
+            if results[index] is not None:
+                continue
+            if len(text) <= Config.CLASSIFICATION_BATCH_MAX_CHARS:
+                packable.append(index)
+            else:
+                single.append(index)
+        return packable, single
+
+    @staticmethod
+    def _chunk(items: List[int], size: int):
+        """
+        Yield successive chunks of at most size items.
+        """
+        size = max(size, 1)
+        for start in range(0, len(items), size):
+            yield items[start:start + size]
+
+    def _parse_response(self, response) -> dict:
+        """
+        Parse a chat completion into a classification result.
+        Raises json.JSONDecodeError if the content is not valid JSON.
+        """
+        logger.debug(f"Response from API: {response}")
+        if not response.choices or not response.choices[0].message.content:
+            return {
+                "success": False,
+                "message": "Empty response received from API"
             }
             
-        except json.JSONDecodeError as e:
-            logging.error(f"Failed to parse JSON response: {str(e)}")
+        content = response.choices[0].message.content
+
+        # Clean Markdown formatting if present
+        if isinstance(content, str):
+            content = re.sub(r"^```[a-zA-Z]*\s*", "", content.strip())
+            content = re.sub(r"\s*```$", "", content.strip())
+
+        content = content.strip()
+        if not content.startswith('{'):
             return {
                 "success": False,
-                "message": "Invalid response format",
-                "details": str(e)
+                "message": f"Invalid JSON response: {content}"
             }
-        except Exception as e:
-            logging.error(f"Error in HateSpeechDetectionAgent.classify_text: {str(e)}")
-            logging.error(f"Traceback: {traceback.format_exc()}")
+            
+        result = json.loads(content)
+        # Ensure required keys exist
+        parsed = {
+            "success": True,
+            "label": result.get("label", "Ambiguous"),
+            "confidence": result.get("confidence", 0.0),
+            "explanation": result.get("explanation", "")
+        }
+        # Present only for fused classify-and-expand responses
+        keywords = result.get("keywords")
+        if isinstance(keywords, list):
+            parsed["keywords"] = [str(keyword) for keyword in keywords if keyword]
+        return parsed
+
+    def _precheck(self, text: str, mode: str = "standard") -> Optional[dict]:
+        """
+        Answer text without the LLM if possible: from the cache entries for the prompt mode,
+        or from the pre-filter when it is confidently neutral. Returns None if an LLM call is needed.
+        """
+        cached = self._cache_get(text, mode)
+        if cached is not None or self.prefilter is None:
+            return cached
+        return self.prefilter.check(text)
+
+    async def _aprecheck(self, text: str, mode: str = "standard") -> Optional[dict]:
+        """
+        Async variant of _precheck; the cache's disk tier is read off the event loop.
+        """
+        cached = await self._acache_get(text, mode)
+        if cached is not None or self.prefilter is None:
+            return cached
+        return self.prefilter.check(text)
+
+    def _cache_get(self, text: str, mode: str = "standard") -> Optional[dict]:
+        """
+        Return the cached classification for text under the prompt mode ("standard" or
+        "fused"), if caching is enabled and it is present.
+        """
+        if self.cache is None:
+            return None
+        return self.cache.get(text, mode)
+
+    def _cache_set(self, text: str, result: dict, mode: str = "standard") -> dict:
+        """
+        Cache a classification result (only successful ones are kept) and return it.
+        """
+        if self.cache is not None:
+            self.cache.set(text, result, mode)
+        return result
+
+    async def _acache_get(self, text: str, mode: str = "standard") -> Optional[dict]:
+        """
+        Async variant of _cache_get.
+        """
+        if self.cache is None:
+            return None
+        return await self.cache.aget(text, mode)
+
+    async def _acache_set(self, text: str, result: dict, mode: str = "standard") -> dict:
+        """
+        Async variant of _cache_set.
+        """
+        if self.cache is not None:
+            await self.cache.aset(text, result, mode)
+        return result
+
+    def _handle_exception(self, e: Exception) -> dict:
+        """
+        Convert an exception raised during classification into an error result.
+        """
+        AGENT_ERRORS.inc(agent="HateSpeechDetectionAgent", error_type=type(e).__name__)
+        if isinstance(e, json.JSONDecodeError):
+            logging.error(f"Failed to parse JSON response: {str(e)}")
             return {
                 "success": False,
-                "message": "Classification failed",
+                "message": "Invalid response format",
                 "details": str(e)
-            }
\ No newline at end of file
+            }
+        logging.error(f"Error in HateSpeechDetectionAgent.classify_text: {str(e)}")
+        logging.error(f"Traceback: {traceback.format_exc()}")
+        return {
+            "success": False,
+            "message": "Classification failed",
+            "details": str(e)
+        }
@@ -0,0 +1,166 @@
+import os
+import re
+import unicodedata
+import zlib
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+from backend.config import Config
+from ..utils.metrics import PREFILTER_DECISIONS
+from ..utils.logging_utils import setup_logging
+import logging
+
+# Set up logging for this module
+setup_logging()
+logger = logging.getLogger(__name__)
+
+# Terms that always send a text to the LLM; extend with Config.PREFILTER_LEXICON_PATH
+DEFAULT_LEXICON = [
+    "hate", "kill", "die", "murder", "attack", "shoot", "rape", "lynch", "exterminate",
+    "subhuman", "vermin", "scum", "trash", "filth", "parasites", "inferior",
+    "go back", "deport", "ban them", "wipe out", "get rid of",
+    "idiot", "stupid", "moron", "retard", "loser", "disgusting", "pathetic", "worthless",
+    "shut up", "threat", "burn", "hang", "terrorist", "nazi",
+]
+
+WORD_PATTERN = re.compile(r"\w+")
+
+def normalize_text(text: str) -> str:
+    """
+    NFKC-normalize, lowercase and collapse whitespace.
+    """
+    return " ".join(unicodedata.normalize("NFKC", text).lower().split())
+
+def hashed_features(text: str, n_features: int) -> np.ndarray:
+    """
+    Hash word unigrams, word bigrams and character trigrams of text into unique feature indices.
+    Uses crc32 so indices are stable across processes (unlike the built-in hash).
+    """
+    words = WORD_PATTERN.findall(normalize_text(text))
+    grams = [f"w:{word}" for word in words]
+    grams += [f"b:{first} {second}" for first, second in zip(words, words[1:])]
+    for word in words:
+        padded = f"<{word}>"
+        grams += [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+    indices = {zlib.crc32(gram.encode("utf-8")) % n_features for gram in grams}
+    return np.fromiter(indices, dtype=np.int64, count=len(indices))
+
+
+class PreFilterAgent:
+    """
+    CPU pre-classifier that answers obviously neutral texts without calling the LLM.
+    A text is short-circuited as Neutral only when no lexicon term matches and a linear
+    model over hashed n-grams scores it as neutral with probability >= threshold.
+    Without a trained model every text is passed on to the LLM.
+    """
+    def __init__(
+        self,
+        model_path: Optional[str] = Config.PREFILTER_MODEL_PATH,
+        lexicon_path: Optional[str] = Config.PREFILTER_LEXICON_PATH,
+        threshold: float = Config.PREFILTER_THRESHOLD,
+    ):
+        self.threshold = threshold
+        self.lexicon_pattern = self._compile_lexicon(self._load_lexicon(lexicon_path))
+        self.weights: Optional[np.ndarray] = None
+        self.bias = 0.0
+        if model_path and os.path.exists(model_path):
+            # Last element is the bias; the weights are memory-mapped and shared across workers
+            model = np.load(model_path, mmap_mode="r")
+            self.weights, self.bias = model[:-1], float(model[-1])
+            logger.info(f"Loaded pre-filter model from {model_path} ({len(self.weights)} features)")
+        else:
+            logger.warning("No pre-filter model found; all texts will be sent to the LLM")
+        self.counters = {"checked": 0, "short_circuited": 0, "lexicon_hits": 0, "passed_to_llm": 0}
+
+    @staticmethod
+    def _load_lexicon(lexicon_path: Optional[str]) -> List[str]:
+        """
+        Return the default lexicon plus the non-empty, non-comment lines of lexicon_path.
+        """
+        terms = list(DEFAULT_LEXICON)
+        if lexicon_path:
+            with open(lexicon_path, "r", encoding="utf-8") as f:
+                terms += [line.strip() for line in f if line.strip() and not line.startswith("#")]
+        return terms
+
+    @staticmethod
+    def _compile_lexicon(terms: Iterable[str]) -> re.Pattern:
+        """
+        Compile the lexicon into one alternation regex (longest terms first so phrases win)
+        that also matches common inflections such as "hated" or "killing".
+        """
+        escaped = sorted({re.escape(normalize_text(term)) for term in terms}, key=len, reverse=True)
+        return re.compile(r"\b(?:" + "|".join(escaped) + r")(?:s|es|d|ed|ing|er|ers)?\b")
+
+    def neutral_probability(self, text: str) -> float:
+        """
+        Probability from the linear model that text is Neutral.
+        """
+        indices = hashed_features(text, len(self.weights))
+        score = self.bias + float(self.weights[indices].sum())
+        return float(1.0 / (1.0 + np.exp(-score)))
+
+    def check(self, text: str) -> Optional[Dict]:
+        """
+        Return a Neutral classification result if text is confidently benign, otherwise None.
+        """
+        self.counters["checked"] += 1
+        if self.lexicon_pattern.search(normalize_text(text)):
+            self.counters["lexicon_hits"] += 1
+            self.counters["passed_to_llm"] += 1
+            PREFILTER_DECISIONS.inc(result="lexicon_hit")
+            return None
+        if self.weights is None:
+            self.counters["passed_to_llm"] += 1
+            PREFILTER_DECISIONS.inc(result="passed_to_llm")
+            return None
+        probability = self.neutral_probability(text)
+        if probability < self.threshold:
+            self.counters["passed_to_llm"] += 1
+            PREFILTER_DECISIONS.inc(result="passed_to_llm")
+            return None
+        self.counters["short_circuited"] += 1
+        PREFILTER_DECISIONS.inc(result="short_circuited")
+        return {
+            "success": True,
+            "label": "Neutral",
+            "confidence": round(probability, 4),
+            "explanation": "No indicators of harmful content were found by the pre-filter.",
+            "source": "prefilter"
+        }
+
+    def stats(self) -> Dict:
+        """
+        Return counters and the share of checked texts answered without the LLM.
+        """
+        checked = self.counters["checked"]
+        return {
+            **self.counters,
+            "short_circuit_rate": round(self.counters["short_circuited"] / checked, 4) if checked else 0.0,
+            "threshold": self.threshold,
+        }
+
+
+def train_prefilter(texts: List[str], neutral: List[bool], path: str,
+                    n_features: int = Config.PREFILTER_NGRAM_FEATURES, epochs: int = 5,
+                    learning_rate: float = 0.5, l2: float = 1e-6) -> np.ndarray:
+    """
+    Fit the pre-filter's logistic regression (target: text is Neutral) with SGD and save it to path.
+    Labels can come from earlier LLM classifications, e.g. the classification cache.
+    Returns the saved array of weights followed by the bias.
+    """
+    model = np.zeros(n_features + 1, dtype=np.float32)
+    features = [hashed_features(text, n_features) for text in texts]
+    targets = np.asarray(neutral, dtype=np.float32)
+    rng = np.random.default_rng(0)
+    for _ in range(epochs):
+        for i in rng.permutation(len(texts)):
+            score = model[-1] + model[features[i]].sum()
+            gradient = 1.0 / (1.0 + np.exp(-score)) - targets[i]
+            model[features[i]] -= learning_rate * (gradient + l2 * model[features[i]])
+            model[-1] -= learning_rate * gradient
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    np.save(path, model)
+    logger.info(f"Saved pre-filter model trained on {len(texts)} texts to {path}")
+    return model
@@ -1,7 +1,8 @@
-from openai import AzureOpenAI
-from typing import Dict, List
+from typing import AsyncIterator, Dict, List
 from backend.config import Config
 from ..agents.error_handler import ErrorHandler
+from ..utils.llm_gateway import get_llm_gateway
+from ..utils.metrics import timed_stage
 from ..utils.logging_utils import setup_logging
 import logging
 
@@ -14,22 +15,77 @@ class PolicyReasoningAgent:
     Agent to generate detailed reasoning for a classification decision using LLM.
     """
     def __init__(self):
-        self.client = AzureOpenAI(
-            api_key=Config.DIAL_API_KEY,
-            api_version=Config.DIAL_API_VERSION,
-            azure_endpoint=Config.DIAL_ENDPOINT
-        )
+        # Shared, pooled clients; calls go through the gateway for concurrency limits and retries
+        self.gateway = get_llm_gateway()
+        self.client = self.gateway.client
+        self.async_client = self.gateway.async_client
         self.error_handler = ErrorHandler()
     
+    @timed_stage("reasoning")
     def generate_reasoning(self, text: str, classification: Dict, retrieved_docs: List[Dict]) -> Dict:
         """
         Generate a detailed explanation for the classification, referencing policies and context.
         """
         try:
-            # Prepare context from retrieved documents
-            context = self._prepare_context(retrieved_docs)
+            response = self.gateway.chat_completion(
+                model=Config.DEPLOYMENT_NAME,
+                temperature=0.2,
+                messages=self._build_messages(text, classification, retrieved_docs)
+            )
+            
+            return {
+                "success": True,
+                "reasoning": response.choices[0].message.content,
+                "policies_referenced": len(retrieved_docs)
+            }
             
-            prompt = f"""
+        except Exception as e:
+            # Handle errors gracefully
+            return self.error_handler.handle_error(e, "PolicyReasoningAgent.generate_reasoning")
+
+    @timed_stage("reasoning")
+    async def agenerate_reasoning(self, text: str, classification: Dict, retrieved_docs: List[Dict]) -> Dict:
+        """
+        Async variant of generate_reasoning using the AsyncAzureOpenAI client.
+        """
+        try:
+            response = await self.gateway.achat_completion(
+                model=Config.DEPLOYMENT_NAME,
+                temperature=0.2,
+                messages=self._build_messages(text, classification, retrieved_docs)
+            )
+
+            return {
+                "success": True,
+                "reasoning": response.choices[0].message.content,
+                "policies_referenced": len(retrieved_docs)
+            }
+
+        except Exception as e:
+            # Handle errors gracefully
+            return self.error_handler.handle_error(e, "PolicyReasoningAgent.agenerate_reasoning")
+
+    @timed_stage("reasoning")
+    async def astream_reasoning(self, text: str, classification: Dict, retrieved_docs: List[Dict]) -> AsyncIterator[str]:
+        """
+        Stream the reasoning for a classification token by token as the LLM produces it.
+        Errors are raised to the caller, which may already have sent earlier tokens.
+        """
+        async for token in self.gateway.astream_chat_completion(
+            model=Config.DEPLOYMENT_NAME,
+            temperature=0.2,
+            messages=self._build_messages(text, classification, retrieved_docs)
+        ):
+            yield token
+
+    def _build_messages(self, text: str, classification: Dict, retrieved_docs: List[Dict]) -> List[Dict]:
+        """
+        Build the chat messages for the reasoning request.
+        """
+        # Prepare context from retrieved documents
+        context = self._prepare_context(retrieved_docs)
+        
+        prompt = f"""
             Based on the classification and relevant policies, provide a detailed explanation 
             for why this content was classified as "{classification['label']}".
             
@@ -48,25 +104,10 @@ class PolicyReasoningAgent:
             
             Keep the response professional and objective.
             """
-            
-            response = self.client.chat.completions.create(
-                model=Config.DEPLOYMENT_NAME,
-                temperature=0.2,
-                messages=[
-                    {"role": "system", "content": "You are a content moderation expert providing detailed policy analysis."},
-                    {"role": "user", "content": prompt}
-                ]
-            )
-            
-            return {
-                "success": True,
-                "reasoning": response.choices[0].message.content,
-                "policies_referenced": len(retrieved_docs)
-            }
-            
-        except Exception as e:
-            # Handle errors gracefully
-            return self.error_handler.handle_error(e, "PolicyReasoningAgent.generate_reasoning")
+        return [
+            {"role": "system", "content": "You are a content moderation expert providing detailed policy analysis."},
+            {"role": "user", "content": prompt}
+        ]
     
     def _prepare_context(self, documents: List[Dict]) -> str:
         """
@@ -75,4 +116,4 @@ class PolicyReasoningAgent:
         context = ""
         for i, doc in enumerate(documents, 1):
             context += f"\n{i}. From {doc['source']}:\n{doc['text']}\n"
-        return context
\ No newline at end of file
+        return context
@@ -1,11 +1,19 @@
 from ..utils.embedding_utils import EmbeddingGenerator
-from ..utils.qdrant_store import QdrantOpenAIStore
-from openai import AzureOpenAI
-from typing import List, Dict
+from ..utils.bm25_index import BM25Index, document_key, reciprocal_rank_fusion, store_fingerprint
+from ..utils.vector_stores import SearchCoalescer, create_vector_store
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+import threading
+from typing import Any, List, Dict, Optional, Tuple
 from backend.config import Config
 from ..agents.error_handler import ErrorHandler
+from ..utils.llm_gateway import get_llm_gateway
+from ..utils.metrics import stage_timer, timed_stage
 from ..utils.logging_utils import setup_logging
+import asyncio
 import logging
+import time
+import numpy as np
 
 # Set up logging for this module
 setup_logging()
@@ -13,69 +21,306 @@ logger = logging.getLogger(__name__)
 
 class HybridRetrieverAgent:
     """
-    Agent to retrieve relevant policy documents using hybrid (vector + LLM) search.
+    Agent to retrieve relevant policy documents using hybrid search: dense vector search
+    and BM25 keyword search, fused with reciprocal rank fusion. An LLM-expanded query
+    adds a third vector search when enabled (or when fused classification supplies keywords).
     """
     def __init__(self):
-        self.Qdrant_store = QdrantOpenAIStore()
+        # QdrantOpenAIStore or NumpyVectorStore, depending on Config.VECTOR_STORE
+        self.Qdrant_store = create_vector_store()
         self.embedding_generator = EmbeddingGenerator()
-        self.Qdrant_store._ensure_collection_exists()
-        self.client = AzureOpenAI(
-            api_key=Config.DIAL_API_KEY,
-            api_version=Config.DIAL_API_VERSION,
-            azure_endpoint=Config.DIAL_ENDPOINT
+        self.Qdrant_store._ensure_collection_exists(self.embedding_generator.dimension)
+        # Batches concurrent async searches into shared vector-store requests (remote stores only)
+        self._search_coalescer = SearchCoalescer(
+            self.Qdrant_store,
+            window_ms=0 if getattr(self.Qdrant_store, "in_process", False) else Config.VECTOR_SEARCH_COALESCE_MS,
         )
+        # Shared, pooled clients; calls go through the gateway for concurrency limits and retries
+        self.gateway = get_llm_gateway()
+        self.client = self.gateway.client
+        self.async_client = self.gateway.async_client
         self.error_handler = ErrorHandler()
+        # Worker threads for running independent retrieval branches concurrently
+        self._executor = ThreadPoolExecutor(
+            max_workers=Config.RETRIEVER_MAX_WORKERS,
+            thread_name_prefix="retriever"
+        )
+        # Keyword index over the same chunks, built on first use and rebuilt after re-ingestion
+        self._bm25: Optional[BM25Index] = None
+        self._bm25_version = None
+        self._bm25_checked = 0.0
+        self._bm25_lock = threading.Lock()
 
-    def retrieve_policies(self, text: str, classification: str) -> Dict:
+    def retrieve_policies(self, text: str, classification: str, expanded_query: Optional[str] = None) -> Dict:
         """
-        Retrieve relevant policy documents using vector search and LLM-enhanced query expansion.
-        Combines and deduplicates results.
+        Retrieve relevant policy documents using vector search, BM25 keyword search and,
+        optionally, LLM-enhanced query expansion. The expansion (LLM call and embedding) runs on
+        a worker thread while the raw text is embedded and keyword-searched on the calling thread;
+        both query vectors then go to the vector store in one batched request, and results are fused by rank.
+        Every search covers only the policy subset mapped to the classification label.
+        A precomputed expanded_query (e.g. keywords from fused classification) skips the LLM expansion.
         """
         try:
-            # Vector search
-            query_embedding = self.embedding_generator.embed_query(text)
-            vector_results = self.Qdrant_store.search(query_embedding, limit=7)
+            start = time.perf_counter()
+            filters = self.policy_filters(classification)
+            expansion_future = None
+            if expanded_query or Config.RETRIEVER_QUERY_EXPANSION:
+                # Run in a copy of this context so stage timings reach the current request
+                expansion_future = self._executor.submit(
+                    contextvars.copy_context().run, self._timed_branch, self._embed_expansion,
+                    text, classification, expanded_query
+                )
+            query_embedding, vector_ms = self._timed_branch(self.embedding_generator.embed_query, text)
+            # Keyword branch: in-memory BM25, no network calls
+            lexical_results, lexical_ms = self._timed_branch(self._lexical_branch, text, expanded_query, filters)
+            embeddings, expansion_ms = [query_embedding], 0.0
+            if expansion_future is not None:
+                expanded_embedding, expansion_ms = expansion_future.result()
+                embeddings.append(expanded_embedding)
+            vector_results, search_ms = self._timed_branch(self._search_batch, embeddings, filters)
+            total_ms = (time.perf_counter() - start) * 1000
 
-            # LLM-enhanced query expansion
-            expanded_query = self._expand_query(text, classification)
-            expanded_embedding = self.embedding_generator.embed_query(expanded_query)
-            llm_results = self.Qdrant_store.search(expanded_embedding, limit=6)
+            return self._build_result(
+                vector_results + [lexical_results],
+                {"vector_branch_ms": vector_ms, "lexical_branch_ms": lexical_ms,
+                 "expansion_branch_ms": expansion_ms, "search_ms": search_ms},
+                total_ms,
+            )
+
+        except Exception as e:
+            # Handle errors gracefully
+            return self.error_handler.handle_error(e, "HybridRetrieverAgent.retrieve_policies")
 
-            # Combine and deduplicate results
-            all_results = vector_results + llm_results
-            unique_results = self._deduplicate_results(all_results)
+    async def aretrieve_policies(self, text: str, classification: str, expanded_query: Optional[str] = None) -> Dict:
+        """
+        Async variant of retrieve_policies using the async embedding, Qdrant and LLM clients.
+        The embeddings and keyword search are awaited concurrently. The vector search goes
+        through a coalescer, so concurrent analyses share batched vector-store requests.
+        """
+        try:
+            start = time.perf_counter()
+            filters = self.policy_filters(classification)
+            branches = [
+                self._atimed_branch(self.embedding_generator.aembed_query(text)),
+                self._atimed_branch(self._alexical_branch(text, expanded_query, filters)),
+            ]
+            if expanded_query or Config.RETRIEVER_QUERY_EXPANSION:
+                branches.append(self._atimed_branch(self._aembed_expansion(text, classification, expanded_query)))
+            timed = await asyncio.gather(*branches)
+            (query_embedding, vector_ms), (lexical_results, lexical_ms) = timed[:2]
+            embeddings, expansion_ms = [query_embedding], 0.0
+            if len(timed) > 2:
+                expanded_embedding, expansion_ms = timed[2]
+                embeddings.append(expanded_embedding)
+            vector_results, search_ms = await self._atimed_branch(self._asearch_batch(embeddings, filters))
+            total_ms = (time.perf_counter() - start) * 1000
 
-            return {
-                "success": True,
-                "documents": unique_results[:5],  # Top 5 results
-                "total_found": len(unique_results)
-            }
+            return self._build_result(
+                vector_results + [lexical_results],
+                {"vector_branch_ms": vector_ms, "lexical_branch_ms": lexical_ms,
+                 "expansion_branch_ms": expansion_ms, "search_ms": search_ms},
+                total_ms,
+            )
 
         except Exception as e:
             # Handle errors gracefully
-            return self.error_handler.handle_error(e, "HybridRetrieverAgent.retrieve_policies")
+            return self.error_handler.handle_error(e, "HybridRetrieverAgent.aretrieve_policies")
+
+    def policy_filters(self, classification: str) -> Dict:
+        """
+        Payload filters for the policy subset relevant to a label (LABEL_POLICY_FILTERS),
+        restricted to RETRIEVER_JURISDICTIONS plus "global" when those are configured.
+        An empty dict searches the whole collection.
+        """
+        filters = dict(Config.LABEL_POLICY_FILTERS.get(classification) or {})
+        if Config.RETRIEVER_JURISDICTIONS:
+            filters["jurisdiction"] = ["global"] + list(Config.RETRIEVER_JURISDICTIONS)
+        return filters
+
+    def _search_batch(self, embeddings: List[List[float]], filters: Optional[Dict] = None) -> List[List[Dict]]:
+        """
+        Search the vector store for every query embedding in one request, within the filtered subset.
+        Queries whose subset is empty (e.g. an index ingested before policies carried
+        category/jurisdiction) are retried against the whole collection.
+        """
+        with stage_timer("vector_search"):
+            results = self.Qdrant_store.search_batch(embeddings, limit=Config.RETRIEVER_CANDIDATES,
+                                                     with_vectors=Config.RETRIEVER_MMR_ENABLED, filters=filters)
+            retry = [i for i, result in enumerate(results) if filters and not result]
+            if retry:
+                fallback = self.Qdrant_store.search_batch([embeddings[i] for i in retry],
+                                                          limit=Config.RETRIEVER_CANDIDATES,
+                                                          with_vectors=Config.RETRIEVER_MMR_ENABLED)
+                for i, result in zip(retry, fallback):
+                    results[i] = result
+            return results
+
+    async def _asearch_batch(self, embeddings: List[List[float]], filters: Optional[Dict] = None) -> List[List[Dict]]:
+        """
+        Async variant of _search_batch, sent through the search coalescer.
+        """
+        with stage_timer("vector_search"):
+            results = await self._search_coalescer.search(embeddings, limit=Config.RETRIEVER_CANDIDATES,
+                                                          with_vectors=Config.RETRIEVER_MMR_ENABLED, filters=filters)
+            retry = [i for i, result in enumerate(results) if filters and not result]
+            if retry:
+                fallback = await self._search_coalescer.search([embeddings[i] for i in retry],
+                                                               limit=Config.RETRIEVER_CANDIDATES,
+                                                               with_vectors=Config.RETRIEVER_MMR_ENABLED)
+                for i, result in zip(retry, fallback):
+                    results[i] = result
+            return results
+
+    def _embed_expansion(self, text: str, classification: str, expanded_query: Optional[str] = None) -> List[float]:
+        """
+        Expand the query with the LLM (unless already expanded) and embed the expansion.
+        """
+        if not expanded_query:
+            expanded_query = self._expand_query(text, classification)
+        return self.embedding_generator.embed_query(expanded_query)
+
+    async def _aembed_expansion(self, text: str, classification: str,
+                                expanded_query: Optional[str] = None) -> List[float]:
+        """
+        Async variant of _embed_expansion.
+        """
+        if not expanded_query:
+            expanded_query = await self._aexpand_query(text, classification)
+        return await self.embedding_generator.aembed_query(expanded_query)
+
+    def _lexical_branch(self, text: str, expanded_query: Optional[str] = None,
+                        filters: Optional[Dict] = None) -> List[Dict]:
+        """
+        Search the BM25 index with the raw text, plus the expansion keywords when available.
+        Exact terms such as statute section numbers match here even when embeddings miss them.
+        A failure (e.g. the store could not be scrolled to build the index) only drops this
+        branch; retrieval continues with the vector results.
+        """
+        if not Config.RETRIEVER_LEXICAL_SEARCH:
+            return []
+        try:
+            index = self._lexical_index()
+            query = f"{text} {expanded_query}" if expanded_query else text
+            with stage_timer("lexical_search"):
+                return index.search(query, limit=Config.RETRIEVER_CANDIDATES, filters=filters)
+        except Exception as e:
+            logger.warning(f"Keyword search failed, using vector results only: {str(e)}")
+            return []
+
+    async def _alexical_branch(self, text: str, expanded_query: Optional[str] = None,
+                               filters: Optional[Dict] = None) -> List[Dict]:
+        """
+        Async variant of _lexical_branch. Index (re)builds read the whole store, so they run on a
+        thread; the search itself is a few array operations and runs inline.
+        """
+        if not Config.RETRIEVER_LEXICAL_SEARCH:
+            return []
+        if self._bm25_needs_refresh():
+            try:
+                await asyncio.to_thread(self._lexical_index)
+            except Exception as e:
+                logger.warning(f"Keyword search failed, using vector results only: {str(e)}")
+                return []
+        return self._lexical_branch(text, expanded_query, filters)
+
+    def _bm25_needs_refresh(self) -> bool:
+        """
+        True if the index was never built, or if it is time to check for re-ingestion.
+        """
+        return self._bm25 is None or time.monotonic() - self._bm25_checked >= Config.BM25_REFRESH_SECONDS
+
+    def _lexical_index(self) -> BM25Index:
+        """
+        Return the BM25 index, building it from the vector store on first use and rebuilding it
+        when the store's content fingerprint changes (checked every BM25_REFRESH_SECONDS).
+        The fingerprint is read from the store, so replicas that did not run the ingestion
+        pick up new policies too.
+        """
+        if not self._bm25_needs_refresh():
+            return self._bm25
+        with self._bm25_lock:
+            if not self._bm25_needs_refresh():
+                return self._bm25
+            version = store_fingerprint(self.Qdrant_store)
+            if self._bm25 is None or version != self._bm25_version:
+                self._bm25 = BM25Index.from_store(self.Qdrant_store)
+                self._bm25_version = version
+            self._bm25_checked = time.monotonic()
+            return self._bm25
+
+    @staticmethod
+    def _timed_branch(branch, *args) -> Tuple[Any, float]:
+        """
+        Run a branch and return its results with the elapsed time in milliseconds.
+        """
+        start = time.perf_counter()
+        results = branch(*args)
+        return results, (time.perf_counter() - start) * 1000
 
+    @staticmethod
+    async def _atimed_branch(branch) -> Tuple[Any, float]:
+        """
+        Await a branch coroutine and return its results with the elapsed time in milliseconds.
+        """
+        start = time.perf_counter()
+        results = await branch
+        return results, (time.perf_counter() - start) * 1000
+
+    def _build_result(self, branch_results: List[List[Dict]], branch_ms: Dict[str, float], total_ms: float) -> Dict:
+        """
+        Fuse branch results with reciprocal rank fusion, merge duplicates, optionally diversify
+        with MMR, and attach per-branch timings.
+        """
+        fused_results = reciprocal_rank_fusion(branch_results)
+        unique_results = self._deduplicate_results(fused_results)
+        if Config.RETRIEVER_MMR_ENABLED:
+            unique_results = self._diversify(unique_results, Config.RETRIEVER_TOP_K, Config.RETRIEVER_MMR_LAMBDA)
+        documents = [
+            {field: value for field, value in result.items() if field != "vector"}
+            for result in unique_results[:Config.RETRIEVER_TOP_K]
+        ]
+
+        sequential_ms = sum(branch_ms.values())
+        timings = {name: round(ms, 2) for name, ms in branch_ms.items()}
+        timings["total_ms"] = round(total_ms, 2)
+        timings["saved_ms"] = round(max(sequential_ms - total_ms, 0.0), 2)
+        logger.info(f"Retrieval timings: {timings}")
+
+        return {
+            "success": True,
+            "documents": documents,
+            "total_found": len(unique_results),
+            "timings": timings
+        }
+
+    @timed_stage("expansion")
     def _expand_query(self, text: str, classification: str) -> str:
         """
         Use LLM to expand the query for better retrieval of relevant policies.
         """
         try:
-            prompt = f"""
-            Given this text classified as "{classification}", generate keywords and phrases 
-            that would help find relevant policy documents:
+            response = self.gateway.chat_completion(
+                model=Config.DEPLOYMENT_NAME,
+                temperature=0.3,
+                messages=self._build_expansion_messages(text, classification)
+            )
 
-            Text: "{text}"
-            Classification: {classification}
+            return response.choices[0].message.content.strip()
 
-            Return only the expanded search terms, separated by spaces.
-            """
+        except Exception as e:
+            # Fallback to original text if LLM fails
+            return text
 
-            response = self.client.chat.completions.create(
+    @timed_stage("expansion")
+    async def _aexpand_query(self, text: str, classification: str) -> str:
+        """
+        Async variant of _expand_query.
+        """
+        try:
+            response = await self.gateway.achat_completion(
                 model=Config.DEPLOYMENT_NAME,
                 temperature=0.3,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ]
+                messages=self._build_expansion_messages(text, classification)
             )
 
             return response.choices[0].message.content.strip()
@@ -84,17 +329,74 @@ class HybridRetrieverAgent:
             # Fallback to original text if LLM fails
             return text
 
-    def _deduplicate_results(self, results: List[Dict]) -> List[Dict]:
+    def _build_expansion_messages(self, text: str, classification: str) -> List[Dict]:
         """
-        Remove duplicate results based on the first 100 characters of text content.
+        Build the chat messages for the query expansion request.
         """
-        seen_texts = set()
-        unique_results = []
+        prompt = f"""
+            Given this text classified as "{classification}", generate keywords and phrases 
+            that would help find relevant policy documents:
+
+            Text: "{text}"
+            Classification: {classification}
+
+            Return only the expanded search terms, separated by spaces.
+            """
+        return [
+            {"role": "user", "content": prompt}
+        ]
 
+    def _deduplicate_results(self, results: List[Dict]) -> List[Dict]:
+        """
+        Merge duplicate results by content hash (falling back to source/chunk id, then text),
+        keeping the best-scored copy of each chunk, and re-rank the merged list by score.
+        """
+        best: Dict = {}
         for result in results:
-            text_key = result["text"][:100]  # Use first 100 chars as key
-            if text_key not in seen_texts:
-                seen_texts.add(text_key)
-                unique_results.append(result)
+            key = document_key(result)
+            if key not in best or self._relevance(result) > self._relevance(best[key]):
+                best[key] = result
+
+        # Stable sort, so results without scores keep their order
+        merged = sorted(best.values(), key=self._relevance, reverse=True)
+        return [{**result, "rank": rank} for rank, result in enumerate(merged, 1)]
+
+    @staticmethod
+    def _relevance(result: Dict) -> Tuple[float, float]:
+        """
+        Sort key for merged results: fused rank score first, then the branch's own score.
+        """
+        return result.get("rrf_score", 0.0), result.get("score", 0.0)
+
+    def _diversify(self, results: List[Dict], top_k: int, mmr_lambda: float) -> List[Dict]:
+        """
+        Reorder results with maximal marginal relevance over the vectors already returned by search:
+        each pick maximizes lambda * relevance - (1 - lambda) * max cosine similarity to earlier picks.
+        Relevance is the fused score scaled to [0, 1]; results without a vector (keyword-only
+        matches) are never penalized as redundant.
+        """
+        if len(results) <= 1:
+            return results
+        relevance = np.array([self._relevance(result)[0] for result in results], dtype=np.float32)
+        if relevance.max() > 0:
+            relevance = relevance / relevance.max()
+        dimension = next((len(r["vector"]) for r in results if r.get("vector") is not None), 0)
+        vectors = np.zeros((len(results), dimension), dtype=np.float32)
+        for i, result in enumerate(results):
+            if result.get("vector") is not None:
+                vectors[i] = result["vector"]
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1.0, norms)
+        similarity = vectors @ vectors.T
+
+        selected: List[int] = []
+        remaining = list(range(len(results)))
+        max_similarity = np.zeros(len(results), dtype=np.float32)
+        while remaining and len(selected) < top_k:
+            scores = mmr_lambda * relevance[remaining] - (1 - mmr_lambda) * max_similarity[remaining]
+            pick = remaining.pop(int(np.argmax(scores)))
+            selected.append(pick)
+            max_similarity = np.maximum(max_similarity, similarity[pick])
 
-        return unique_results
\ No newline at end of file
+        ordered = [results[i] for i in selected] + [results[i] for i in remaining]
+        return [{**result, "rank": rank} for rank, result in enumerate(ordered, 1)]
\ No newline at end of file
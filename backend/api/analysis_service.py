@@ -1,10 +1,25 @@
+import asyncio
+import ipaddress
+import socket
+import weakref
 from datetime import datetime
-from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+import httpx
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 
-from ..agents.hate_speech_agent import HateSpeechDetectionAgent
-from ..agents.retriever_agent import HybridRetrieverAgent
-from ..agents.reasoning_agent import PolicyReasoningAgent
-from ..agents.action_agent import ActionRecommenderAgent
+from .dependencies import (
+    get_hate_speech_agent,
+    get_retriever_agent,
+    get_reasoning_agent,
+    get_action_agent,
+    get_job_store,
+    aget_hate_speech_agent,
+    aget_retriever_agent,
+    aget_reasoning_agent,
+    aget_action_agent,
+    aget_job_store,
+)
+from ..config import Config
 from ..utils.logging_utils import setup_logging
 import logging
 
@@ -12,11 +27,118 @@ import logging
 setup_logging()
 logger = logging.getLogger(__name__)
 
-# Initialize all agents for analysis
-hate_speech_agent = HateSpeechDetectionAgent()
-retriever_agent = HybridRetrieverAgent()
-reasoning_agent = PolicyReasoningAgent()
-action_agent = ActionRecommenderAgent()
+# Agents and the job store are built on first use by the getters in dependencies
+
+# Background enrichment tasks that are still running
+_background_tasks: set = set()
+# Error recorded on jobs whose enrichment was interrupted by a shutdown or crash
+SHUTDOWN_ERROR = "Enrichment interrupted by a server shutdown"
+
+# asyncio semaphores belong to one event loop, so keep one per loop
+_enrichment_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+    weakref.WeakKeyDictionary()
+)
+
+class CallbackURLRejected(ValueError):
+    """Raised when a callback URL is not allowed by the callback allowlist or targets an internal address."""
+
+
+def _callback_host_allowed(url: str, host: str) -> bool:
+    """
+    Check a callback URL against Config.ANALYSIS_CALLBACK_ALLOWLIST.
+    Entries with a scheme are URL prefixes, entries starting with "." match subdomains,
+    anything else must equal the host.
+    """
+    allowlist = Config.ANALYSIS_CALLBACK_ALLOWLIST
+    if not allowlist:
+        return True
+    for entry in allowlist:
+        entry = entry.lower()
+        if "://" in entry:
+            if url.lower().startswith(entry):
+                return True
+        elif entry.startswith("."):
+            if host.endswith(entry) or host == entry[1:]:
+                return True
+        elif host == entry:
+            return True
+    return False
+
+
+def _is_public_address(address: str) -> bool:
+    ip = ipaddress.ip_address(address.split("%", 1)[0])
+    if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+async def validate_callback_url(url: str) -> None:
+    """
+    Raise CallbackURLRejected unless url is an http(s) URL allowed by the callback allowlist
+    whose host resolves only to public addresses (private ones pass with ANALYSIS_CALLBACK_ALLOW_PRIVATE).
+    """
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    if parts.scheme not in ("http", "https") or not host:
+        raise CallbackURLRejected(f"Callback URL must be an http(s) URL with a host: {url}")
+    if not _callback_host_allowed(url, host):
+        raise CallbackURLRejected(f"Callback host {host} is not in the callback allowlist")
+    if Config.ANALYSIS_CALLBACK_ALLOW_PRIVATE:
+        return
+
+    try:
+        addresses = [str(ipaddress.ip_address(host))]
+    except ValueError:
+        try:
+            infos = await asyncio.get_running_loop().getaddrinfo(
+                host, parts.port or (443 if parts.scheme == "https" else 80), type=socket.SOCK_STREAM
+            )
+        except socket.gaierror as e:
+            raise CallbackURLRejected(f"Callback host {host} could not be resolved: {e}") from e
+        addresses = [info[4][0] for info in infos]
+    if not addresses or not all(_is_public_address(address) for address in addresses):
+        raise CallbackURLRejected(f"Callback host {host} resolves to a non-public address")
+
+
+def __getattr__(name: str):
+    """
+    Resolve the former module-level agent singletons (e.g. analysis_service.hate_speech_agent)
+    lazily, so existing imports keep working without building agents at import time.
+    """
+    getters = {
+        "hate_speech_agent": get_hate_speech_agent,
+        "retriever_agent": get_retriever_agent,
+        "reasoning_agent": get_reasoning_agent,
+        "action_agent": get_action_agent,
+        "job_store": get_job_store,
+    }
+    if name in getters:
+        return getters[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def _is_fused_mode() -> bool:
+    """
+    Whether classification, query expansion and the short explanation come from one LLM call.
+    """
+    return Config.PIPELINE_MODE == "fused"
+
+def _expanded_query(classification_result: Dict) -> Optional[str]:
+    """
+    Retrieval query built from fused classification keywords, or None to let the retriever expand.
+    """
+    keywords = classification_result.get("keywords")
+    return " ".join(keywords) if keywords else None
+
+def _fused_reasoning(classification_result: Dict) -> Dict:
+    """
+    Use the fused classification's explanation as the reasoning when no policies are retrieved,
+    saving the separate reasoning call.
+    """
+    return {
+        "success": True,
+        "reasoning": classification_result["explanation"],
+        "policies_referenced": 0
+    }
 
 def analyze_text_service(text: str, include_policies: bool = True, include_reasoning: bool = True) -> Dict:
     """
@@ -26,11 +148,15 @@ def analyze_text_service(text: str, include_policies: bool = True, include_reaso
     2. Retrieve relevant policies (if requested).
     3. Generate reasoning (if requested).
     4. Recommend moderation action.
-    Returns a dictionary with all results.
+    In fused pipeline mode step 1 also produces the retrieval keywords and explanation,
+    so at most two LLM calls are made. Returns a dictionary with all results.
     """
     logger.info("Starting analysis service for text input")
     # Step 1: Classification
-    classification_result = hate_speech_agent.classify_text(text)
+    if _is_fused_mode():
+        classification_result = get_hate_speech_agent().classify_and_expand(text)
+    else:
+        classification_result = get_hate_speech_agent().classify_text(text)
     if not classification_result["success"]:
         logger.error(f"Classification failed: {classification_result['message']}")
         raise Exception(classification_result["message"])
@@ -43,17 +169,21 @@ def analyze_text_service(text: str, include_policies: bool = True, include_reaso
     # Step 2: Retrieve policies (if requested)
     if include_policies:
         logger.info("Retrieving relevant policies")
-        retrieval_result = retriever_agent.retrieve_policies(
+        retrieval_result = get_retriever_agent().retrieve_policies(
             text, 
-            classification_result["label"]
+            classification_result["label"],
+            expanded_query=_expanded_query(classification_result)
         )
         if retrieval_result["success"]:
             response_data["retrieved_policies"] = retrieval_result["documents"]
     
     # Step 3: Generate reasoning (if requested)
-    if include_reasoning:
+    if include_reasoning and _is_fused_mode() and not include_policies:
+        reasoning_result = _fused_reasoning(classification_result)
+        response_data["reasoning"] = reasoning_result["reasoning"]
+    elif include_reasoning:
         logger.info("Generating reasoning for classification")
-        reasoning_result = reasoning_agent.generate_reasoning(
+        reasoning_result = get_reasoning_agent().generate_reasoning(
             text,
             classification_result,
             response_data.get("retrieved_policies", [])
@@ -63,7 +193,7 @@ def analyze_text_service(text: str, include_policies: bool = True, include_reaso
     
     # Step 4: Recommend action
     logger.info("Recommending action based on classification and reasoning")
-    action_result = action_agent.recommend_action(
+    action_result = get_action_agent().recommend_action(
         classification_result,
         reasoning_result if include_reasoning else {}
     )
@@ -71,4 +201,363 @@ def analyze_text_service(text: str, include_policies: bool = True, include_reaso
         response_data["recommended_action"] = action_result
     
     logger.info("Analysis service completed successfully")
-    return response_data
\ No newline at end of file
+    return response_data
+
+async def _aclassify(text: str) -> Dict:
+    """
+    Classify text with the call that matches the pipeline mode.
+    """
+    agent = await aget_hate_speech_agent()
+    if _is_fused_mode():
+        return await agent.aclassify_and_expand(text)
+    return await agent.aclassify_text(text)
+
+async def _aenrich(text: str, classification_result: Dict, include_policies: bool,
+                   include_reasoning: bool) -> Tuple[Dict, Dict, List[str]]:
+    """
+    Retrieve policies and generate reasoning for a classified text (each only if requested).
+    Returns the response fields produced, the raw reasoning result, and an error message
+    for each requested stage that failed.
+    """
+    enrichment: Dict = {}
+    errors: List[str] = []
+    if include_policies:
+        logger.info("Retrieving relevant policies")
+        retriever_agent = await aget_retriever_agent()
+        retrieval_result = await retriever_agent.aretrieve_policies(
+            text,
+            classification_result["label"],
+            expanded_query=_expanded_query(classification_result)
+        )
+        if retrieval_result["success"]:
+            enrichment["retrieved_policies"] = retrieval_result["documents"]
+        else:
+            errors.append(f"retrieval: {retrieval_result.get('message', 'failed')}")
+
+    reasoning_result: Dict = {}
+    if include_reasoning and _is_fused_mode() and not include_policies:
+        reasoning_result = _fused_reasoning(classification_result)
+        enrichment["reasoning"] = reasoning_result["reasoning"]
+    elif include_reasoning:
+        logger.info("Generating reasoning for classification")
+        reasoning_agent = await aget_reasoning_agent()
+        reasoning_result = await reasoning_agent.agenerate_reasoning(
+            text,
+            classification_result,
+            enrichment.get("retrieved_policies", [])
+        )
+        if reasoning_result["success"]:
+            enrichment["reasoning"] = reasoning_result["reasoning"]
+        else:
+            errors.append(f"reasoning: {reasoning_result.get('message', 'failed')}")
+    return enrichment, reasoning_result, errors
+
+async def analyze_text_service_async(text: str, include_policies: bool = True, include_reasoning: bool = True,
+                                     classification_result: Optional[Dict] = None) -> Dict:
+    """
+    Async variant of analyze_text_service.
+    Every LLM, embedding and Qdrant call is awaited on the event loop, so a single
+    worker can keep many analyses in flight at once.
+    A precomputed classification_result (e.g. from batched classification) skips step 1.
+    """
+    logger.info("Starting async analysis service for text input")
+    # Step 1: Classification
+    if classification_result is None:
+        classification_result = await _aclassify(text)
+    if not classification_result["success"]:
+        logger.error(f"Classification failed: {classification_result['message']}")
+        raise Exception(classification_result["message"])
+
+    response_data = {
+        "classification": classification_result,
+        "timestamp": datetime.now().isoformat()
+    }
+
+    # Steps 2 and 3: Retrieve policies and generate reasoning (if requested)
+    enrichment, reasoning_result, _ = await _aenrich(text, classification_result, include_policies, include_reasoning)
+    response_data.update(enrichment)
+
+    # Step 4: Recommend action (pure CPU, no I/O)
+    logger.info("Recommending action based on classification and reasoning")
+    action_agent = await aget_action_agent()
+    action_result = action_agent.recommend_action(classification_result, reasoning_result)
+    if action_result["success"]:
+        response_data["recommended_action"] = action_result
+
+    logger.info("Async analysis service completed successfully")
+    return response_data
+
+
+async def analyze_text_stream(text: str, include_policies: bool = True,
+                              include_reasoning: bool = True) -> AsyncIterator[Dict]:
+    """
+    Analyze text and yield results as events as soon as each stage finishes:
+    classification, recommended_action, retrieved_policies, reasoning tokens, then done.
+    The action only depends on the classification, so it is sent before retrieval and reasoning.
+    A failing stage yields an error event; classification failure ends the stream.
+    """
+    logger.info("Starting streaming analysis for text input")
+    # Step 1: Classification
+    classification_result = await _aclassify(text)
+    if not classification_result["success"]:
+        logger.error(f"Classification failed: {classification_result['message']}")
+        yield {"event": "error", "data": {"stage": "classification", "message": classification_result["message"]}}
+        return
+    yield {"event": "classification", "data": classification_result}
+
+    # Step 2: Recommend action (pure CPU, no I/O)
+    action_agent = await aget_action_agent()
+    action_result = action_agent.recommend_action(classification_result, {})
+    if action_result["success"]:
+        yield {"event": "recommended_action", "data": action_result}
+
+    # Step 3: Retrieve policies (if requested)
+    retrieved_policies: List[Dict] = []
+    if include_policies:
+        retriever_agent = await aget_retriever_agent()
+        retrieval_result = await retriever_agent.aretrieve_policies(
+            text,
+            classification_result["label"],
+            expanded_query=_expanded_query(classification_result)
+        )
+        if retrieval_result["success"]:
+            retrieved_policies = retrieval_result["documents"]
+            yield {"event": "retrieved_policies", "data": retrieved_policies}
+        else:
+            yield {"event": "error", "data": {"stage": "retrieval", "message": retrieval_result["message"]}}
+
+    # Step 4: Stream reasoning tokens (if requested)
+    if include_reasoning and _is_fused_mode() and not include_policies:
+        yield {"event": "reasoning", "data": classification_result["explanation"]}
+    elif include_reasoning:
+        try:
+            reasoning_agent = await aget_reasoning_agent()
+            async for token in reasoning_agent.astream_reasoning(text, classification_result, retrieved_policies):
+                yield {"event": "reasoning", "data": token}
+        except Exception as e:
+            logger.error(f"Reasoning stream failed: {str(e)}")
+            yield {"event": "error", "data": {"stage": "reasoning", "message": str(e)}}
+
+    logger.info("Streaming analysis completed")
+    yield {"event": "done", "data": {"timestamp": datetime.now().isoformat()}}
+
+
+async def analyze_text_early(text: str, include_policies: bool = True, include_reasoning: bool = True,
+                             callback_url: Optional[str] = None) -> Dict:
+    """
+    Classify text and recommend an action, returning immediately with a job id.
+    Retrieval and reasoning run in the background; the full result can be fetched with
+    get_analysis_job, and is POSTed to callback_url when given.
+    """
+    logger.info("Starting early-return analysis for text input")
+    if callback_url:
+        await validate_callback_url(callback_url)
+    classification_result = await _aclassify(text)
+    if not classification_result["success"]:
+        logger.error(f"Classification failed: {classification_result['message']}")
+        raise Exception(classification_result["message"])
+
+    response_data = {
+        "classification": classification_result,
+        "timestamp": datetime.now().isoformat()
+    }
+    action_agent = await aget_action_agent()
+    action_result = action_agent.recommend_action(classification_result, {})
+    if action_result["success"]:
+        response_data["recommended_action"] = action_result
+
+    job_store = await aget_job_store()
+    job_id = await asyncio.to_thread(job_store.create, response_data, callback_url)
+    if include_policies or include_reasoning:
+        task = asyncio.create_task(_run_enrichment(
+            job_id, text, response_data, include_policies, include_reasoning, callback_url
+        ))
+        # Hold a reference so the task is not garbage collected before it finishes
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+        status = "pending"
+    else:
+        await asyncio.to_thread(job_store.update, job_id, "completed")
+        status = "completed"
+
+    logger.info(f"Early-return analysis {job_id} returned with status {status}")
+    return {"job_id": job_id, "status": status, **response_data}
+
+async def _run_enrichment(job_id: str, text: str, response_data: Dict, include_policies: bool,
+                          include_reasoning: bool, callback_url: Optional[str]):
+    """
+    Background part of an early-return analysis: retrieval and reasoning, then the callback.
+    The job ends "completed", "partial" (some requested stages failed; see its error) or
+    "failed". A task cancelled at shutdown marks its job failed instead of leaving it running.
+    Job store writes are SQLite, so they run on a worker thread.
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = _enrichment_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _enrichment_semaphores[loop] = asyncio.Semaphore(Config.ENRICHMENT_MAX_CONCURRENCY)
+
+    job_store = await aget_job_store()
+    try:
+        async with semaphore:
+            await asyncio.to_thread(job_store.update, job_id, "running")
+            try:
+                enrichment, _, errors = await _aenrich(
+                    text, response_data["classification"], include_policies, include_reasoning
+                )
+            except Exception as e:
+                logger.error(f"Background enrichment for analysis {job_id} failed: {str(e)}")
+                await asyncio.to_thread(job_store.update, job_id, "failed", error=str(e))
+            else:
+                status = ("partial" if enrichment else "failed") if errors else "completed"
+                error = "; ".join(errors) or None
+                await asyncio.to_thread(
+                    job_store.update, job_id, status, result={**response_data, **enrichment}, error=error
+                )
+                if errors:
+                    logger.warning(f"Background enrichment for analysis {job_id} ended {status}: {error}")
+                else:
+                    logger.info(f"Background enrichment for analysis {job_id} completed")
+    except asyncio.CancelledError:
+        logger.warning(f"Background enrichment for analysis {job_id} cancelled")
+        await asyncio.to_thread(job_store.update, job_id, "failed", error=SHUTDOWN_ERROR)
+        raise
+
+    if callback_url:
+        await _send_callback(job_id, callback_url)
+
+async def _send_callback(job_id: str, callback_url: str):
+    """
+    POST the finished job to the caller's callback URL. Failures are logged, not retried.
+    """
+    try:
+        # Checked again at send time: the host's DNS may have changed since the request
+        await validate_callback_url(callback_url)
+        async with httpx.AsyncClient(timeout=Config.ANALYSIS_CALLBACK_TIMEOUT_SECONDS) as client:
+            job = await asyncio.to_thread(get_analysis_job, job_id)
+            response = await client.post(callback_url, json=job)
+            response.raise_for_status()
+    except Exception as e:
+        logger.warning(f"Callback for analysis {job_id} to {callback_url} failed: {str(e)}")
+
+async def shutdown_background_tasks():
+    """
+    Cancel enrichment still running at shutdown and wait until each has marked its job failed.
+    """
+    tasks = list(_background_tasks)
+    if not tasks:
+        return
+    logger.info(f"Cancelling {len(tasks)} background enrichments")
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+def fail_stale_jobs() -> int:
+    """
+    Mark pending or running jobs not updated for ANALYSIS_JOB_STALE_SECONDS as failed;
+    their worker exited without finishing them (e.g. it was killed).
+    """
+    return get_job_store().fail_stale(Config.ANALYSIS_JOB_STALE_SECONDS, SHUTDOWN_ERROR)
+
+def get_analysis_job(job_id: str) -> Optional[Dict]:
+    """
+    Return the current state of an early-return analysis, or None if it is unknown or expired.
+    """
+    job = get_job_store().get(job_id)
+    if job is None:
+        return None
+    return {
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "error": job["error"],
+        **job["result"]
+    }
+
+
+async def analyze_batch_service(items: List[Dict], max_concurrency: Optional[int] = None) -> Dict:
+    """
+    Analyze a batch of texts.
+    Identical items (same text and options) are coalesced so each is analyzed once,
+    and at most max_concurrency analyses run against the LLM at a time.
+    Unique texts are classified with packed multi-text prompts (asking for retrieval keywords
+    in fused pipeline mode) before the remaining steps run.
+    Returns per-item results in input order; a failing item does not fail the batch.
+    """
+    concurrency = max(1, min(max_concurrency or Config.BATCH_MAX_CONCURRENCY, Config.BATCH_MAX_CONCURRENCY))
+    logger.info(f"Starting batch analysis for {len(items)} items (concurrency={concurrency})")
+
+    # Coalesce identical requests, remembering every input index that maps to each one
+    unique_requests: Dict[Tuple[str, bool, bool], List[int]] = {}
+    for index, item in enumerate(items):
+        key = (
+            item["text"],
+            item.get("include_policies", True),
+            item.get("include_reasoning", True),
+        )
+        unique_requests.setdefault(key, []).append(index)
+
+    semaphore = asyncio.Semaphore(concurrency)
+    keys = list(unique_requests)
+
+    # Classify each distinct text once, several texts per LLM call
+    texts = list(dict.fromkeys(key[0] for key in keys))
+    chunk_size = max(Config.CLASSIFICATION_BATCH_SIZE, 1)
+
+    mode = "fused" if _is_fused_mode() else "standard"
+
+    async def classify_chunk(chunk: List[str]) -> List[Dict]:
+        async with semaphore:
+            try:
+                agent = await aget_hate_speech_agent()
+                # The chunk holds one slot, so its per-text fallbacks run one at a time
+                return await agent.aclassify_batch(chunk, mode=mode, max_concurrency=1)
+            except Exception as e:
+                logger.warning(f"Batched classification of {len(chunk)} texts failed, classifying individually: {str(e)}")
+        # Released the slot above; each single classification takes its own
+        return list(await asyncio.gather(*(classify_one(text) for text in chunk)))
+
+    async def classify_one(text: str) -> Dict:
+        async with semaphore:
+            try:
+                return await _aclassify(text)
+            except Exception as e:
+                return {"success": False, "message": "Classification failed", "details": str(e)}
+
+    chunk_results = await asyncio.gather(
+        *(classify_chunk(texts[i:i + chunk_size]) for i in range(0, len(texts), chunk_size))
+    )
+    classifications = dict(zip(texts, (result for chunk in chunk_results for result in chunk)))
+
+    async def run(key: Tuple[str, bool, bool]) -> Dict:
+        text, include_policies, include_reasoning = key
+        async with semaphore:
+            try:
+                result = await analyze_text_service_async(
+                    text,
+                    include_policies=include_policies,
+                    include_reasoning=include_reasoning,
+                    classification_result=classifications[text]
+                )
+                return {"success": True, "result": result}
+            except Exception as e:
+                logger.error(f"Batch item analysis failed: {str(e)}")
+                return {"success": False, "error": str(e)}
+
+    outcomes = await asyncio.gather(*(run(key) for key in keys))
+
+    results: List[Optional[Dict]] = [None] * len(items)
+    for key, outcome in zip(keys, outcomes):
+        for index in unique_requests[key]:
+            results[index] = {"index": index, **outcome}
+
+    succeeded = sum(1 for result in results if result["success"])
+    logger.info(
+        f"Batch analysis completed: {len(items)} items, {len(keys)} unique, "
+        f"{succeeded} succeeded"
+    )
+    return {
+        "results": results,
+        "total": len(items),
+        "unique": len(keys),
+        "succeeded": succeeded,
+        "failed": len(items) - succeeded
+    }
@@ -1,9 +1,32 @@
 from fastapi import FastAPI, HTTPException
-from typing import Dict, List, Optional
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional
+import asyncio
+import json
 import uvicorn
 from datetime import datetime
-from .analysis_service import analyze_text_service  # Import the service function
-from ..schemas.text_schema import TextInput, AnalysisResponse  # <-- Updated import
+from .analysis_service import (  # Import the service functions
+    analyze_text_service_async,
+    analyze_text_stream,
+    analyze_text_early,
+    get_analysis_job,
+    analyze_batch_service,
+    fail_stale_jobs,
+    shutdown_background_tasks,
+    CallbackURLRejected,
+)
+from ..schemas.text_schema import (  # <-- Updated import
+    TextInput,
+    AnalysisResponse,
+    AsyncTextInput,
+    AnalysisJobResponse,
+    BatchTextInput,
+    BatchAnalysisResponse,
+)
+from .dependencies import dependency_status, warm_up
+from ..config import Config
+from ..utils.metrics import collect_request_timings, render_metrics
 from ..utils.logging_utils import setup_logging
 import logging
 from fastapi import APIRouter
@@ -12,36 +35,157 @@ from fastapi import APIRouter
 setup_logging()
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    App lifespan. Agents are built lazily on first use; with WARMUP_ON_STARTUP they are
+    built on a worker thread right after startup, so /health responds while they connect.
+    Early-return jobs left unfinished by a dead worker are marked failed at startup, and
+    enrichment still running at shutdown is cancelled with its job marked failed.
+    """
+    try:
+        await asyncio.to_thread(fail_stale_jobs)
+    except Exception as e:
+        logger.warning(f"Could not check for stale analysis jobs: {str(e)}")
+    if Config.WARMUP_ON_STARTUP:
+        logger.info("Warming up agents in the background")
+        app.state.warm_up_task = asyncio.create_task(asyncio.to_thread(warm_up))
+    yield
+    await shutdown_background_tasks()
+
 # Create FastAPI app and router
-app = FastAPI(title="Hate Speech Detection API", version="1.0.0")
+app = FastAPI(title="Hate Speech Detection API", version="1.0.0", lifespan=lifespan)
 router = APIRouter()
 
 @router.post("/analyze", response_model=AnalysisResponse)
 async def analyze_text(input_data: TextInput):
     """
     Endpoint to analyze text for hate speech and policy violations.
-    Calls the analysis service and returns the results.
+    Calls the analysis service and returns the results, with per-stage timings if requested.
     """
     logger.info("Received /analyze request")
     try:
-        response_data = analyze_text_service(
+        with collect_request_timings() as timings:
+            response_data = await analyze_text_service_async(
+                input_data.text,
+                include_policies=input_data.include_policies,
+                include_reasoning=input_data.include_reasoning
+            )
+        logger.info(f"Analysis completed successfully (timings: {timings})")
+        if input_data.include_timings:
+            response_data["timings"] = timings
+        return AnalysisResponse(**response_data)
+    except Exception as e:
+        logger.error(f"Error in /analyze endpoint: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/analyze/stream")
+async def analyze_text_streaming(input_data: TextInput):
+    """
+    Endpoint to analyze text with results streamed as Server-Sent Events.
+    Emits classification and recommended_action first, then retrieved_policies,
+    then reasoning tokens as the LLM generates them, and finally done.
+    """
+    logger.info("Received /analyze/stream request")
+    events = analyze_text_stream(
+        input_data.text,
+        include_policies=input_data.include_policies,
+        include_reasoning=input_data.include_reasoning
+    )
+    return StreamingResponse(
+        _format_sse(events),
+        media_type="text/event-stream",
+        # Keep proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def _format_sse(events: AsyncIterator[Dict]) -> AsyncIterator[str]:
+    """
+    Serialize analysis events in Server-Sent Events format.
+    """
+    try:
+        async for event in events:
+            yield f"event: {event['event']}\ndata: {json.dumps(event['data'], default=str)}\n\n"
+    except Exception as e:
+        logger.error(f"Error in /analyze/stream endpoint: {str(e)}")
+        yield f"event: error\ndata: {json.dumps({'stage': 'analysis', 'message': str(e)})}\n\n"
+
+@router.post("/analyze/async", response_model=AnalysisJobResponse, status_code=202)
+async def analyze_text_async(input_data: AsyncTextInput):
+    """
+    Endpoint to analyze text with an early return.
+    Responds with the classification, recommended action and a job id as soon as
+    classification finishes; retrieval and reasoning continue in the background.
+    """
+    logger.info("Received /analyze/async request")
+    try:
+        response_data = await analyze_text_early(
             input_data.text,
             include_policies=input_data.include_policies,
-            include_reasoning=input_data.include_reasoning
+            include_reasoning=input_data.include_reasoning,
+            callback_url=str(input_data.callback_url) if input_data.callback_url else None
         )
-        logger.info("Analysis completed successfully")
-        return AnalysisResponse(**response_data)
+        return AnalysisJobResponse(**response_data)
+    except CallbackURLRejected as e:
+        logger.warning(f"Rejected callback URL in /analyze/async request: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"Error in /analyze endpoint: {str(e)}")
+        logger.error(f"Error in /analyze/async endpoint: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/analysis/{job_id}", response_model=AnalysisJobResponse)
+async def get_analysis(job_id: str):
+    """
+    Endpoint to fetch an early-return analysis, including policies and reasoning once completed.
+    """
+    job = await asyncio.to_thread(get_analysis_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Analysis {job_id} not found")
+    return AnalysisJobResponse(**job)
+
+@router.post("/analyze/batch", response_model=BatchAnalysisResponse)
+async def analyze_batch(input_data: BatchTextInput):
+    """
+    Endpoint to analyze a batch of texts in one request.
+    Identical texts are analyzed once; results are returned in input order with per-item errors.
+    """
+    logger.info(f"Received /analyze/batch request with {len(input_data.items)} items")
+    if len(input_data.items) > Config.BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: {len(input_data.items)} items (max {Config.BATCH_MAX_ITEMS})"
+        )
+    try:
+        response_data = await analyze_batch_service(
+            [item.model_dump() for item in input_data.items],
+            max_concurrency=input_data.max_concurrency
+        )
+        logger.info("Batch analysis completed successfully")
+        return BatchAnalysisResponse(**response_data)
+    except Exception as e:
+        logger.error(f"Error in /analyze/batch endpoint: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/health")
 async def health_check():
     """
     Health check endpoint to verify API is running.
+    Reports each agent's initialization status without connecting to anything.
     """
     logger.info("Health check requested")
-    return {"status": "healthy", "timestamp": datetime.now().isoformat()}
+    return {
+        "status": "healthy",
+        "timestamp": datetime.now().isoformat(),
+        "dependencies": dependency_status()
+    }
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Prometheus metrics: per-stage latency histograms and counters for LLM tokens,
+    retries, cache lookups, pre-filter decisions and agent errors.
+    """
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
 
 # Register router with the app
 app.include_router(router)
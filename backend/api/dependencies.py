@@ -0,0 +1,172 @@
+import asyncio
+import threading
+import weakref
+from typing import Any, Callable, Dict
+from ..utils.logging_utils import setup_logging
+import logging
+
+# Set up logging for this module
+setup_logging()
+logger = logging.getLogger(__name__)
+
+class LazyResource:
+    """
+    Process-wide object built on first use by factory.
+    The factory is where heavy modules (openai, langchain, qdrant_client) are imported,
+    so importing the API stays cheap. A failed build is not cached; the next caller retries,
+    which lets the app start and serve /health while e.g. Qdrant is still unreachable.
+    Async code uses aget, which builds on a worker thread so the event loop never blocks on it.
+    """
+    def __init__(self, name: str, factory: Callable[[], Any]):
+        self.name = name
+        self.factory = factory
+        self.instance = None
+        self.status = "not_loaded"
+        self._lock = threading.Lock()
+        # asyncio locks belong to one event loop, so keep one per loop
+        self._async_locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def get(self) -> Any:
+        """
+        Return the instance, building it if needed.
+        """
+        if self.instance is None:
+            with self._lock:
+                if self.instance is None:
+                    self.status = "loading"
+                    try:
+                        self.instance = self.factory()
+                    except Exception as e:
+                        self.status = "failed"
+                        logger.error(f"Failed to initialize {self.name}: {str(e)}")
+                        raise
+                    self.status = "ready"
+                    logger.info(f"Initialized {self.name}")
+        return self.instance
+
+    async def aget(self) -> Any:
+        """
+        Async variant of get. The build (or the wait for one already running, e.g. warm-up)
+        happens on a worker thread; coroutines of the same loop wait on an asyncio.Lock
+        instead of each tying up a thread.
+        """
+        if self.instance is not None:
+            return self.instance
+        loop = asyncio.get_running_loop()
+        lock = self._async_locks.get(loop)
+        if lock is None:
+            lock = self._async_locks[loop] = asyncio.Lock()
+        async with lock:
+            if self.instance is None:
+                return await asyncio.to_thread(self.get)
+        return self.instance
+
+
+def _build_hate_speech_agent():
+    from ..agents.hate_speech_agent import HateSpeechDetectionAgent
+    return HateSpeechDetectionAgent()
+
+def _build_retriever_agent():
+    from ..agents.retriever_agent import HybridRetrieverAgent
+    return HybridRetrieverAgent()
+
+def _build_reasoning_agent():
+    from ..agents.reasoning_agent import PolicyReasoningAgent
+    return PolicyReasoningAgent()
+
+def _build_action_agent():
+    from ..agents.action_agent import ActionRecommenderAgent
+    return ActionRecommenderAgent()
+
+def _build_job_store():
+    from ..utils.job_store import AnalysisJobStore
+    return AnalysisJobStore()
+
+
+_resources: Dict[str, LazyResource] = {
+    "hate_speech_agent": LazyResource("hate_speech_agent", _build_hate_speech_agent),
+    "retriever_agent": LazyResource("retriever_agent", _build_retriever_agent),
+    "reasoning_agent": LazyResource("reasoning_agent", _build_reasoning_agent),
+    "action_agent": LazyResource("action_agent", _build_action_agent),
+    "job_store": LazyResource("job_store", _build_job_store),
+}
+
+def get_hate_speech_agent():
+    """
+    Return the shared HateSpeechDetectionAgent.
+    """
+    return _resources["hate_speech_agent"].get()
+
+def get_retriever_agent():
+    """
+    Return the shared HybridRetrieverAgent (connects to the vector store on first use).
+    """
+    return _resources["retriever_agent"].get()
+
+def get_reasoning_agent():
+    """
+    Return the shared PolicyReasoningAgent.
+    """
+    return _resources["reasoning_agent"].get()
+
+def get_action_agent():
+    """
+    Return the shared ActionRecommenderAgent.
+    """
+    return _resources["action_agent"].get()
+
+def get_job_store():
+    """
+    Return the shared AnalysisJobStore for early-return analyses.
+    """
+    return _resources["job_store"].get()
+
+async def aget_hate_speech_agent():
+    """
+    Return the shared HateSpeechDetectionAgent without blocking the event loop.
+    """
+    return await _resources["hate_speech_agent"].aget()
+
+async def aget_retriever_agent():
+    """
+    Return the shared HybridRetrieverAgent without blocking the event loop.
+    """
+    return await _resources["retriever_agent"].aget()
+
+async def aget_reasoning_agent():
+    """
+    Return the shared PolicyReasoningAgent without blocking the event loop.
+    """
+    return await _resources["reasoning_agent"].aget()
+
+async def aget_action_agent():
+    """
+    Return the shared ActionRecommenderAgent without blocking the event loop.
+    """
+    return await _resources["action_agent"].aget()
+
+async def aget_job_store():
+    """
+    Return the shared AnalysisJobStore without blocking the event loop.
+    """
+    return await _resources["job_store"].aget()
+
+def warm_up():
+    """
+    Build every resource now instead of on the first request.
+    Failures are logged and left for the first request to retry.
+    """
+    for resource in _resources.values():
+        try:
+            resource.get()
+        except Exception:
+            pass
+    logger.info(f"Warm-up finished: {dependency_status()}")
+
+def dependency_status() -> Dict[str, str]:
+    """
+    Return the initialization status of each resource without building any of them.
+    """
+    return {name: resource.status for name, resource in _resources.items()}
@@ -17,14 +17,162 @@ class Config:
     DIAL_API_VERSION = os.getenv("your-api-version")
     DEPLOYMENT_NAME = "gpt-4o-mini-2024-07-18"
     EMBEDDING_MODEL = "text-embedding-3-small-1"
+    EMBEDDING_DIMENSION = int(os.getenv("EMBEDDING_DIMENSION", "1536"))
+
+    # Shared LLM gateway: connection pool, timeouts, concurrency and retry settings
+    LLM_HTTP2 = os.getenv("LLM_HTTP2", "true").lower() == "true"
+    LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+    LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "50"))
+    LLM_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("LLM_KEEPALIVE_EXPIRY_SECONDS", "120"))
+    LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+    LLM_CONNECT_TIMEOUT_SECONDS = float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "5"))
+    LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "64"))
+    LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+    LLM_BACKOFF_BASE_SECONDS = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "0.5"))
+    LLM_BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "20"))
+
+    # Rate limiting per deployment (requests and tokens per minute) and adaptive concurrency
+    LLM_DEFAULT_RPM = int(os.getenv("LLM_DEFAULT_RPM", "600"))
+    LLM_DEFAULT_TPM = int(os.getenv("LLM_DEFAULT_TPM", "200000"))
+    LLM_RATE_LIMITS: Dict[str, Dict[str, int]] = {
+        DEPLOYMENT_NAME: {
+            "rpm": int(os.getenv("LLM_RPM_LIMIT", str(LLM_DEFAULT_RPM))),
+            "tpm": int(os.getenv("LLM_TPM_LIMIT", str(LLM_DEFAULT_TPM))),
+        },
+    }
+    LLM_DEFAULT_COMPLETION_TOKENS = int(os.getenv("LLM_DEFAULT_COMPLETION_TOKENS", "400"))
+    LLM_INITIAL_CONCURRENCY = int(os.getenv("LLM_INITIAL_CONCURRENCY", "16"))
+    LLM_MIN_CONCURRENCY = int(os.getenv("LLM_MIN_CONCURRENCY", "1"))
+    LLM_LATENCY_TARGET_SECONDS = float(os.getenv("LLM_LATENCY_TARGET_SECONDS", "8"))
+    LLM_MAX_QUEUE_SECONDS = float(os.getenv("LLM_MAX_QUEUE_SECONDS", "30"))
+
+    # Embedding backend: "azure" (remote) or "sentence-transformers" (local CPU)
+    EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "azure")
+    LOCAL_EMBEDDING_MODEL = os.getenv("LOCAL_EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+    LOCAL_EMBEDDING_DEVICE = os.getenv("LOCAL_EMBEDDING_DEVICE", "cpu")
+    LOCAL_EMBEDDING_BATCH_SIZE = int(os.getenv("LOCAL_EMBEDDING_BATCH_SIZE", "64"))
+    LOCAL_EMBEDDING_RUNTIME = os.getenv("LOCAL_EMBEDDING_RUNTIME", "torch")  # torch or onnx
+    LOCAL_EMBEDDING_QUANTIZE = os.getenv("LOCAL_EMBEDDING_QUANTIZE", "false").lower() == "true"
+    LOCAL_EMBEDDING_ONNX_FILE = os.getenv("LOCAL_EMBEDDING_ONNX_FILE", "onnx/model_qint8_avx512_vnni.onnx")
+
+    # Embedding cache (memory-mapped float32 vectors + SQLite index, shared by all workers)
+    EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+    EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "logs/embedding_cache")
+    EMBEDDING_CACHE_CAPACITY = int(os.getenv("EMBEDDING_CACHE_CAPACITY", "20000"))
+    EMBEDDING_CACHE_EVICTION = os.getenv("EMBEDDING_CACHE_EVICTION", "lru")  # lru, fifo or none
+    # LRU read times are buffered in memory and written to the index at most this often
+    EMBEDDING_CACHE_TOUCH_INTERVAL_SECONDS = float(os.getenv("EMBEDDING_CACHE_TOUCH_INTERVAL_SECONDS", "5"))
+    # Written vectors are msync'ed to disk at most this often (other workers see them immediately)
+    EMBEDDING_CACHE_FLUSH_SECONDS = float(os.getenv("EMBEDDING_CACHE_FLUSH_SECONDS", "30"))
     
     # Qdrant Configuration
     QDRANT_URL = "localhost"
     QDRANT_PORT = 6333
     COLLECTION_NAME = "policy_data"
+    # In-process Qdrant instead of a server: ":memory:" or a local directory (tests, benchmarks)
+    QDRANT_LOCATION = os.getenv("QDRANT_LOCATION")
+    # gRPC transport (docker-compose exposes it on 6334); REST stays on QDRANT_PORT
+    QDRANT_PREFER_GRPC = os.getenv("QDRANT_PREFER_GRPC", "false").lower() == "true"
+    QDRANT_GRPC_PORT = int(os.getenv("QDRANT_GRPC_PORT", "6334"))
+    # HNSW graph settings applied at collection creation and by optimize_index;
+    # QDRANT_SEARCH_EF of 0 uses the server default (ef_construct)
+    QDRANT_HNSW_M = int(os.getenv("QDRANT_HNSW_M", "16"))
+    QDRANT_HNSW_EF_CONSTRUCT = int(os.getenv("QDRANT_HNSW_EF_CONSTRUCT", "100"))
+    QDRANT_SEARCH_EF = int(os.getenv("QDRANT_SEARCH_EF", "0"))
+    # Vector quantization: "none", "scalar" (int8, ~4x less RAM) or "binary" (~32x, needs rescoring)
+    QDRANT_QUANTIZATION = os.getenv("QDRANT_QUANTIZATION", "none")
+    QDRANT_QUANTIZATION_ALWAYS_RAM = os.getenv("QDRANT_QUANTIZATION_ALWAYS_RAM", "true").lower() == "true"
+    QDRANT_QUANTIZATION_RESCORE = os.getenv("QDRANT_QUANTIZATION_RESCORE", "true").lower() == "true"
+    QDRANT_QUANTIZATION_OVERSAMPLING = float(os.getenv("QDRANT_QUANTIZATION_OVERSAMPLING", "2.0"))
+    # Keep full-precision vectors on disk (useful with quantized vectors held in RAM)
+    QDRANT_VECTORS_ON_DISK = os.getenv("QDRANT_VECTORS_ON_DISK", "false").lower() == "true"
+
+    # Vector store: "qdrant" (server) or "numpy" (in-process index for small corpora)
+    VECTOR_STORE = os.getenv("VECTOR_STORE", "qdrant")
+    NUMPY_STORE_PATH = os.getenv("NUMPY_STORE_PATH", "logs/numpy_index")
+    # How often each worker checks whether another process saved a newer index (negative disables)
+    NUMPY_STORE_REFRESH_SECONDS = float(os.getenv("NUMPY_STORE_REFRESH_SECONDS", "5"))
+    SCROLL_PAGE_SIZE = int(os.getenv("SCROLL_PAGE_SIZE", "256"))
+
+    # Pipeline mode: "standard" (classify, expand and reason in separate calls) or
+    # "fused" (one call returns label, explanation and retrieval keywords)
+    PIPELINE_MODE = os.getenv("PIPELINE_MODE", "standard")
+
+    # Production launcher (python -m backend.serve); 0 workers means one per CPU
+    SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+    SERVER_PORT = int(os.getenv("SERVER_PORT", "8000"))
+    SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", "0"))
+    SERVER_GRACEFUL_TIMEOUT_SECONDS = float(os.getenv("SERVER_GRACEFUL_TIMEOUT_SECONDS", "30"))
+    # Directory where backend.serve workers publish metric snapshots so /metrics sums all workers
+    # (a fresh temporary directory per launch when unset)
+    METRICS_MULTIPROC_DIR = os.getenv("METRICS_MULTIPROC_DIR")
+    METRICS_SNAPSHOT_SECONDS = float(os.getenv("METRICS_SNAPSHOT_SECONDS", "1"))
+
+    # Build agents in the background at startup instead of on the first request
+    WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "false").lower() == "true"
+
+    # Early-return analysis: classification and action are returned at once, while
+    # retrieval and reasoning finish in the background under a job id
+    ANALYSIS_JOB_STORE_PATH = os.getenv("ANALYSIS_JOB_STORE_PATH", "logs/analysis_jobs.sqlite")
+    ANALYSIS_JOB_TTL_SECONDS = float(os.getenv("ANALYSIS_JOB_TTL_SECONDS", "86400"))
+    # Pending/running jobs untouched this long are marked failed at startup (their worker died)
+    ANALYSIS_JOB_STALE_SECONDS = float(os.getenv("ANALYSIS_JOB_STALE_SECONDS", "900"))
+    ENRICHMENT_MAX_CONCURRENCY = int(os.getenv("ENRICHMENT_MAX_CONCURRENCY", "16"))
+    ANALYSIS_CALLBACK_TIMEOUT_SECONDS = float(os.getenv("ANALYSIS_CALLBACK_TIMEOUT_SECONDS", "10"))
+    # Callback URLs must match one of these hosts (".example.com" also matches subdomains) or
+    # URL prefixes ("https://hooks.example.com/"); empty allows any public host
+    ANALYSIS_CALLBACK_ALLOWLIST = [h.strip() for h in os.getenv("ANALYSIS_CALLBACK_ALLOWLIST", "").split(",") if h.strip()]
+    # Callbacks to loopback, link-local and private addresses are refused unless this is set
+    ANALYSIS_CALLBACK_ALLOW_PRIVATE = os.getenv("ANALYSIS_CALLBACK_ALLOW_PRIVATE", "false").lower() == "true"
+
+    # Retrieval Configuration
+    RETRIEVER_MAX_WORKERS = int(os.getenv("RETRIEVER_MAX_WORKERS", "8"))
+    # BM25 keyword search fused with vector search; LLM query expansion is an optional extra branch
+    RETRIEVER_LEXICAL_SEARCH = os.getenv("RETRIEVER_LEXICAL_SEARCH", "true").lower() == "true"
+    RETRIEVER_QUERY_EXPANSION = os.getenv("RETRIEVER_QUERY_EXPANSION", "false").lower() == "true"
+    BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+    BM25_B = float(os.getenv("BM25_B", "0.75"))
+    BM25_REFRESH_SECONDS = float(os.getenv("BM25_REFRESH_SECONDS", "60"))
+    RRF_K = int(os.getenv("RRF_K", "60"))
+    # Candidates fetched per branch, documents returned, and optional MMR diversification
+    # (lambda 1.0 = pure relevance, lower values penalize near-duplicate policy chunks)
+    RETRIEVER_CANDIDATES = int(os.getenv("RETRIEVER_CANDIDATES", "5"))
+    RETRIEVER_TOP_K = int(os.getenv("RETRIEVER_TOP_K", "5"))
+    RETRIEVER_MMR_ENABLED = os.getenv("RETRIEVER_MMR_ENABLED", "false").lower() == "true"
+    RETRIEVER_MMR_LAMBDA = float(os.getenv("RETRIEVER_MMR_LAMBDA", "0.7"))
+    # Concurrent async vector searches arriving within this window share one batched request
+    VECTOR_SEARCH_COALESCE_MS = float(os.getenv("VECTOR_SEARCH_COALESCE_MS", "2"))
+    VECTOR_SEARCH_MAX_BATCH = int(os.getenv("VECTOR_SEARCH_MAX_BATCH", "64"))
+
+    # Batch Analysis Configuration
+    BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "10000"))
+    BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "32"))
     
     # Classification Labels
     CLASSIFICATION_LABELS = ["Hate", "Toxic", "Offensive", "Neutral", "Ambiguous"]
+
+    # Batched classification: texts per prompt and max length of a text that may be packed
+    CLASSIFICATION_BATCH_SIZE = int(os.getenv("CLASSIFICATION_BATCH_SIZE", "20"))
+    CLASSIFICATION_BATCH_MAX_CHARS = int(os.getenv("CLASSIFICATION_BATCH_MAX_CHARS", "1000"))
+    # Single-text calls run at a time when items of a batched classification are retried one by one
+    CLASSIFICATION_FALLBACK_CONCURRENCY = int(os.getenv("CLASSIFICATION_FALLBACK_CONCURRENCY", "4"))
+
+    # CPU pre-filter that answers confidently neutral texts without an LLM call
+    PREFILTER_ENABLED = os.getenv("PREFILTER_ENABLED", "false").lower() == "true"
+    PREFILTER_MODEL_PATH = os.getenv("PREFILTER_MODEL_PATH", "models/prefilter.npy")
+    PREFILTER_LEXICON_PATH = os.getenv("PREFILTER_LEXICON_PATH")
+    PREFILTER_THRESHOLD = float(os.getenv("PREFILTER_THRESHOLD", "0.97"))
+    PREFILTER_NGRAM_FEATURES = int(os.getenv("PREFILTER_NGRAM_FEATURES", str(2 ** 18)))
+
+    # Classification result cache; bump the prompt version whenever classification prompts change
+    CLASSIFICATION_PROMPT_VERSION = "1"
+    CLASSIFICATION_CACHE_ENABLED = os.getenv("CLASSIFICATION_CACHE_ENABLED", "true").lower() == "true"
+    CLASSIFICATION_CACHE_MAX_ENTRIES = int(os.getenv("CLASSIFICATION_CACHE_MAX_ENTRIES", "50000"))
+    CLASSIFICATION_CACHE_TTL_SECONDS = float(os.getenv("CLASSIFICATION_CACHE_TTL_SECONDS", "86400"))
+    CLASSIFICATION_CACHE_PATH = os.getenv("CLASSIFICATION_CACHE_PATH")  # e.g. logs/cache/classification.sqlite
+    CLASSIFICATION_CACHE_DISK_MAX_ENTRIES = int(os.getenv("CLASSIFICATION_CACHE_DISK_MAX_ENTRIES", "1000000"))
+    # Disk-tier access times (for size-bound eviction) are buffered and written at most this often
+    CLASSIFICATION_CACHE_ACCESS_FLUSH_SECONDS = float(os.getenv("CLASSIFICATION_CACHE_ACCESS_FLUSH_SECONDS", "30"))
     
     # Action Mappings for moderation recommendations
     ACTION_MAPPINGS = {
@@ -36,4 +184,35 @@ class Config:
     }
     
     # Data Paths for policy documents
-    POLICY_DOCS_PATH = "data/policy_data/"
\ No newline at end of file
+    POLICY_DOCS_PATH = "data/policy_data/"
+
+    # Policy ingestion: chunk size in characters, texts per embedding call, points per upsert
+    INGEST_CHUNK_SIZE = int(os.getenv("INGEST_CHUNK_SIZE", "800"))
+    INGEST_EMBED_BATCH_SIZE = int(os.getenv("INGEST_EMBED_BATCH_SIZE", "256"))
+    INGEST_UPSERT_BATCH_SIZE = int(os.getenv("INGEST_UPSERT_BATCH_SIZE", "128"))
+
+    # Policy metadata stored in every chunk payload (keyed by file name without extension);
+    # files not listed here get POLICY_DEFAULT_METADATA
+    POLICY_DEFAULT_METADATA = {"category": "platform", "jurisdiction": "global"}
+    POLICY_DOC_METADATA = {
+        "google_policy": {"category": "platform", "jurisdiction": "global"},
+        "meta_policy": {"category": "platform", "jurisdiction": "global"},
+        "reddit_policy": {"category": "platform", "jurisdiction": "global"},
+        "twitter_policy": {"category": "platform", "jurisdiction": "global"},
+        "ipc_section": {"category": "law", "jurisdiction": "IN"},
+        "us_hate_law_policy": {"category": "law", "jurisdiction": "US"},
+    }
+    # Payload fields indexed in Qdrant so filtered searches only visit matching points
+    PAYLOAD_INDEX_FIELDS = ["source", "category", "jurisdiction"]
+
+    # Policy subsets searched for each label ({} searches everything). Laws are only
+    # consulted for labels that may be unlawful; milder labels use platform policies.
+    LABEL_POLICY_FILTERS = {
+        "Hate": {},
+        "Toxic": {},
+        "Offensive": {"category": ["platform"]},
+        "Neutral": {"category": ["platform"]},
+        "Ambiguous": {},
+    }
+    # Comma-separated jurisdictions searched besides "global" (empty searches every jurisdiction)
+    RETRIEVER_JURISDICTIONS = [j.strip() for j in os.getenv("RETRIEVER_JURISDICTIONS", "").split(",") if j.strip()]
@@ -0,0 +1,33 @@
+import argparse
+import json
+import logging
+from .config import Config
+from .utils.logging_utils import setup_logging
+from .utils.policy_ingestion import PolicyIngestor
+
+# Initialize logging for the ingestion command
+setup_logging()
+logger = logging.getLogger(__name__)
+
+def main(argv=None):
+    """
+    Command-line entry point: python -m backend.ingest [--path DIR] [--force] [--no-prune] [--optimize]
+    """
+    parser = argparse.ArgumentParser(description="Chunk, embed and index policy documents")
+    parser.add_argument("--path", default=Config.POLICY_DOCS_PATH, help="Directory containing policy files")
+    parser.add_argument("--force", action="store_true", help="Re-embed every chunk even if unchanged")
+    parser.add_argument("--no-prune", action="store_true", help="Keep points for deleted files and chunks")
+    parser.add_argument("--optimize", action="store_true",
+                        help="Apply the configured HNSW/quantization settings to the collection afterwards")
+    args = parser.parse_args(argv)
+
+    logger.info(f"Ingesting policies from {args.path}")
+    ingestor = PolicyIngestor(policy_path=args.path)
+    stats = ingestor.ingest(force=args.force, prune=not args.no_prune)
+    if args.optimize:
+        stats["optimize"] = ingestor.store.optimize_index()
+    print(json.dumps(stats, indent=2))
+    return stats
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,7 @@ from .api.api_main import analyze_text, health_check  # Import the endpoints
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from .api.api_main import router as analyze_router  # <-- Import the router
+from .api.api_main import lifespan
 
 # Initialize logging for the backend
 setup_logging()
@@ -15,7 +16,8 @@ logger = logging.getLogger(__name__)
 app = FastAPI(
     title="Hate Speech Detection API",
     description="API for hate speech detection and policy retrieval",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Enable CORS for all origins (for frontend-backend communication)
@@ -41,7 +43,12 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "analyze": "/analyze",
-            "health": "/health"
+            "analyze_batch": "/analyze/batch",
+            "analyze_stream": "/analyze/stream",
+            "analyze_async": "/analyze/async",
+            "analysis": "/analysis/{job_id}",
+            "health": "/health",
+            "metrics": "/metrics"
             # Add more as you modularize
         }
     }
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, HttpUrl
 from typing import Dict, List, Optional
 
 class TextInput(BaseModel):
@@ -8,14 +8,70 @@ class TextInput(BaseModel):
     text: str
     include_policies: bool = True
     include_reasoning: bool = True
+    include_timings: bool = False
 
 class AnalysisResponse(BaseModel):
     """
     Schema for the response from the /analyze endpoint.
     Includes classification, policies, reasoning, recommended action, and timestamp.
+    timings (per-stage milliseconds) is set only when the request asked for it.
     """
     classification: Dict
     retrieved_policies: Optional[List[Dict]] = None
     reasoning: Optional[str] = None
     recommended_action: Optional[Dict] = None
-    timestamp: str
\ No newline at end of file
+    timestamp: str
+    timings: Optional[Dict[str, float]] = None
+
+class AsyncTextInput(TextInput):
+    """
+    Schema for text input to the /analyze/async endpoint.
+    The finished analysis is POSTed to callback_url, if given. The URL must pass the
+    callback allowlist and may not point at loopback, link-local or private addresses
+    unless ANALYSIS_CALLBACK_ALLOW_PRIVATE is set.
+    """
+    callback_url: Optional[HttpUrl] = None
+
+class AnalysisJobResponse(BaseModel):
+    """
+    Schema for an early-return analysis job.
+    Classification and action are set from the start; policies and reasoning
+    are filled in once the job status is "completed". A "partial" job has whichever of
+    them succeeded, with the failed stages described in error.
+    """
+    job_id: str
+    status: str
+    classification: Dict
+    recommended_action: Optional[Dict] = None
+    retrieved_policies: Optional[List[Dict]] = None
+    reasoning: Optional[str] = None
+    error: Optional[str] = None
+    timestamp: str
+
+class BatchTextInput(BaseModel):
+    """
+    Schema for a batch of text inputs to the /analyze/batch endpoint.
+    Identical items are analyzed once and the result is shared.
+    """
+    items: List[TextInput]
+    max_concurrency: Optional[int] = None
+
+class BatchItemResult(BaseModel):
+    """
+    Schema for the result of a single item in a batch, in input order.
+    Either result or error is set depending on success.
+    """
+    index: int
+    success: bool
+    result: Optional[AnalysisResponse] = None
+    error: Optional[str] = None
+
+class BatchAnalysisResponse(BaseModel):
+    """
+    Schema for the response from the /analyze/batch endpoint.
+    """
+    results: List[BatchItemResult]
+    total: int
+    unique: int
+    succeeded: int
+    failed: int
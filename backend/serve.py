@@ -0,0 +1,228 @@
+import argparse
+import glob
+import importlib
+import os
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+from .config import Config
+from .utils.logging_utils import setup_logging
+import logging
+
+# Initialize logging for the production launcher
+setup_logging()
+logger = logging.getLogger(__name__)
+
+# Modules imported once in the master so forked workers share their memory copy-on-write
+PRELOAD_MODULES = [
+    "numpy",
+    "openai",
+    "httpx",
+    "langchain_openai",
+    "qdrant_client",
+    "backend.agents.hate_speech_agent",
+    "backend.agents.prefilter_agent",
+    "backend.agents.retriever_agent",
+    "backend.agents.reasoning_agent",
+    "backend.agents.action_agent",
+]
+
+def preload():
+    """
+    Import the app and the heavy SDKs before forking.
+    Nothing that holds connections, threads or SQLite handles is created here; agents are
+    still built per worker. Read-only state such as the numpy policy index, the pre-filter
+    weights and the embedding cache is opened with mmap by each worker, so the OS page
+    cache shares a single copy of it across all of them.
+    """
+    for module in PRELOAD_MODULES:
+        try:
+            importlib.import_module(module)
+        except ImportError as e:
+            logger.warning(f"Could not preload {module}: {str(e)}")
+    from .main import app
+    return app
+
+def create_socket(host: str, port: int, backlog: int) -> socket.socket:
+    """
+    Bind the listening socket in the master; every worker accepts on the same socket.
+    """
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def prepare_metrics_dir(directory: Optional[str]) -> str:
+    """
+    Return an empty directory for worker metric snapshots. Snapshots from a previous launch
+    are removed, so counters restart from zero as Prometheus expects after a restart.
+    """
+    if not directory:
+        return tempfile.mkdtemp(prefix="hate_speech_metrics_")
+    os.makedirs(directory, exist_ok=True)
+    for path in glob.glob(os.path.join(directory, "metrics_*.json*")):
+        os.remove(path)
+    return directory
+
+
+class WorkerPool:
+    """
+    Prefork supervisor: runs N uvicorn workers in separate processes on one shared socket,
+    restarts workers that exit unexpectedly, and drains them gracefully on SIGTERM/SIGINT.
+    Each worker has its own GIL, so JSON parsing, regex cleaning and local inference use all cores.
+    Workers publish metric snapshots to metrics_dir, so /metrics on any of them reports totals.
+    POSIX only (relies on os.fork).
+    """
+    def __init__(self, app, sock: socket.socket, workers: int, graceful_timeout: float, uvicorn_options: Dict,
+                 metrics_dir: Optional[str] = None):
+        self.app = app
+        self.sock = sock
+        self.workers = workers
+        self.graceful_timeout = graceful_timeout
+        self.uvicorn_options = uvicorn_options
+        self.metrics_dir = metrics_dir
+        self.children: Dict[int, int] = {}  # pid -> worker number
+        self.shutting_down = False
+
+    def run(self):
+        """
+        Start the workers and supervise them until shutdown.
+        """
+        signal.signal(signal.SIGTERM, self._handle_shutdown)
+        signal.signal(signal.SIGINT, self._handle_shutdown)
+        for number in range(self.workers):
+            self._spawn(number)
+        logger.info(f"Serving with {self.workers} workers (master pid {os.getpid()})")
+
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+            number = self.children.pop(pid, None)
+            if number is None:
+                continue
+            if self.shutting_down:
+                logger.info(f"Worker {number} (pid {pid}) exited")
+            else:
+                logger.warning(f"Worker {number} (pid {pid}) died with status {status}; restarting")
+                # Avoid a tight respawn loop when workers crash at startup
+                time.sleep(1.0)
+                self._spawn(number)
+        signal.alarm(0)
+        self.sock.close()
+        logger.info("All workers stopped")
+
+    def _spawn(self, number: int):
+        """
+        Fork one worker process.
+        """
+        pid = os.fork()
+        if pid:
+            self.children[pid] = number
+            return
+        # Child: restore default handlers so uvicorn installs its own graceful-shutdown handlers
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        exit_code = 0
+        try:
+            self._run_worker()
+        except BaseException as e:
+            logger.error(f"Worker {number} failed: {str(e)}")
+            exit_code = 1
+        finally:
+            # Keep this worker's final counts in the totals after it exits
+            from .utils.metrics import write_snapshot
+            write_snapshot()
+            os._exit(exit_code)
+
+    def _run_worker(self):
+        """
+        Run a uvicorn server on the inherited socket until it is told to stop.
+        """
+        import uvicorn
+        from .utils.metrics import enable_multiprocess
+
+        if self.metrics_dir:
+            enable_multiprocess(self.metrics_dir)
+        config = uvicorn.Config(
+            self.app,
+            lifespan="on",
+            timeout_graceful_shutdown=int(self.graceful_timeout),
+            **self.uvicorn_options,
+        )
+        uvicorn.Server(config).run(sockets=[self.sock])
+
+    def _handle_shutdown(self, signum, frame):
+        """
+        Forward the signal so each worker stops accepting and finishes in-flight requests;
+        kill any worker still running after the graceful timeout.
+        """
+        if self.shutting_down:
+            return
+        self.shutting_down = True
+        logger.info(f"Received signal {signum}; draining {len(self.children)} workers")
+        for pid in list(self.children):
+            self._signal(pid, signal.SIGTERM)
+        signal.signal(signal.SIGALRM, self._handle_timeout)
+        signal.alarm(max(int(self.graceful_timeout) + 5, 1))
+
+    def _handle_timeout(self, signum, frame):
+        for pid in list(self.children):
+            logger.warning(f"Worker pid {pid} did not stop in time; killing it")
+            self._signal(pid, signal.SIGKILL)
+
+    @staticmethod
+    def _signal(pid: int, signum: int):
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+
+def main(argv: List[str] = None):
+    """
+    Command-line entry point: python -m backend.serve [--host HOST] [--port PORT] [--workers N]
+    """
+    parser = argparse.ArgumentParser(description="Run the API with multiple worker processes")
+    parser.add_argument("--host", default=Config.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=Config.SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=Config.SERVER_WORKERS or os.cpu_count() or 1,
+                        help="Worker processes (default: SERVER_WORKERS or the CPU count)")
+    parser.add_argument("--graceful-timeout", type=float, default=Config.SERVER_GRACEFUL_TIMEOUT_SECONDS,
+                        help="Seconds workers get to finish in-flight requests on shutdown")
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--metrics-dir", default=Config.METRICS_MULTIPROC_DIR,
+                        help="Directory for per-worker metric snapshots (default: a temporary directory)")
+    args = parser.parse_args(argv)
+
+    if not hasattr(os, "fork"):
+        sys.exit("backend.serve needs os.fork; use `uvicorn backend.main:app --workers N` on this platform")
+
+    app = preload()
+    metrics_dir = prepare_metrics_dir(args.metrics_dir)
+    sock = create_socket(args.host, args.port, args.backlog)
+    logger.info(f"Listening on {args.host}:{args.port}")
+    WorkerPool(
+        app,
+        sock,
+        workers=max(args.workers, 1),
+        graceful_timeout=args.graceful_timeout,
+        uvicorn_options={"log_level": args.log_level, "backlog": args.backlog},
+        metrics_dir=metrics_dir,
+    ).run()
+    if not args.metrics_dir:
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
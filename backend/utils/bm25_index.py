@@ -0,0 +1,227 @@
+import hashlib
+import json
+import re
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+import numpy as np
+from backend.config import Config
+from ..utils.logging_utils import setup_logging
+from ..utils.vector_stores import matches_filters
+import logging
+
+# Set up logging for this module
+setup_logging()
+logger = logging.getLogger(__name__)
+
+# Words, numbers and alphanumeric codes such as "153a" (IPC 153A) or "66a" (IT Act 66A)
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were "
+    "will with which who whom their there these those such any all not no".split()
+)
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercase a text and split it into word tokens, dropping stopwords.
+    """
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    In-memory BM25 index over policy chunks.
+    Postings are stored term by term in flat arrays (CSR layout): term_offsets[t]:term_offsets[t + 1]
+    slices postings_docs (int32 row numbers) and postings_weights (float32). Each weight is the
+    precomputed BM25 contribution idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * dl / avgdl)),
+    so a query is a few array slices added into one score vector.
+    """
+    def __init__(self, k1: float = Config.BM25_K1, b: float = Config.BM25_B):
+        self.k1 = k1
+        self.b = b
+        self.vocabulary: Dict[str, int] = {}
+        self.term_offsets = np.zeros(1, dtype=np.int64)
+        self.postings_docs = np.zeros(0, dtype=np.int32)
+        self.postings_weights = np.zeros(0, dtype=np.float32)
+        self._documents: List[Dict[str, Any]] = []
+        # Filterable payload fields (source, category, jurisdiction) per document row
+        self._metadata: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    @classmethod
+    def from_store(cls, store, **kwargs) -> "BM25Index":
+        """
+        Build an index over every chunk in a vector store (QdrantOpenAIStore or NumpyVectorStore).
+        """
+        index = cls(**kwargs)
+        fields = ["content", "chunk_id", "content_hash"] + list(dict.fromkeys(["source"] + Config.PAYLOAD_INDEX_FIELDS))
+        index.build(store.scroll_documents(payload_fields=fields))
+        return index
+
+    def build(self, documents: Iterable[Dict[str, Any]]):
+        """
+        (Re)build the index from documents with content, source, chunk_id and content_hash fields,
+        plus any PAYLOAD_INDEX_FIELDS used to filter searches.
+        """
+        vocabulary: Dict[str, int] = {}
+        term_ids: List[int] = []
+        doc_ids: List[int] = []
+        frequencies: List[int] = []
+        doc_lengths: List[int] = []
+        kept: List[Dict[str, Any]] = []
+        metadata: List[Dict[str, Any]] = []
+
+        for document in documents:
+            content = document.get("content") or ""
+            tokens = tokenize(content)
+            row = len(kept)
+            counts: Dict[int, int] = {}
+            for token in tokens:
+                term = vocabulary.setdefault(token, len(vocabulary))
+                counts[term] = counts.get(term, 0) + 1
+            for term, count in counts.items():
+                term_ids.append(term)
+                doc_ids.append(row)
+                frequencies.append(count)
+            doc_lengths.append(len(tokens))
+            kept.append({
+                "text": content,
+                "source": document.get("source"),
+                "chunk_id": document.get("chunk_id"),
+                "content_hash": document.get("content_hash"),
+            })
+            metadata.append({field: document.get(field) for field in Config.PAYLOAD_INDEX_FIELDS})
+
+        terms = np.asarray(term_ids, dtype=np.int64)
+        docs = np.asarray(doc_ids, dtype=np.int32)
+        tf = np.asarray(frequencies, dtype=np.float32)
+        lengths = np.asarray(doc_lengths, dtype=np.float32)
+
+        # Group postings by term (stable, so rows stay ascending within a term)
+        order = np.argsort(terms, kind="stable")
+        terms, docs, tf = terms[order], docs[order], tf[order]
+        document_frequency = np.bincount(terms, minlength=len(vocabulary)).astype(np.float32)
+        offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(document_frequency, out=offsets[1:])
+
+        n_docs = max(len(kept), 1)
+        average_length = float(lengths.mean()) if len(lengths) and lengths.mean() > 0 else 1.0
+        idf = np.log(1.0 + (n_docs - document_frequency + 0.5) / (document_frequency + 0.5))
+        norm = self.k1 * (1.0 - self.b + self.b * lengths[docs] / average_length) if len(docs) else tf
+        weights = (idf[terms] * tf * (self.k1 + 1.0) / (tf + norm)).astype(np.float32)
+
+        with self._lock:
+            self.vocabulary = vocabulary
+            self.term_offsets = offsets
+            self.postings_docs = docs
+            self.postings_weights = weights
+            self._documents = kept
+            self._metadata = metadata
+        logger.info(f"Built BM25 index: {len(kept)} chunks, {len(vocabulary)} terms, {len(docs)} postings")
+
+    def search(self, query: str, limit: int = 7, filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Return the top documents for a query, shaped like vector search results.
+        Documents sharing no term with the query, or not matching filters, are never returned.
+        """
+        with self._lock:
+            vocabulary, offsets = self.vocabulary, self.term_offsets
+            docs, weights, documents = self.postings_docs, self.postings_weights, self._documents
+            metadata = self._metadata
+        term_ids = {vocabulary[token] for token in tokenize(query) if token in vocabulary}
+        if not term_ids or limit <= 0:
+            return []
+
+        scores = np.zeros(len(documents), dtype=np.float32)
+        for term in term_ids:
+            start, end = offsets[term], offsets[term + 1]
+            # Rows are unique within one term's postings, so fancy-index addition is safe
+            scores[docs[start:end]] += weights[start:end]
+
+        matched = np.flatnonzero(scores)
+        if filters:
+            matched = np.array([row for row in matched if matches_filters(metadata[row], filters)], dtype=np.int64)
+        if len(matched) > limit:
+            matched = matched[np.argpartition(-scores[matched], limit - 1)[:limit]]
+        matched = matched[np.argsort(-scores[matched], kind="stable")]
+        return [
+            {**documents[row], "score": round(float(scores[row]), 4), "rank": rank}
+            for rank, row in enumerate(matched, 1)
+        ]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Size of the index and of its arrays.
+        """
+        return {
+            "documents": len(self._documents),
+            "terms": len(self.vocabulary),
+            "postings": int(self.postings_docs.shape[0]),
+            "postings_bytes": int(self.postings_docs.nbytes + self.postings_weights.nbytes + self.term_offsets.nbytes),
+        }
+
+
+def store_fingerprint(store) -> str:
+    """
+    Fingerprint of the chunks in a vector store: every point id with its content hash and
+    filterable payload fields. It is read from the store itself, so every replica sees it
+    change after a re-ingestion, including chunks edited in place and metadata rewrites.
+    """
+    fields = ["content_hash"] + list(Config.PAYLOAD_INDEX_FIELDS)
+    entries = sorted(
+        json.dumps([str(document.get("qdrant_id"))] + [document.get(field) for field in fields], default=str)
+        for document in store.scroll_documents(payload_fields=fields)
+    )
+    digest = hashlib.sha256()
+    for entry in entries:
+        digest.update(entry.encode("utf-8"))
+    return f"{len(entries)}:{digest.hexdigest()}"
+
+
+def reciprocal_rank_fusion(result_lists: List[List[Dict[str, Any]]], k: int = Config.RRF_K,
+                           key=None) -> List[Dict[str, Any]]:
+    """
+    Fuse ranked result lists with reciprocal rank fusion: each document scores
+    sum(1 / (k + rank)) over the lists it appears in. Scores from different retrievers
+    are never compared, only ranks. Each fused document is the copy from its best-ranked
+    list, with rrf_score and its fused rank; a vector returned by any list is kept.
+    """
+    key = key or document_key
+    fused: Dict[Any, Dict[str, Any]] = {}
+    best_rank: Dict[Any, int] = {}
+    for results in result_lists:
+        seen = set()
+        for rank, result in enumerate(results, 1):
+            chunk_key = key(result)
+            # A chunk repeated within one list (same content indexed twice) counts once
+            if chunk_key in seen:
+                continue
+            seen.add(chunk_key)
+            entry = fused.get(chunk_key)
+            if entry is None or rank < best_rank[chunk_key]:
+                previous = entry or {"rrf_score": 0.0}
+                fused[chunk_key] = entry = {**result, "rrf_score": previous["rrf_score"]}
+                best_rank[chunk_key] = rank
+                if entry.get("vector") is None and previous.get("vector") is not None:
+                    entry["vector"] = previous["vector"]
+            elif entry.get("vector") is None and result.get("vector") is not None:
+                entry["vector"] = result["vector"]
+            entry["rrf_score"] += 1.0 / (k + rank)
+
+    ranked = sorted(fused.values(), key=lambda document: document["rrf_score"], reverse=True)
+    for rank, document in enumerate(ranked, 1):
+        document["rrf_score"] = round(document["rrf_score"], 6)
+        document["rank"] = rank
+    return ranked
+
+def document_key(result: Dict[str, Any]):
+    """
+    Identify a chunk across retrievers: its content hash, else source and chunk id, else its text.
+    """
+    if result.get("content_hash"):
+        return result["content_hash"]
+    if result.get("chunk_id") is not None and result.get("source") is not None:
+        return (result["source"], result["chunk_id"])
+    return result.get("text", "")[:100]
@@ -0,0 +1,333 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from backend.config import Config
+from ..utils.embedding_utils import EmbeddingGenerator
+from ..utils.metrics import CACHE_REQUESTS
+from ..utils.logging_utils import setup_logging
+import logging
+
+# Set up logging for this module
+setup_logging()
+logger = logging.getLogger(__name__)
+
+class ClassificationCache:
+    """
+    Two-tier cache for classification results.
+    An in-process LRU tier answers repeated texts without I/O; an optional SQLite tier
+    persists results across restarts and is shared by every worker pointing at the same file.
+    Keys hash the normalized text together with the deployment name, prompt version and
+    prompt mode, so changing either invalidates old entries, and a "standard" result is
+    never served to a "fused" lookup (which also expects search keywords) or vice versa.
+    Disk-tier reads do not write: their access times are kept in memory and written in one
+    batch every access_flush_interval seconds, or before the next prune.
+    """
+    def __init__(
+        self,
+        max_entries: int = Config.CLASSIFICATION_CACHE_MAX_ENTRIES,
+        ttl_seconds: float = Config.CLASSIFICATION_CACHE_TTL_SECONDS,
+        disk_path: Optional[str] = Config.CLASSIFICATION_CACHE_PATH,
+        disk_max_entries: int = Config.CLASSIFICATION_CACHE_DISK_MAX_ENTRIES,
+        deployment_name: str = Config.DEPLOYMENT_NAME,
+        prompt_version: str = Config.CLASSIFICATION_PROMPT_VERSION,
+        access_flush_interval: float = Config.CLASSIFICATION_CACHE_ACCESS_FLUSH_SECONDS,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_max_entries = disk_max_entries
+        self.namespace = f"{deployment_name}\x1f{prompt_version}"
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk: Optional[sqlite3.Connection] = None
+        # Serializes the SQLite connection; never held while waiting for self._lock's holder
+        self._disk_lock = threading.Lock()
+        self._disk_writes = 0
+        self.access_flush_interval = access_flush_interval
+        # key -> last disk-tier read time, not yet written to SQLite
+        self._pending_accesses: Dict[str, float] = {}
+        self._last_access_flush = time.monotonic()
+        self.stats_counters = {
+            "hits": 0,
+            "misses": 0,
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "evictions": 0,
+            "expired": 0,
+        }
+        if disk_path:
+            self._open_disk(disk_path)
+
+    def _open_disk(self, disk_path: str):
+        """
+        Open (or create) the SQLite tier. WAL mode lets several processes read while one writes.
+        """
+        try:
+            directory = os.path.dirname(disk_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._disk = sqlite3.connect(disk_path, check_same_thread=False, timeout=5.0)
+            self._disk.execute("PRAGMA journal_mode=WAL")
+            self._disk.execute("PRAGMA synchronous=NORMAL")
+            self._disk.execute(
+                "CREATE TABLE IF NOT EXISTS classification_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._disk.execute(
+                "CREATE INDEX IF NOT EXISTS idx_classification_cache_accessed "
+                "ON classification_cache (accessed_at)"
+            )
+            self._disk.commit()
+            logger.info(f"Classification disk cache enabled at {disk_path}")
+        except Exception as e:
+            # The disk tier is an optimization; keep serving from memory if it cannot be opened
+            logger.warning(f"Failed to open classification disk cache: {str(e)}")
+            self._disk = None
+
+    @staticmethod
+    def normalize_text(text: str) -> str:
+        """
+        Normalize text so trivially different copies (Unicode forms, spacing) share a key.
+        """
+        return " ".join(unicodedata.normalize("NFKC", text).split())
+
+    def make_key(self, text: str, mode: str = "standard") -> str:
+        """
+        Build the cache key for a text classified with the given prompt mode.
+        """
+        return EmbeddingGenerator.calculate_content_hash(
+            f"{self.namespace}\x1f{mode}\x1f{self.normalize_text(text)}"
+        )
+
+    def get(self, text: str, mode: str = "standard") -> Optional[Dict[str, Any]]:
+        """
+        Return the cached classification for text, or None on a miss.
+        """
+        key = self.make_key(text, mode)
+        now = time.time()
+        value = self._memory_get(key, now)
+        if value is None:
+            value = self._disk_lookup(key, now)
+        if value is None:
+            self._count_miss()
+        return value
+
+    async def aget(self, text: str, mode: str = "standard") -> Optional[Dict[str, Any]]:
+        """
+        Async variant of get. Memory hits are answered inline; the SQLite tier is read
+        on a worker thread so the event loop never waits on disk or another process's lock.
+        """
+        key = self.make_key(text, mode)
+        now = time.time()
+        value = self._memory_get(key, now)
+        if value is None and self._disk is not None:
+            value = await asyncio.to_thread(self._disk_lookup, key, now)
+        if value is None:
+            self._count_miss()
+        return value
+
+    def set(self, text: str, result: Dict[str, Any], mode: str = "standard"):
+        """
+        Store a successful classification result. Failed results are never cached.
+        """
+        if not result.get("success"):
+            return
+        key = self.make_key(text, mode)
+        expires_at = time.time() + self.ttl_seconds
+        value = dict(result)
+        with self._lock:
+            self._memory_set(key, value, expires_at)
+        self._disk_set(key, value, expires_at)
+
+    async def aset(self, text: str, result: Dict[str, Any], mode: str = "standard"):
+        """
+        Async variant of set; the SQLite write runs on a worker thread.
+        """
+        if not result.get("success"):
+            return
+        key = self.make_key(text, mode)
+        expires_at = time.time() + self.ttl_seconds
+        value = dict(result)
+        with self._lock:
+            self._memory_set(key, value, expires_at)
+        if self._disk is not None:
+            await asyncio.to_thread(self._disk_set, key, value, expires_at)
+
+    def flush(self):
+        """
+        Write buffered disk-tier access times now.
+        """
+        if self._disk is None:
+            return
+        with self._disk_lock:
+            try:
+                self._flush_accesses()
+                self._disk.commit()
+            except Exception as e:
+                logger.warning(f"Classification disk cache flush failed: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return hit/miss counters and tier sizes.
+        """
+        with self._lock:
+            lookups = self.stats_counters["hits"] + self.stats_counters["misses"]
+            return {
+                **self.stats_counters,
+                "hit_rate": round(self.stats_counters["hits"] / lookups, 4) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_enabled": self._disk is not None,
+            }
+
+    def clear(self):
+        """
+        Drop every entry from both tiers.
+        """
+        with self._lock:
+            self._memory.clear()
+        if self._disk is not None:
+            with self._disk_lock:
+                self._pending_accesses.clear()
+                self._disk.execute("DELETE FROM classification_cache")
+                self._disk.commit()
+
+    def _memory_set(self, key: str, value: Dict[str, Any], expires_at: float):
+        """
+        Insert into the LRU tier, evicting the least recently used entries past max_entries.
+        Caller must hold the lock.
+        """
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.stats_counters["evictions"] += 1
+
+    def _memory_get(self, key: str, now: float) -> Optional[Dict[str, Any]]:
+        """
+        Look up a key in the LRU tier, counting a hit if found.
+        """
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._memory[key]
+                self.stats_counters["expired"] += 1
+                return None
+            self._memory.move_to_end(key)
+            self.stats_counters["hits"] += 1
+            self.stats_counters["memory_hits"] += 1
+        CACHE_REQUESTS.inc(cache="classification", result="hit")
+        return dict(value)
+
+    def _disk_lookup(self, key: str, now: float) -> Optional[Dict[str, Any]]:
+        """
+        Look up a key in the SQLite tier and promote a hit to the LRU tier.
+        """
+        value = self._disk_get(key, now)
+        if value is None:
+            return None
+        with self._lock:
+            self._memory_set(key, value, now + self.ttl_seconds)
+            self.stats_counters["hits"] += 1
+            self.stats_counters["disk_hits"] += 1
+        CACHE_REQUESTS.inc(cache="classification", result="hit")
+        return dict(value)
+
+    def _count_miss(self):
+        """
+        Count a lookup that neither tier answered.
+        """
+        with self._lock:
+            self.stats_counters["misses"] += 1
+        CACHE_REQUESTS.inc(cache="classification", result="miss")
+
+    def _disk_get(self, key: str, now: float) -> Optional[Dict[str, Any]]:
+        """
+        Read a key from the SQLite tier, buffering its access time.
+        """
+        if self._disk is None:
+            return None
+        with self._disk_lock:
+            try:
+                row = self._disk.execute(
+                    "SELECT value, expires_at FROM classification_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                if row[1] <= now:
+                    self._disk.execute("DELETE FROM classification_cache WHERE key = ?", (key,))
+                    self._disk.commit()
+                    with self._lock:
+                        self.stats_counters["expired"] += 1
+                    return None
+                self._pending_accesses[key] = now
+                if time.monotonic() - self._last_access_flush >= self.access_flush_interval:
+                    self._flush_accesses()
+                    self._disk.commit()
+                return json.loads(row[0])
+            except Exception as e:
+                logger.warning(f"Classification disk cache read failed: {str(e)}")
+                return None
+
+    def _disk_set(self, key: str, value: Dict[str, Any], expires_at: float):
+        """
+        Write a key to the SQLite tier and periodically enforce TTL and size bounds.
+        """
+        if self._disk is None:
+            return
+        with self._disk_lock:
+            try:
+                now = time.time()
+                self._disk.execute(
+                    "INSERT OR REPLACE INTO classification_cache (key, value, expires_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(value), expires_at, now),
+                )
+                self._pending_accesses.pop(key, None)
+                self._disk_writes += 1
+                # Counting rows on every write is wasteful; prune every few hundred writes
+                if self._disk_writes % 256 == 0:
+                    self._prune_disk(now)
+                self._disk.commit()
+            except Exception as e:
+                logger.warning(f"Classification disk cache write failed: {str(e)}")
+
+    def _flush_accesses(self):
+        """
+        Write buffered access times in one statement batch; the caller commits.
+        Caller must hold the disk lock.
+        """
+        self._last_access_flush = time.monotonic()
+        if not self._pending_accesses:
+            return
+        self._disk.executemany(
+            "UPDATE classification_cache SET accessed_at = ? WHERE key = ?",
+            [(accessed_at, key) for key, accessed_at in self._pending_accesses.items()],
+        )
+        self._pending_accesses.clear()
+
+    def _prune_disk(self, now: float):
+        """
+        Delete expired rows, then the least recently accessed rows beyond disk_max_entries.
+        Caller must hold the disk lock.
+        """
+        self._flush_accesses()
+        self._disk.execute("DELETE FROM classification_cache WHERE expires_at <= ?", (now,))
+        count = self._disk.execute("SELECT COUNT(*) FROM classification_cache").fetchone()[0]
+        overflow = count - self.disk_max_entries
+        if overflow > 0:
+            self._disk.execute(
+                "DELETE FROM classification_cache WHERE key IN ("
+                "SELECT key FROM classification_cache ORDER BY accessed_at LIMIT ?)",
+                (overflow,),
+            )
+            with self._lock:
+                self.stats_counters["evictions"] += overflow
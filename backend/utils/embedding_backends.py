@@ -0,0 +1,168 @@
+import asyncio
+from abc import ABC, abstractmethod
+from typing import List, Optional
+from backend.config import Config
+from ..utils.logging_utils import setup_logging
+import logging
+
+# Set up logging for this module
+setup_logging()
+logger = logging.getLogger(__name__)
+
+class EmbeddingBackend(ABC):
+    """
+    Interface for embedding backends used by EmbeddingGenerator.
+    Subclasses implement embed_documents, embed_query and dimension; the async methods
+    default to running the sync ones on a worker thread.
+    """
+    name: str = "base"
+
+    @property
+    @abstractmethod
+    def dimension(self) -> int:
+        """
+        Size of the vectors produced by this backend.
+        """
+
+    @abstractmethod
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Generate embeddings for a list of documents.
+        """
+
+    @abstractmethod
+    def embed_query(self, query: str) -> List[float]:
+        """
+        Generate an embedding for a single query string.
+        """
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Async variant of embed_documents.
+        """
+        return await asyncio.to_thread(self.embed_documents, texts)
+
+    async def aembed_query(self, query: str) -> List[float]:
+        """
+        Async variant of embed_query.
+        """
+        return await asyncio.to_thread(self.embed_query, query)
+
+
+class AzureOpenAIEmbeddingBackend(EmbeddingBackend):
+    """
+    Remote embeddings from an Azure OpenAI deployment via langchain.
+    """
+    def __init__(self, deployment: str = Config.EMBEDDING_MODEL, dimension: int = Config.EMBEDDING_DIMENSION):
+        from langchain_openai import AzureOpenAIEmbeddings
+        from ..utils.llm_gateway import get_llm_gateway
+
+        self.name = f"azure:{deployment}"
+        self._dimension = dimension
+        # Reuse the gateway's pooled HTTP clients instead of opening a separate pool
+        gateway = get_llm_gateway()
+        self.client = AzureOpenAIEmbeddings(
+            openai_api_version=Config.DIAL_API_VERSION,
+            azure_deployment=deployment,
+            azure_endpoint=Config.DIAL_ENDPOINT,
+            api_key=Config.DIAL_API_KEY,
+            check_embedding_ctx_length=False,
+            http_client=gateway.http_client,
+            http_async_client=gateway.async_http_client,
+            max_retries=Config.LLM_MAX_RETRIES,
+            timeout=Config.LLM_TIMEOUT_SECONDS,
+        )
+
+    @property
+    def dimension(self) -> int:
+        return self._dimension
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.client.embed_documents(texts)
+
+    def embed_query(self, query: str) -> List[float]:
+        return self.client.embed_query(query)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.client.aembed_documents(texts)
+
+    async def aembed_query(self, query: str) -> List[float]:
+        return await self.client.aembed_query(query)
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    """
+    Local CPU embeddings with sentence-transformers.
+    Inputs are encoded in batches of batch_size. runtime="onnx" uses the ONNX Runtime
+    backend (sentence-transformers>=3.2); with quantize=True it loads the int8 ONNX
+    export named by onnx_file, or applies dynamic int8 quantization to the torch model.
+    """
+    def __init__(
+        self,
+        model_name: str = Config.LOCAL_EMBEDDING_MODEL,
+        device: str = Config.LOCAL_EMBEDDING_DEVICE,
+        batch_size: int = Config.LOCAL_EMBEDDING_BATCH_SIZE,
+        runtime: str = Config.LOCAL_EMBEDDING_RUNTIME,
+        quantize: bool = Config.LOCAL_EMBEDDING_QUANTIZE,
+        onnx_file: str = Config.LOCAL_EMBEDDING_ONNX_FILE,
+    ):
+        from sentence_transformers import SentenceTransformer
+
+        if runtime not in ("torch", "onnx"):
+            raise ValueError(f"Unknown embedding runtime '{runtime}', expected 'torch' or 'onnx'")
+        self.batch_size = batch_size
+        suffix = f"{runtime}-int8" if quantize else runtime
+        self.name = f"sentence-transformers:{model_name}:{suffix}"
+
+        if runtime == "onnx":
+            model_kwargs = {"file_name": onnx_file} if quantize else None
+            try:
+                self.model = SentenceTransformer(
+                    model_name, device=device, backend="onnx", model_kwargs=model_kwargs
+                )
+            except TypeError as e:
+                raise ValueError("The ONNX runtime requires sentence-transformers>=3.2") from e
+        else:
+            self.model = SentenceTransformer(model_name, device=device)
+            if quantize:
+                import torch
+
+                self.model = torch.quantization.quantize_dynamic(
+                    self.model, {torch.nn.Linear}, dtype=torch.qint8
+                )
+        self._dimension = self.model.get_sentence_embedding_dimension()
+        logger.info(f"Loaded local embedding model {self.name} (dimension {self._dimension})")
+
+    @property
+    def dimension(self) -> int:
+        return self._dimension
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        vectors = self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False,
+        )
+        return vectors.tolist()
+
+    def embed_query(self, query: str) -> List[float]:
+        return self.embed_documents([query])[0]
+
+
+EMBEDDING_BACKENDS = {
+    "azure": AzureOpenAIEmbeddingBackend,
+    "sentence-transformers": SentenceTransformerBackend,
+}
+
+def create_embedding_backend(name: Optional[str] = None) -> EmbeddingBackend:
+    """
+    Build the embedding backend named by name (default Config.EMBEDDING_BACKEND).
+    """
+    name = name or Config.EMBEDDING_BACKEND
+    if name not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{name}', expected one of {list(EMBEDDING_BACKENDS)}")
+    return EMBEDDING_BACKENDS[name]()
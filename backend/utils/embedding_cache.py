@@ -0,0 +1,271 @@
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional, Union
+import numpy as np
+from backend.config import Config
+from ..utils.logging_utils import setup_logging
+import logging
+
+# Set up logging for this module
+setup_logging()
+logger = logging.getLogger(__name__)
+
+EVICTION_POLICIES = ("lru", "fifo", "none")
+# How long a write waits for another process's write lock
+BUSY_TIMEOUT_SECONDS = 10.0
+
+class EmbeddingCache:
+    """
+    Content-addressed embedding cache shared across worker processes.
+    Vectors live as float32 rows in a fixed-capacity memory-mapped file (vectors.f32);
+    a SQLite index (index.sqlite) maps content keys to rows. When the file is full a row is
+    reused according to the eviction policy: "lru" (least recently read), "fifo" (oldest
+    written) or "none" (stop caching new vectors).
+    Reads are not written back one by one: LRU read times are buffered and applied in one
+    transaction every touch_interval seconds (or by the next write), and the vectors file is
+    flushed to disk every flush_interval seconds. Other workers share the mapping's pages,
+    so they see new rows at once; a row lost in a crash fails its checksum and reads as a miss.
+    """
+    def __init__(
+        self,
+        path: str = Config.EMBEDDING_CACHE_PATH,
+        capacity: int = Config.EMBEDDING_CACHE_CAPACITY,
+        eviction_policy: str = Config.EMBEDDING_CACHE_EVICTION,
+        touch_interval: float = Config.EMBEDDING_CACHE_TOUCH_INTERVAL_SECONDS,
+        flush_interval: float = Config.EMBEDDING_CACHE_FLUSH_SECONDS,
+    ):
+        if eviction_policy not in EVICTION_POLICIES:
+            raise ValueError(f"Unknown eviction policy '{eviction_policy}', expected one of {EVICTION_POLICIES}")
+        self.path = path
+        self.capacity = capacity
+        self.eviction_policy = eviction_policy
+        self.touch_interval = touch_interval
+        self.flush_interval = flush_interval
+        self.vectors_path = os.path.join(path, "vectors.f32")
+        self.dimension: Optional[int] = None
+        self._vectors: Optional[np.memmap] = None
+        self._lock = threading.Lock()
+        self.stats_counters = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+        # key -> last read time, not yet written to the index
+        self._pending_touches: Dict[str, float] = {}
+        self._last_touch_flush = time.monotonic()
+        self._last_vectors_flush = time.monotonic()
+
+        os.makedirs(path, exist_ok=True)
+        self._index = sqlite3.connect(
+            os.path.join(path, "index.sqlite"),
+            check_same_thread=False,
+            timeout=BUSY_TIMEOUT_SECONDS,
+            isolation_level=None,  # transactions are managed explicitly
+        )
+        self._index.execute("PRAGMA journal_mode=WAL")
+        self._index.execute("PRAGMA synchronous=NORMAL")
+        self._index.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._index.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, slot INTEGER NOT NULL UNIQUE, checksum INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._index.execute("CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries (accessed_at)")
+        self._index.execute("CREATE INDEX IF NOT EXISTS idx_entries_created ON entries (created_at)")
+        self._open_vectors()
+
+    def _open_vectors(self) -> bool:
+        """
+        Map the vectors file if another process (or an earlier run) has already created it.
+        """
+        if self._vectors is not None:
+            return True
+        meta = dict(self._index.execute("SELECT name, value FROM meta").fetchall())
+        if "dimension" not in meta or not os.path.exists(self.vectors_path):
+            return False
+        if meta["capacity"] != self.capacity:
+            logger.warning(
+                f"Embedding cache at {self.path} was created with capacity {meta['capacity']}; "
+                f"ignoring configured capacity {self.capacity}"
+            )
+        self.dimension = meta["dimension"]
+        self.capacity = meta["capacity"]
+        self._vectors = np.memmap(
+            self.vectors_path, dtype=np.float32, mode="r+", shape=(self.capacity, self.dimension)
+        )
+        return True
+
+    def _create_vectors(self, dimension: int):
+        """
+        Create the vectors file for the first vector written. Caller must hold the write transaction.
+        """
+        self._vectors = np.memmap(
+            self.vectors_path, dtype=np.float32, mode="w+", shape=(self.capacity, dimension)
+        )
+        self.dimension = dimension
+        self._index.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('dimension', ?)", (dimension,))
+        self._index.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('capacity', ?)", (self.capacity,))
+        logger.info(f"Created embedding cache at {self.path} ({self.capacity} x {dimension} float32)")
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Return cached vectors for whichever keys are present.
+        """
+        if not keys:
+            return {}
+        with self._lock:
+            if not self._open_vectors():
+                self.stats_counters["misses"] += len(keys)
+                return {}
+            found: Dict[str, np.ndarray] = {}
+            unique_keys = list(dict.fromkeys(keys))
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(unique_keys), 500):
+                chunk = unique_keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._index.execute(
+                    f"SELECT key, slot, checksum FROM entries WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for key, slot, checksum in rows:
+                    vector = np.array(self._vectors[slot], dtype=np.float32)
+                    # A slot being overwritten by another process fails the checksum; treat as a miss
+                    if zlib.crc32(vector.tobytes()) == checksum:
+                        found[key] = vector
+            if found and self.eviction_policy == "lru":
+                now = time.time()
+                self._pending_touches.update((key, now) for key in found)
+                if time.monotonic() - self._last_touch_flush >= self.touch_interval:
+                    self._flush_touches()
+            self.stats_counters["hits"] += sum(1 for key in keys if key in found)
+            self.stats_counters["misses"] += sum(1 for key in keys if key not in found)
+            return found
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """
+        Return the cached vector for a key, or None on a miss.
+        """
+        return self.get_many([key]).get(key)
+
+    def put_many(self, items: Dict[str, Union[np.ndarray, List[float]]]):
+        """
+        Store vectors by key, evicting rows according to the eviction policy once full.
+        """
+        if not items:
+            return
+        with self._lock:
+            created = False
+            try:
+                self._index.execute("BEGIN IMMEDIATE")
+                self._open_vectors()
+                # Apply buffered reads first so LRU eviction sees them
+                self._flush_touches()
+                now = time.time()
+                for key, vector in items.items():
+                    vector = np.asarray(vector, dtype=np.float32)
+                    if self._vectors is None:
+                        self._create_vectors(vector.shape[0])
+                        created = True
+                    if vector.shape != (self.dimension,):
+                        logger.warning(f"Skipping embedding of shape {vector.shape}; cache dimension is {self.dimension}")
+                        continue
+                    if self._index.execute("SELECT 1 FROM entries WHERE key = ?", (key,)).fetchone():
+                        continue
+                    slot = self._allocate_slot()
+                    if slot is None:
+                        break
+                    self._vectors[slot] = vector
+                    self._index.execute(
+                        "INSERT INTO entries (key, slot, checksum, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                        (key, slot, zlib.crc32(vector.tobytes()), now, now),
+                    )
+                    self.stats_counters["writes"] += 1
+                self._index.execute("COMMIT")
+                if self._vectors is not None and time.monotonic() - self._last_vectors_flush >= self.flush_interval:
+                    self._vectors.flush()
+                    self._last_vectors_flush = time.monotonic()
+            except Exception as e:
+                if self._index.in_transaction:
+                    self._index.execute("ROLLBACK")
+                if created:
+                    # The dimension was never committed, so forget the mapping too
+                    self._vectors = None
+                    self.dimension = None
+                # The cache is an optimization; a failed write must not fail the embedding call
+                logger.warning(f"Embedding cache write failed: {str(e)}")
+
+    def put(self, key: str, vector: Union[np.ndarray, List[float]]):
+        """
+        Store a single vector by key.
+        """
+        self.put_many({key: vector})
+
+    def flush(self):
+        """
+        Write buffered read times to the index and flush the vectors file to disk.
+        """
+        with self._lock:
+            self._flush_touches()
+            if self._vectors is not None:
+                self._vectors.flush()
+                self._last_vectors_flush = time.monotonic()
+
+    def stats(self) -> Dict[str, object]:
+        """
+        Return hit/miss counters and occupancy.
+        """
+        with self._lock:
+            entries = self._index.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            lookups = self.stats_counters["hits"] + self.stats_counters["misses"]
+            return {
+                **self.stats_counters,
+                "hit_rate": round(self.stats_counters["hits"] / lookups, 4) if lookups else 0.0,
+                "entries": entries,
+                "capacity": self.capacity,
+                "dimension": self.dimension,
+                "eviction_policy": self.eviction_policy,
+            }
+
+    def _allocate_slot(self) -> Optional[int]:
+        """
+        Pick the row for a new vector: the next unused row, or a victim row once full.
+        Caller must hold the write transaction.
+        """
+        used = self._index.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        if used < self.capacity:
+            # Rows are reused in place on eviction, so used rows are always 0..used-1
+            return used
+        if self.eviction_policy == "none":
+            return None
+        order_column = "accessed_at" if self.eviction_policy == "lru" else "created_at"
+        victim = self._index.execute(
+            f"SELECT key, slot FROM entries ORDER BY {order_column} LIMIT 1"
+        ).fetchone()
+        self._index.execute("DELETE FROM entries WHERE key = ?", (victim[0],))
+        self.stats_counters["evictions"] += 1
+        return victim[1]
+
+    def _flush_touches(self):
+        """
+        Write buffered LRU read times in one transaction (or the caller's open one).
+        Caller must hold self._lock. If another process holds the write lock the times stay
+        buffered for the next attempt instead of waiting for it.
+        """
+        self._last_touch_flush = time.monotonic()
+        if not self._pending_touches:
+            return
+        touches = [(accessed_at, key) for key, accessed_at in self._pending_touches.items()]
+        if self._index.in_transaction:
+            self._index.executemany("UPDATE entries SET accessed_at = ? WHERE key = ?", touches)
+            self._pending_touches.clear()
+            return
+        try:
+            self._index.execute("PRAGMA busy_timeout = 0")
+            self._index.execute("BEGIN IMMEDIATE")
+            self._index.executemany("UPDATE entries SET accessed_at = ? WHERE key = ?", touches)
+            self._index.execute("COMMIT")
+            self._pending_touches.clear()
+        except sqlite3.OperationalError as e:
+            if self._index.in_transaction:
+                self._index.execute("ROLLBACK")
+            logger.debug(f"Deferred LRU update: {str(e)}")
+        finally:
+            self._index.execute(f"PRAGMA busy_timeout = {int(BUSY_TIMEOUT_SECONDS * 1000)}")
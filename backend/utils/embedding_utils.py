@@ -1,6 +1,11 @@
-from langchain_openai import AzureOpenAIEmbeddings
+import asyncio
 import hashlib
+import os
+import re
+from typing import Dict, List, Optional
 from backend.config import Config
+from ..utils.embedding_backends import EmbeddingBackend, create_embedding_backend
+from ..utils.metrics import CACHE_REQUESTS, timed_stage
 from ..utils.logging_utils import setup_logging
 import logging
 
@@ -10,49 +15,152 @@ logger = logging.getLogger(__name__)
 
 class EmbeddingGenerator:
     """
-    Handles embedding generation for documents and queries using Azure OpenAI.
+    Handles embedding generation for documents and queries through a pluggable backend
+    (Azure OpenAI by default, or local sentence-transformers; see Config.EMBEDDING_BACKEND).
+    Vectors are looked up in a shared content-addressed cache before calling the backend.
     """
-    def __init__(self):
+    def __init__(self, backend: Optional[EmbeddingBackend] = None):
         try:
-            # Initialize the Azure OpenAI Embeddings client with config values
-            self.client = AzureOpenAIEmbeddings(
-                openai_api_version=Config.DIAL_API_VERSION,
-                azure_deployment=Config.EMBEDDING_MODEL,
-                azure_endpoint=Config.DIAL_ENDPOINT,
-                api_key=Config.DIAL_API_KEY,
-                check_embedding_ctx_length=False,
-            )
-            logger.info("Successfully initialized Azure OpenAI Embeddings client")
+            self.backend = backend or create_embedding_backend()
+            logger.info(f"Successfully initialized embedding backend {self.backend.name}")
         except Exception as e:
-            logger.error(f"Failed to initialize OpenAI client: {str(e)}")
+            logger.error(f"Failed to initialize embedding backend: {str(e)}")
             raise
+        self.cache = None
+        if Config.EMBEDDING_CACHE_ENABLED:
+            try:
+                # Imported here so embedding_cache (and numpy) stay optional for hash-only users
+                from ..utils.embedding_cache import EmbeddingCache
+                # One cache directory per backend, since each has its own vector size
+                cache_dir = re.sub(r"[^A-Za-z0-9_.-]+", "_", self.backend.name)
+                self.cache = EmbeddingCache(path=os.path.join(Config.EMBEDDING_CACHE_PATH, cache_dir))
+            except Exception as e:
+                logger.warning(f"Embedding cache disabled: {str(e)}")
 
+    @property
+    def dimension(self) -> int:
+        """
+        Size of the vectors produced by the active backend.
+        """
+        return self.backend.dimension
+
+    @timed_stage("embedding")
     def embed_documents(self, texts):
         """
         Generate embeddings for a list of documents.
+        Only texts missing from the cache are sent to the embedding service.
         """
         try:
-            logger.info(f"Embedding {len(texts)} documents")
-            return self.client.embed_documents(texts)
+            cached = self._cache_lookup(texts)
+            missing = self._missing_texts(texts, cached)
+            logger.info(f"Embedding {len(missing)} documents ({len(texts) - len(missing)} cached)")
+            if missing:
+                cached.update(self._cache_store(missing, self.backend.embed_documents(missing)))
+            return [cached[text] for text in texts]
         except Exception as e:
             logger.error(f"Embedding failed: {str(e)}")
             raise
 
+    @timed_stage("embedding")
     def embed_query(self, query):
         """
         Generate an embedding for a single query string.
         """
         try:
+            cached = self._cache_lookup([query])
+            if query in cached:
+                return cached[query]
             logger.info(f"Embedding query: {query[:50]}...")
-            return self.client.embed_query(query)
+            return self._cache_store([query], [self.backend.embed_query(query)])[query]
         except Exception as e:
             logger.error(f"Query embedding failed: {str(e)}")
             raise
 
+    @timed_stage("embedding")
+    async def aembed_documents(self, texts):
+        """
+        Async variant of embed_documents. Cache reads and writes (SQLite and the mapped
+        vectors file) run on a worker thread.
+        """
+        try:
+            cached = await self._acache_lookup(texts)
+            missing = self._missing_texts(texts, cached)
+            logger.info(f"Embedding {len(missing)} documents ({len(texts) - len(missing)} cached)")
+            if missing:
+                cached.update(await self._acache_store(missing, await self.backend.aembed_documents(missing)))
+            return [cached[text] for text in texts]
+        except Exception as e:
+            logger.error(f"Embedding failed: {str(e)}")
+            raise
+
+    @timed_stage("embedding")
+    async def aembed_query(self, query):
+        """
+        Async variant of embed_query, with the cache accessed on a worker thread.
+        """
+        try:
+            cached = await self._acache_lookup([query])
+            if query in cached:
+                return cached[query]
+            logger.info(f"Embedding query: {query[:50]}...")
+            return (await self._acache_store([query], [await self.backend.aembed_query(query)]))[query]
+        except Exception as e:
+            logger.error(f"Query embedding failed: {str(e)}")
+            raise
+
+    def _cache_key(self, text: str) -> str:
+        """
+        Cache key for a text; namespaced by backend so switching models never serves stale vectors.
+        """
+        return self.calculate_content_hash(f"{self.backend.name}\x1f{text}")
+
+    def _cache_lookup(self, texts: List[str]) -> Dict[str, List[float]]:
+        """
+        Return cached embeddings for whichever texts are present in the cache.
+        """
+        if self.cache is None:
+            return {}
+        keys = {text: self._cache_key(text) for text in texts}
+        found = self.cache.get_many(list(keys.values()))
+        CACHE_REQUESTS.inc(len(found), cache="embedding", result="hit")
+        CACHE_REQUESTS.inc(len(keys) - len(found), cache="embedding", result="miss")
+        return {text: found[key].tolist() for text, key in keys.items() if key in found}
+
+    def _cache_store(self, texts: List[str], embeddings: List[List[float]]) -> Dict[str, List[float]]:
+        """
+        Write freshly computed embeddings to the cache and return them keyed by text.
+        """
+        if self.cache is not None:
+            self.cache.put_many({self._cache_key(text): embedding for text, embedding in zip(texts, embeddings)})
+        return dict(zip(texts, embeddings))
+
+    async def _acache_lookup(self, texts: List[str]) -> Dict[str, List[float]]:
+        """
+        _cache_lookup on a worker thread, so the event loop never waits on SQLite.
+        """
+        if self.cache is None:
+            return {}
+        return await asyncio.to_thread(self._cache_lookup, texts)
+
+    async def _acache_store(self, texts: List[str], embeddings: List[List[float]]) -> Dict[str, List[float]]:
+        """
+        _cache_store on a worker thread.
+        """
+        if self.cache is None:
+            return dict(zip(texts, embeddings))
+        return await asyncio.to_thread(self._cache_store, texts, embeddings)
+
+    @staticmethod
+    def _missing_texts(texts: List[str], cached: Dict[str, List[float]]) -> List[str]:
+        """
+        Distinct texts that still need to be embedded, in first-seen order.
+        """
+        return [text for text in dict.fromkeys(texts) if text not in cached]
+
     @staticmethod
     def calculate_content_hash(content: str) -> str:
         """
         Calculate a SHA-256 hash for the given content string.
         Useful for deduplication and tracking.
         """
-        return hashlib.sha256(content.encode("utf-8")).hexdigest()
\ No newline at end of file
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
@@ -0,0 +1,88 @@
+import json
+import os
+from typing import Any, Dict, Iterable, List, Optional
+from ..utils.logging_utils import setup_logging
+import logging
+
+# Set up logging for this module
+setup_logging()
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ("jsonl", "parquet")
+
+def export_documents(documents: Iterable[Dict[str, Any]], path: str, export_format: Optional[str] = None,
+                     batch_size: int = 1000) -> int:
+    """
+    Write documents to a JSONL or Parquet file incrementally, so memory stays bounded
+    regardless of how many documents the iterable yields.
+    The format is inferred from the file extension when not given.
+    Parquet export requires the optional pyarrow package.
+    Returns the number of documents written.
+    """
+    export_format = export_format or ("parquet" if path.endswith(".parquet") else "jsonl")
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{export_format}', expected one of {EXPORT_FORMATS}")
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    if export_format == "jsonl":
+        count = _export_jsonl(documents, path)
+    else:
+        count = _export_parquet(documents, path, batch_size)
+    logger.info(f"Exported {count} documents to {path}")
+    return count
+
+def _export_jsonl(documents: Iterable[Dict[str, Any]], path: str) -> int:
+    """
+    Write one JSON object per line.
+    """
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for document in documents:
+            f.write(json.dumps(document, ensure_ascii=False, default=str))
+            f.write("\n")
+            count += 1
+    return count
+
+def _export_parquet(documents: Iterable[Dict[str, Any]], path: str, batch_size: int) -> int:
+    """
+    Write documents as Parquet row groups of batch_size rows.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("Parquet export requires pyarrow (pip install pyarrow)") from e
+
+    writer = None
+    batch: List[Dict[str, Any]] = []
+    count = 0
+    try:
+        for document in documents:
+            batch.append(document)
+            if len(batch) >= batch_size:
+                writer = _write_parquet_batch(pa, pq, writer, batch, path)
+                count += len(batch)
+                batch = []
+        if batch or writer is None:
+            writer = _write_parquet_batch(pa, pq, writer, batch, path)
+            count += len(batch)
+    finally:
+        if writer is not None:
+            writer.close()
+    return count
+
+def _write_parquet_batch(pa, pq, writer, batch: List[Dict[str, Any]], path: str):
+    """
+    Append a batch as a row group, opening the writer with the first batch's schema.
+    """
+    # qdrant ids may be ints or UUID strings; store them uniformly as strings
+    rows = [{**row, "qdrant_id": str(row["qdrant_id"])} if "qdrant_id" in row else row for row in batch]
+    if writer is None:
+        table = pa.Table.from_pylist(rows)
+        writer = pq.ParquetWriter(path, table.schema)
+    else:
+        table = pa.Table.from_pylist(rows, schema=writer.schema)
+    writer.write_table(table)
+    return writer
@@ -0,0 +1,129 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional
+from backend.config import Config
+from ..utils.logging_utils import setup_logging
+import logging
+
+# Set up logging for this module
+setup_logging()
+logger = logging.getLogger(__name__)
+
+# "partial": enrichment finished but some requested stage (retrieval or reasoning) failed
+JOB_STATUSES = ("pending", "running", "completed", "partial", "failed")
+
+class AnalysisJobStore:
+    """
+    Store for analyses whose enrichment (retrieval and reasoning) finishes in the background.
+    Backed by SQLite so every worker process pointing at the same file can serve job lookups;
+    with path=None the store lives in memory and is private to this process.
+    Jobs older than ttl_seconds are purged on write.
+    """
+    def __init__(self, path: Optional[str] = Config.ANALYSIS_JOB_STORE_PATH,
+                 ttl_seconds: float = Config.ANALYSIS_JOB_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._writes = 0
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path or ":memory:", check_same_thread=False, timeout=5.0)
+        if path:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS analysis_jobs ("
+            "job_id TEXT PRIMARY KEY, status TEXT NOT NULL, result TEXT NOT NULL, "
+            "error TEXT, callback_url TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_analysis_jobs_created ON analysis_jobs (created_at)")
+        self._db.commit()
+
+    def create(self, result: Dict[str, Any], callback_url: Optional[str] = None) -> str:
+        """
+        Create a pending job holding the partial result and return its id.
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO analysis_jobs (job_id, status, result, error, callback_url, created_at, updated_at) "
+                "VALUES (?, 'pending', ?, NULL, ?, ?, ?)",
+                (job_id, json.dumps(result, default=str), callback_url, now, now)
+            )
+            self._db.commit()
+            self._writes += 1
+            if self._writes % 256 == 0:
+                self._purge_expired(now)
+        return job_id
+
+    def update(self, job_id: str, status: str, result: Optional[Dict[str, Any]] = None,
+               error: Optional[str] = None):
+        """
+        Set a job's status, and its result and/or error when given.
+        """
+        if status not in JOB_STATUSES:
+            raise ValueError(f"Unknown job status '{status}', expected one of {JOB_STATUSES}")
+        with self._lock:
+            self._db.execute(
+                "UPDATE analysis_jobs SET status = ?, result = COALESCE(?, result), "
+                "error = COALESCE(?, error), updated_at = ? WHERE job_id = ?",
+                (status, json.dumps(result, default=str) if result is not None else None, error,
+                 time.time(), job_id)
+            )
+            self._db.commit()
+
+    def fail_stale(self, max_age_seconds: float, error: str) -> int:
+        """
+        Mark pending or running jobs not updated for max_age_seconds as failed.
+        Returns the number of jobs marked.
+        """
+        now = time.time()
+        with self._lock:
+            marked = self._db.execute(
+                "UPDATE analysis_jobs SET status = 'failed', error = ?, updated_at = ? "
+                "WHERE status IN ('pending', 'running') AND updated_at < ?",
+                (error, now, now - max_age_seconds)
+            ).rowcount
+            self._db.commit()
+        if marked:
+            logger.warning(f"Marked {marked} stale analysis jobs as failed")
+        return marked
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Return the job as a dictionary, or None if it does not exist or has expired.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT job_id, status, result, error, callback_url, created_at, updated_at "
+                "FROM analysis_jobs WHERE job_id = ? AND created_at >= ?",
+                (job_id, time.time() - self.ttl_seconds)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "job_id": row[0],
+            "status": row[1],
+            "result": json.loads(row[2]),
+            "error": row[3],
+            "callback_url": row[4],
+            "created_at": row[5],
+            "updated_at": row[6],
+        }
+
+    def _purge_expired(self, now: float):
+        """
+        Delete jobs older than the TTL. Caller must hold the lock.
+        """
+        deleted = self._db.execute(
+            "DELETE FROM analysis_jobs WHERE created_at < ?", (now - self.ttl_seconds,)
+        ).rowcount
+        self._db.commit()
+        if deleted:
+            logger.info(f"Purged {deleted} expired analysis jobs")
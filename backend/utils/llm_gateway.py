@@ -0,0 +1,222 @@
+import asyncio
+import importlib.util
+import random
+import threading
+import time
+from typing import Any, AsyncIterator, Optional
+import httpx
+from openai import AzureOpenAI, AsyncAzureOpenAI, APIStatusError
+from backend.config import Config
+from ..utils.rate_limiter import get_rate_limiter
+from ..utils.metrics import LLM_RETRIES, LLM_TOKENS, current_stage
+from ..utils.logging_utils import setup_logging
+import logging
+
+# Set up logging for this module
+setup_logging()
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+class LLMGateway:
+    """
+    Process-wide access point for Azure OpenAI shared by every agent.
+    Holds one sync and one async client over tuned keep-alive HTTP/2 connection pools,
+    admits calls through the per-deployment rate limiter (RPM, TPM and adaptive concurrency
+    capped at LLM_MAX_CONCURRENCY), applies a per-call timeout, and retries 429/5xx
+    responses with jittered exponential backoff (nothing else is retried).
+    """
+    def __init__(self):
+        http2 = Config.LLM_HTTP2 and importlib.util.find_spec("h2") is not None
+        if Config.LLM_HTTP2 and not http2:
+            logger.warning("HTTP/2 requested but the 'h2' package is not installed; using HTTP/1.1")
+        limits = httpx.Limits(
+            max_connections=Config.LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=Config.LLM_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=Config.LLM_KEEPALIVE_EXPIRY_SECONDS,
+        )
+        timeout = httpx.Timeout(Config.LLM_TIMEOUT_SECONDS, connect=Config.LLM_CONNECT_TIMEOUT_SECONDS)
+        self.http_client = httpx.Client(http2=http2, limits=limits, timeout=timeout)
+        self.async_http_client = httpx.AsyncClient(http2=http2, limits=limits, timeout=timeout)
+
+        # Retries are handled here so that only 429/5xx are retried, with jitter
+        self.client = AzureOpenAI(
+            api_key=Config.DIAL_API_KEY,
+            api_version=Config.DIAL_API_VERSION,
+            azure_endpoint=Config.DIAL_ENDPOINT,
+            http_client=self.http_client,
+            max_retries=0,
+        )
+        self.async_client = AsyncAzureOpenAI(
+            api_key=Config.DIAL_API_KEY,
+            api_version=Config.DIAL_API_VERSION,
+            azure_endpoint=Config.DIAL_ENDPOINT,
+            http_client=self.async_http_client,
+            max_retries=0,
+        )
+        logger.info(
+            f"LLM gateway ready (http2={http2}, max_connections={Config.LLM_MAX_CONNECTIONS}, "
+            f"max_concurrency={Config.LLM_MAX_CONCURRENCY})"
+        )
+
+    def chat_completion(self, timeout: Optional[float] = None, **kwargs) -> Any:
+        """
+        Create a chat completion through the shared sync client.
+        The call waits for RPM/TPM capacity and an adaptive concurrency slot first.
+        """
+        kwargs.setdefault("model", Config.DEPLOYMENT_NAME)
+        call_timeout = timeout or Config.LLM_TIMEOUT_SECONDS
+        limiter = get_rate_limiter(kwargs["model"])
+        estimated_tokens = limiter.estimate_tokens(kwargs.get("messages", []), kwargs.get("max_tokens"))
+        for attempt in range(Config.LLM_MAX_RETRIES + 1):
+            admitted_at = limiter.acquire(estimated_tokens)
+            try:
+                response = self.client.chat.completions.create(timeout=call_timeout, **kwargs)
+            except Exception as e:
+                limiter.release(admitted_at, estimated_tokens, throttled=self._status_code(e) == 429)
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                logger.warning(f"LLM call failed ({self._status_code(e)}), retrying in {delay:.2f}s")
+                LLM_RETRIES.inc(stage=current_stage.get(), status=self._status_code(e))
+                time.sleep(delay)
+            except BaseException:
+                # Interrupted mid-call: free the slot without an AIMD signal, then propagate
+                limiter.release_cancelled()
+                raise
+            else:
+                limiter.release(admitted_at, estimated_tokens, self._usage_tokens(response))
+                self._record_usage(response)
+                return response
+
+    async def achat_completion(self, timeout: Optional[float] = None, **kwargs) -> Any:
+        """
+        Create a chat completion through the shared async client.
+        The call waits for RPM/TPM capacity and an adaptive concurrency slot first.
+        """
+        kwargs.setdefault("model", Config.DEPLOYMENT_NAME)
+        call_timeout = timeout or Config.LLM_TIMEOUT_SECONDS
+        limiter = get_rate_limiter(kwargs["model"])
+        estimated_tokens = limiter.estimate_tokens(kwargs.get("messages", []), kwargs.get("max_tokens"))
+        for attempt in range(Config.LLM_MAX_RETRIES + 1):
+            admitted_at = await limiter.aacquire(estimated_tokens)
+            try:
+                response = await self.async_client.chat.completions.create(timeout=call_timeout, **kwargs)
+            except Exception as e:
+                limiter.release(admitted_at, estimated_tokens, throttled=self._status_code(e) == 429)
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                logger.warning(f"LLM call failed ({self._status_code(e)}), retrying in {delay:.2f}s")
+                LLM_RETRIES.inc(stage=current_stage.get(), status=self._status_code(e))
+                await asyncio.sleep(delay)
+            except BaseException:
+                # Cancelled while awaiting the response (client disconnect, shutdown, gather teardown)
+                limiter.release_cancelled()
+                raise
+            else:
+                limiter.release(admitted_at, estimated_tokens, self._usage_tokens(response))
+                self._record_usage(response)
+                return response
+
+    async def astream_chat_completion(self, timeout: Optional[float] = None, **kwargs) -> AsyncIterator[str]:
+        """
+        Stream a chat completion through the shared async client, yielding content deltas.
+        Opening the stream is retried like achat_completion; once tokens have been
+        yielded a failure is raised to the caller.
+        """
+        kwargs.setdefault("model", Config.DEPLOYMENT_NAME)
+        call_timeout = timeout or Config.LLM_TIMEOUT_SECONDS
+        limiter = get_rate_limiter(kwargs["model"])
+        estimated_tokens = limiter.estimate_tokens(kwargs.get("messages", []), kwargs.get("max_tokens"))
+        for attempt in range(Config.LLM_MAX_RETRIES + 1):
+            admitted_at = await limiter.aacquire(estimated_tokens)
+            try:
+                stream = await self.async_client.chat.completions.create(
+                    timeout=call_timeout, stream=True, **kwargs
+                )
+                break
+            except Exception as e:
+                limiter.release(admitted_at, estimated_tokens, throttled=self._status_code(e) == 429)
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                logger.warning(f"LLM stream failed to open ({self._status_code(e)}), retrying in {delay:.2f}s")
+                LLM_RETRIES.inc(stage=current_stage.get(), status=self._status_code(e))
+                await asyncio.sleep(delay)
+            except BaseException:
+                # Cancelled before the stream opened; the finally below never runs for it
+                limiter.release_cancelled()
+                raise
+
+        first_token_at = None
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    if first_token_at is None:
+                        first_token_at = time.monotonic()
+                    yield chunk.choices[0].delta.content
+        finally:
+            # Also runs when the consumer stops early, e.g. the client disconnected.
+            # A stream's length depends on the answer, so AIMD is fed its time to first token.
+            latency = (first_token_at or time.monotonic()) - admitted_at
+            limiter.release(admitted_at, estimated_tokens, latency=latency)
+            await stream.close()
+
+    @staticmethod
+    def _record_usage(response: Any):
+        """
+        Count prompt and completion tokens against the stage that made the call.
+        """
+        usage = getattr(response, "usage", None)
+        stage = current_stage.get()
+        for kind in ("prompt_tokens", "completion_tokens"):
+            tokens = getattr(usage, kind, None)
+            if isinstance(tokens, int):
+                LLM_TOKENS.inc(tokens, stage=stage, kind=kind.split("_")[0])
+
+    @staticmethod
+    def _usage_tokens(response: Any) -> Optional[int]:
+        """
+        Total tokens reported by a completion, if the response carries usage.
+        """
+        total = getattr(getattr(response, "usage", None), "total_tokens", None)
+        return total if isinstance(total, int) else None
+
+    @staticmethod
+    def _status_code(error: Exception) -> Optional[int]:
+        """
+        HTTP status code of an API error, if it has one.
+        """
+        return error.status_code if isinstance(error, APIStatusError) else None
+
+    def _retry_delay(self, error: Exception, attempt: int) -> Optional[float]:
+        """
+        Seconds to wait before retrying, or None if the error must not be retried.
+        Uses full-jitter exponential backoff, but never less than a server-sent Retry-After.
+        """
+        if self._status_code(error) not in RETRYABLE_STATUS_CODES or attempt >= Config.LLM_MAX_RETRIES:
+            return None
+        backoff = min(Config.LLM_BACKOFF_MAX_SECONDS, Config.LLM_BACKOFF_BASE_SECONDS * (2 ** attempt))
+        delay = random.uniform(0, backoff)
+        retry_after = error.response.headers.get("retry-after") if error.response is not None else None
+        try:
+            delay = max(delay, float(retry_after)) if retry_after else delay
+        except ValueError:
+            pass
+        return min(delay, Config.LLM_BACKOFF_MAX_SECONDS)
+
+
+_gateway: Optional[LLMGateway] = None
+_gateway_lock = threading.Lock()
+
+def get_llm_gateway() -> LLMGateway:
+    """
+    Return the process-wide LLMGateway, creating it on first use.
+    """
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = LLMGateway()
+    return _gateway
@@ -0,0 +1,314 @@
+import bisect
+import contextvars
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+from backend.config import Config
+from ..utils.logging_utils import setup_logging
+import logging
+
+# Set up logging for this module
+setup_logging()
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Stage currently running in this context, used to attribute LLM tokens and retries
+current_stage: contextvars.ContextVar[str] = contextvars.ContextVar("current_stage", default="other")
+# Per-request stage timings in milliseconds, collected when a request asks for them
+request_timings: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar(
+    "request_timings", default=None
+)
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Counter:
+    """
+    Monotonic counter with labels, rendered in the Prometheus text format.
+    """
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        """
+        Add amount to the series identified by labels.
+        """
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        """
+        Current value of one series (0 if it was never incremented).
+        """
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        return self._values.get(key, 0.0)
+
+    def snapshot(self) -> List:
+        """
+        JSON-serializable copy of every series, for other worker processes to add up.
+        """
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+    def render(self, snapshots: Sequence[List] = ()) -> List[str]:
+        """
+        Render this process's series plus the given snapshots from other workers.
+        """
+        with self._lock:
+            values = dict(self._values)
+        for snapshot in snapshots:
+            for key, value in snapshot:
+                key = tuple(key)
+                values[key] = values.get(key, 0.0) + value
+        return [f"{self.name}{_format_labels(self.label_names, key)} {value}" for key, value in sorted(values.items())]
+
+
+class Histogram:
+    """
+    Histogram with labels and fixed buckets, rendered in the Prometheus text format.
+    """
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per series: counts per bucket (non-cumulative, last one is +Inf), sum, count
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        """
+        Record one observation in the series identified by labels.
+        """
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, totals = self._series.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0, 0]))
+            counts[index] += 1
+            totals[0] += value
+            totals[1] += 1
+
+    def count(self, **labels) -> int:
+        """
+        Number of observations in one series.
+        """
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        series = self._series.get(key)
+        return int(series[1][1]) if series else 0
+
+    def snapshot(self) -> List:
+        """
+        JSON-serializable copy of every series, for other worker processes to add up.
+        """
+        with self._lock:
+            return [[list(key), list(counts), list(totals)] for key, (counts, totals) in self._series.items()]
+
+    def render(self, snapshots: Sequence[List] = ()) -> List[str]:
+        """
+        Render this process's series plus the given snapshots from other workers.
+        """
+        with self._lock:
+            series = {key: (list(counts), list(totals)) for key, (counts, totals) in self._series.items()}
+        for snapshot in snapshots:
+            for key, counts, totals in snapshot:
+                key = tuple(key)
+                if len(counts) != len(self.buckets) + 1:
+                    continue
+                merged_counts, merged_totals = series.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0, 0]))
+                for index, bucket_count in enumerate(counts):
+                    merged_counts[index] += bucket_count
+                merged_totals[0] += totals[0]
+                merged_totals[1] += totals[1]
+        items = sorted(series.items())
+        lines = []
+        for key, (counts, (total, count)) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                labels = _format_labels(self.label_names, key, 'le="' + le + '"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {int(count)}")
+        return lines
+
+
+STAGE_SECONDS = Histogram(
+    "hate_speech_stage_duration_seconds", "Time spent in each analysis stage", labels=("stage",)
+)
+LLM_TOKENS = Counter("hate_speech_llm_tokens_total", "LLM tokens used, by stage and kind", labels=("stage", "kind"))
+LLM_RETRIES = Counter("hate_speech_llm_retries_total", "Retried LLM calls, by stage and HTTP status",
+                      labels=("stage", "status"))
+CACHE_REQUESTS = Counter("hate_speech_cache_requests_total", "Cache lookups, by cache and result",
+                         labels=("cache", "result"))
+PREFILTER_DECISIONS = Counter("hate_speech_prefilter_decisions_total", "Pre-filter outcomes",
+                              labels=("result",))
+AGENT_ERRORS = Counter("hate_speech_agent_errors_total", "Errors handled by each agent",
+                       labels=("agent", "error_type"))
+
+REGISTRY = [STAGE_SECONDS, LLM_TOKENS, LLM_RETRIES, CACHE_REQUESTS, PREFILTER_DECISIONS, AGENT_ERRORS]
+
+# Set by enable_multiprocess in backend.serve workers: the shared snapshot directory and this
+# worker's file in it (named per process start, so a reused pid never overwrites a dead worker)
+_multiprocess_dir: Optional[str] = None
+_snapshot_path: Optional[str] = None
+
+def enable_multiprocess(directory: str, interval: float = Config.METRICS_SNAPSHOT_SECONDS):
+    """
+    Publish this process's metrics to directory every interval seconds, and make /metrics
+    report the sum over every snapshot there. Called by each backend.serve worker after fork,
+    since the workers share one socket and a scrape reaches an arbitrary one of them.
+    """
+    global _multiprocess_dir, _snapshot_path
+    os.makedirs(directory, exist_ok=True)
+    _multiprocess_dir = directory
+    _snapshot_path = os.path.join(directory, f"metrics_{os.getpid()}_{uuid.uuid4().hex[:8]}.json")
+    write_snapshot()
+    if interval > 0:
+        def publish():
+            while True:
+                time.sleep(interval)
+                write_snapshot()
+        threading.Thread(target=publish, name="metrics-snapshot", daemon=True).start()
+
+def write_snapshot():
+    """
+    Atomically replace this process's snapshot file (no-op unless enable_multiprocess was called).
+    """
+    if _snapshot_path is None:
+        return
+    snapshot = {metric.name: metric.snapshot() for metric in REGISTRY}
+    temporary = f"{_snapshot_path}.tmp"
+    try:
+        with open(temporary, "w") as file:
+            json.dump(snapshot, file)
+        os.replace(temporary, _snapshot_path)
+    except OSError as e:
+        logger.warning(f"Failed to write metrics snapshot: {str(e)}")
+
+def _other_snapshots() -> List[Dict[str, List]]:
+    """
+    Snapshots published by the other workers, including workers that have exited,
+    so counters never go backwards when a worker is restarted.
+    """
+    if _multiprocess_dir is None:
+        return []
+    snapshots = []
+    for name in sorted(os.listdir(_multiprocess_dir)):
+        path = os.path.join(_multiprocess_dir, name)
+        if not name.endswith(".json") or path == _snapshot_path:
+            continue
+        try:
+            with open(path) as file:
+                snapshots.append(json.load(file))
+        except (OSError, ValueError) as e:
+            logger.debug(f"Skipping metrics snapshot {name}: {str(e)}")
+    return snapshots
+
+def render_metrics() -> str:
+    """
+    Render every metric in the Prometheus text exposition format (version 0.0.4).
+    Under backend.serve the values are summed over all workers: this process's live values
+    plus the snapshots the others publish every METRICS_SNAPSHOT_SECONDS. The process_info
+    line names the worker that answered the scrape.
+    """
+    others = _other_snapshots()
+    lines = [
+        "# HELP hate_speech_process_info Worker process serving this scrape",
+        "# TYPE hate_speech_process_info gauge",
+        f'hate_speech_process_info{{pid="{os.getpid()}"}} 1',
+    ]
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.render([snapshot.get(metric.name, []) for snapshot in others]))
+    return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def stage_timer(stage: str) -> Iterator[None]:
+    """
+    Time a block as the named stage: observe it in the stage histogram, add it to the
+    per-request timings if they are being collected, and mark it as the current stage.
+    """
+    token = current_stage.set(stage)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        try:
+            current_stage.reset(token)
+        except ValueError:
+            # An async generator may be finalized in a different context than it started in
+            pass
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        timings = request_timings.get()
+        if timings is not None:
+            # Stages that run several times per request (e.g. one search per branch) are summed
+            timings[stage] = round(timings.get(stage, 0.0) + elapsed * 1000, 2)
+
+def timed_stage(stage: str):
+    """
+    Decorator form of stage_timer for sync functions, coroutines and async generators.
+    """
+    def decorator(func):
+        if inspect.isasyncgenfunction(func):
+            @functools.wraps(func)
+            async def agen_wrapper(*args, **kwargs):
+                with stage_timer(stage):
+                    async for item in func(*args, **kwargs):
+                        yield item
+            return agen_wrapper
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with stage_timer(stage):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage_timer(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+@contextmanager
+def collect_request_timings() -> Iterator[Dict[str, float]]:
+    """
+    Collect stage timings (milliseconds) for everything run inside the block, including
+    asyncio tasks it starts. Yields the dictionary being filled in, with "total" added at the end.
+    """
+    timings: Dict[str, float] = {}
+    token = request_timings.set(timings)
+    start = time.perf_counter()
+    try:
+        yield timings
+    finally:
+        timings["total"] = round((time.perf_counter() - start) * 1000, 2)
+        request_timings.reset(token)
@@ -0,0 +1,455 @@
+import os
+import json
+import threading
+import time
+from datetime import datetime
+from typing import List, Dict, Any, Iterator, Optional, Union
+import numpy as np
+from backend.config import Config
+from ..utils.export_utils import export_documents
+from ..utils.vector_stores import matches_filters
+from ..utils.logging_utils import setup_logging
+import logging
+
+# Set up logging for this module
+setup_logging()
+logger = logging.getLogger(__name__)
+
+class NumpyVectorStore:
+    """
+    In-process vector store for small corpora, with the same interface as QdrantOpenAIStore.
+    Vectors are held as one contiguous, L2-normalized float32 matrix, so a query is a single
+    matrix-vector product (cosine similarity) followed by argpartition for the top-k.
+    The matrix is persisted to vectors.npy and memory-mapped on load, so several worker
+    processes share one copy in the page cache. Searches check every refresh_seconds whether
+    another process (e.g. backend.ingest) has saved a newer index, and remap it if so.
+    """
+    # Searches run in this process, so there are no round trips to batch
+    in_process = True
+
+    def __init__(
+        self,
+        collection_name: str = Config.COLLECTION_NAME,
+        storage_path: str = Config.NUMPY_STORE_PATH,
+        refresh_seconds: float = Config.NUMPY_STORE_REFRESH_SECONDS,
+    ):
+        self.logger = logger
+        self.collection_name = collection_name
+        self.storage_path = storage_path
+        self.documents = []
+        self.vector_size: Optional[int] = None
+        self._vectors = np.zeros((0, 0), dtype=np.float32)
+        self._ids: List[Any] = []
+        self._payloads: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self.refresh_seconds = refresh_seconds
+        # Identity of the payloads file last loaded or saved (it is written after vectors.npy)
+        self._loaded_signature = None
+        self._checked_at = time.monotonic()
+        # Upserts or deletes not saved yet; a reload would discard them
+        self._dirty = False
+
+        os.makedirs(storage_path, exist_ok=True)
+        self.vectors_path = os.path.join(storage_path, "vectors.npy")
+        self.payloads_path = os.path.join(storage_path, "payloads.json")
+        self.metadata_path = os.path.join(storage_path, "metadata.json")
+        self.load()
+
+    def load(self):
+        """
+        Load a persisted index, memory-mapping the vector matrix read-only.
+        """
+        if not (os.path.exists(self.vectors_path) and os.path.exists(self.payloads_path)):
+            self.logger.info(f"No persisted vector index at {self.storage_path}; starting empty")
+            return
+        try:
+            signature = self._file_signature()
+            vectors = np.load(self.vectors_path, mmap_mode="r")
+            with open(self.payloads_path, "r") as f:
+                stored = json.load(f)
+            if vectors.shape[0] != len(stored["ids"]):
+                raise ValueError(
+                    f"{self.vectors_path} has {vectors.shape[0]} rows but {self.payloads_path} has "
+                    f"{len(stored['ids'])} ids (index being rewritten?)"
+                )
+            with self._lock:
+                self._vectors = vectors
+                self._ids = stored["ids"]
+                self._payloads = stored["payloads"]
+                self.vector_size = vectors.shape[1] if vectors.shape[0] else stored.get("vector_size")
+                self._loaded_signature = signature
+                self._dirty = False
+            self.logger.info(f"Loaded {len(self._ids)} vectors from {self.storage_path}")
+        except Exception as e:
+            self.logger.error(f"Failed to load vector index: {str(e)}")
+            raise
+
+    def save(self):
+        """
+        Persist the index to storage_path (vectors.npy and payloads.json).
+        """
+        try:
+            with self._lock:
+                vectors, ids, payloads = self._vectors, list(self._ids), list(self._payloads)
+            # Write to temp files and rename so readers never map a half-written file
+            tmp_vectors = self.vectors_path + ".tmp.npy"
+            np.save(tmp_vectors, np.ascontiguousarray(vectors, dtype=np.float32))
+            os.replace(tmp_vectors, self.vectors_path)
+            tmp_payloads = self.payloads_path + ".tmp"
+            with open(tmp_payloads, "w") as f:
+                json.dump({"ids": ids, "payloads": payloads, "vector_size": self.vector_size}, f)
+            os.replace(tmp_payloads, self.payloads_path)
+            self._loaded_signature = self._file_signature()
+            self._dirty = False
+            self.logger.info(f"Saved {len(ids)} vectors to {self.storage_path}")
+        except Exception as e:
+            self.logger.error(f"Failed to save vector index: {str(e)}")
+            raise
+
+    def refresh_if_stale(self) -> bool:
+        """
+        Remap the persisted index if another process has saved a newer one since this instance
+        loaded it. Checked at most every refresh_seconds, and skipped while this instance has
+        unsaved changes. Returns whether the index was reloaded.
+        """
+        if self.refresh_seconds < 0 or time.monotonic() - self._checked_at < self.refresh_seconds:
+            return False
+        self._checked_at = time.monotonic()
+        if self._dirty:
+            return False
+        signature = self._file_signature()
+        if signature is None or signature == self._loaded_signature:
+            return False
+        try:
+            self.load()
+        except Exception as e:
+            # Keep serving the current index; the next check retries
+            self.logger.warning(f"Keeping the loaded vector index: {str(e)}")
+            return False
+        return True
+
+    def _file_signature(self):
+        """
+        Inode, size and modification time of payloads.json, or None if it does not exist.
+        """
+        try:
+            stat = os.stat(self.payloads_path)
+        except OSError:
+            return None
+        return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+    def _load_metadata(self) -> Dict[str, Any]:
+        """
+        Load metadata from local storage.
+        """
+        if os.path.exists(self.metadata_path):
+            try:
+                with open(self.metadata_path, "r") as f:
+                    return json.load(f)
+            except Exception as e:
+                self.logger.warning(f"Failed to load metadata: {str(e)}")
+        return {}
+
+    def _save_metadata(self, metadata: Dict[str, Any]):
+        """
+        Save metadata to local storage.
+        """
+        try:
+            with open(self.metadata_path, "w") as f:
+                json.dump(metadata, f, indent=2)
+        except Exception as e:
+            self.logger.error(f"Failed to save metadata: {str(e)}")
+            raise
+
+    def _ensure_collection_exists(self, vector_size: int = Config.EMBEDDING_DIMENSION):
+        """
+        Record the expected vector size; the in-memory index needs no other setup.
+        """
+        if self.vector_size is not None and self.vector_size != vector_size and len(self._ids):
+            self.logger.error(
+                f"Vector index has vector size {self.vector_size} but the embedding backend "
+                f"produces {vector_size}; rebuild the index and re-ingest policies"
+            )
+            return
+        self.vector_size = vector_size
+
+    def upsert_documents(self, points: List[Any]):
+        """
+        Upsert (insert or update) points into the index.
+        Points may be qdrant PointStructs or dicts with id, vector and payload.
+        """
+        try:
+            if not points:
+                return
+            with self._lock:
+                rows = {point_id: i for i, point_id in enumerate(self._ids)}
+                ids, payloads = list(self._ids), list(self._payloads)
+                vectors = self._vectors
+                if vectors.shape[0] == 0:
+                    vectors = np.zeros((0, len(self._point_field(points[0], "vector"))), dtype=np.float32)
+                else:
+                    # Copy out of a read-only memory map before modifying
+                    vectors = np.array(vectors, dtype=np.float32)
+
+                new_vectors = []
+                for point in points:
+                    point_id = self._point_field(point, "id")
+                    vector = self._normalize(np.asarray(self._point_field(point, "vector"), dtype=np.float32))
+                    payload = self._point_field(point, "payload") or {}
+                    if point_id in rows:
+                        vectors[rows[point_id]] = vector
+                        payloads[rows[point_id]] = payload
+                    else:
+                        rows[point_id] = len(ids)
+                        ids.append(point_id)
+                        payloads.append(payload)
+                        new_vectors.append(vector)
+                if new_vectors:
+                    vectors = np.vstack([vectors, np.stack(new_vectors)])
+
+                self._vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+                self._ids, self._payloads = ids, payloads
+                self.vector_size = self._vectors.shape[1]
+                self._dirty = True
+            self.logger.info(f"Upserted {len(points)} points to the vector index")
+        except Exception as e:
+            self.logger.error(f"Failed to upsert points: {str(e)}")
+            raise
+
+    def delete_points(self, point_ids: List[Any]):
+        """
+        Delete points from the index by id.
+        """
+        try:
+            remove = set(point_ids)
+            with self._lock:
+                keep = [i for i, point_id in enumerate(self._ids) if point_id not in remove]
+                self._vectors = np.ascontiguousarray(self._vectors[keep], dtype=np.float32)
+                self._ids = [self._ids[i] for i in keep]
+                self._payloads = [self._payloads[i] for i in keep]
+                self._dirty = True
+            self.logger.info(f"Deleted {len(remove)} points from the vector index")
+        except Exception as e:
+            self.logger.error(f"Failed to delete points: {str(e)}")
+            raise
+
+    def scroll_documents(
+        self,
+        page_size: int = Config.SCROLL_PAGE_SIZE,
+        payload_fields: Optional[List[str]] = None,
+        with_vectors: bool = False,
+        limit: Optional[int] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Stream documents from the index (same contract as QdrantOpenAIStore.scroll_documents).
+        page_size is accepted for interface parity; the index is already in memory.
+        """
+        self.refresh_if_stale()
+        with self._lock:
+            vectors, ids, payloads = self._vectors, list(self._ids), list(self._payloads)
+        if limit is not None:
+            ids, payloads = ids[:limit], payloads[:limit]
+        for row, (point_id, payload) in enumerate(zip(ids, payloads)):
+            if payload_fields:
+                document = {field: payload.get(field) for field in payload_fields}
+            else:
+                document = {
+                    "content": payload["content"],
+                    "source": payload["source"],
+                    "chunk_id": payload["chunk_id"],
+                    "content_hash": payload["content_hash"],
+                    "doc_id": payload["doc_id"],
+                }
+            document["qdrant_id"] = point_id
+            if with_vectors:
+                document["vector"] = vectors[row].tolist()
+            yield document
+        self.logger.info(f"Loaded {len(ids)} documents from the vector index")
+
+    def export_documents(
+        self,
+        path: str,
+        export_format: Optional[str] = None,
+        page_size: int = Config.SCROLL_PAGE_SIZE,
+        payload_fields: Optional[List[str]] = None,
+        with_vectors: bool = False,
+    ) -> int:
+        """
+        Export the index to a JSONL or Parquet file. Returns the number of documents written.
+        """
+        return export_documents(
+            self.scroll_documents(payload_fields=payload_fields, with_vectors=with_vectors),
+            path,
+            export_format=export_format,
+            batch_size=page_size,
+        )
+
+    def search(self, query_embedding, limit: int = 7, with_vectors: bool = False,
+               filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Search for similar documents using a query embedding.
+        Returns a list of matching documents with scores (and their vectors if with_vectors).
+        filters ({field: value or [values]}) restricts the search to matching payloads.
+        """
+        return self.search_batch([query_embedding], limit=limit, with_vectors=with_vectors, filters=filters)[0]
+
+    async def asearch(self, query_embedding, limit: int = 7, with_vectors: bool = False,
+                      filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Async variant of search. The search is pure CPU and takes microseconds, so it runs inline.
+        """
+        return self.search(query_embedding, limit=limit, with_vectors=with_vectors, filters=filters)
+
+    async def asearch_batch(self, query_embeddings, limit: int = 7, with_vectors: bool = False,
+                            filters: Union[Dict[str, Any], List[Optional[Dict[str, Any]]], None] = None
+                            ) -> List[List[Dict[str, Any]]]:
+        """
+        Async variant of search_batch; runs inline like asearch.
+        """
+        return self.search_batch(query_embeddings, limit=limit, with_vectors=with_vectors, filters=filters)
+
+    def search_batch(self, query_embeddings, limit: int = 7, with_vectors: bool = False,
+                     filters: Union[Dict[str, Any], List[Optional[Dict[str, Any]]], None] = None
+                     ) -> List[List[Dict[str, Any]]]:
+        """
+        Search with many query embeddings at once using one matrix-matrix product.
+        Returns one result list per query, in order. With filters, only the matching
+        rows are scored; a list of filters (one per query) runs one product per distinct filter.
+        """
+        if isinstance(filters, list):
+            groups: Dict[str, List[int]] = {}
+            for i, query_filters in enumerate(filters):
+                groups.setdefault(json.dumps(query_filters, sort_keys=True), []).append(i)
+            results: List[List[Dict[str, Any]]] = [[] for _ in filters]
+            for key, indices in groups.items():
+                group_results = self.search_batch([query_embeddings[i] for i in indices], limit=limit,
+                                                  with_vectors=with_vectors, filters=json.loads(key))
+                for i, group_result in zip(indices, group_results):
+                    results[i] = group_result
+            return results
+        try:
+            if len(query_embeddings) == 0:
+                return []
+            self.refresh_if_stale()
+            with self._lock:
+                vectors, payloads = self._vectors, self._payloads
+            queries = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+            rows = None
+            if filters:
+                rows = np.array([i for i, payload in enumerate(payloads) if matches_filters(payload, filters)],
+                                dtype=np.int64)
+                vectors = vectors[rows]
+            if vectors.shape[0] == 0 or limit <= 0:
+                return [[] for _ in range(queries.shape[0])]
+
+            norms = np.linalg.norm(queries, axis=1, keepdims=True)
+            queries = queries / np.where(norms == 0, 1.0, norms)
+            scores = queries @ vectors.T
+
+            k = min(limit, vectors.shape[0])
+            if k < vectors.shape[0]:
+                top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            else:
+                top = np.broadcast_to(np.arange(k), (scores.shape[0], k))
+            top_scores = np.take_along_axis(scores, top, axis=1)
+            order = np.argsort(-top_scores, axis=1)
+            top = np.take_along_axis(top, order, axis=1)
+            top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+            all_results = []
+            for row_indices, row_scores in zip(top, top_scores):
+                results = []
+                for i, (index, score) in enumerate(zip(row_indices, row_scores)):
+                    payload = payloads[index if rows is None else rows[index]]
+                    document = {
+                        "text": payload["content"],
+                        "source": payload["source"],
+                        "chunk_id": payload["chunk_id"],
+                        "content_hash": payload.get("content_hash"),
+                        "score": round(float(score) * 100, 2),
+                        "rank": i + 1,
+                    }
+                    if with_vectors:
+                        document["vector"] = vectors[index].tolist()
+                    results.append(document)
+                all_results.append(results)
+            self.logger.info(f"Found {sum(len(r) for r in all_results)} matching documents for {len(all_results)} queries")
+            return all_results
+        except Exception as e:
+            self.logger.error(f"Search failed: {str(e)}")
+            raise
+
+    def delete_collection(self):
+        """
+        Delete all vectors from the index and its persisted files.
+        """
+        try:
+            with self._lock:
+                self._vectors = np.zeros((0, 0), dtype=np.float32)
+                self._ids, self._payloads = [], []
+                self._loaded_signature = None
+                self._dirty = False
+            for path in (self.vectors_path, self.payloads_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            self.logger.info(f"Deleted vector index: {self.collection_name}")
+        except Exception as e:
+            self.logger.error(f"Failed to delete vector index: {str(e)}")
+            raise
+
+    def get_storage_stats(self) -> Optional[Dict[str, Any]]:
+        """
+        Get statistics about the storage and index.
+        """
+        try:
+            metadata = self._load_metadata()
+            return {
+                "document_count": len(self._ids),
+                "embedding_dimension": self.vector_size or 0,
+                "vector_count": len(self._ids),
+                "collection_name": self.collection_name,
+                "storage_path": self.storage_path,
+                "policy_versions": metadata.get("policy_versions", {}),
+                "last_updated": metadata.get("last_updated"),
+                "index_size_mb": round(self._vectors.nbytes / (1024 * 1024), 2),
+            }
+        except Exception as e:
+            self.logger.error(f"Error getting storage stats: {str(e)}")
+            return None
+
+    def optimize_index(self):
+        """
+        Brute-force search needs no index maintenance; kept for interface parity.
+        """
+        self.logger.info("In-memory vector index requires no optimization")
+
+    def health_check(self) -> Dict[str, Any]:
+        """
+        Report the state of the in-memory index.
+        """
+        return {
+            "qdrant_healthy": True,
+            "collection_exists": True,
+            "collection_stats": {
+                "points_count": len(self._ids),
+                "vector_size": self.vector_size,
+                "distance": "Cosine",
+            },
+            "local_documents_count": len(self._ids),
+            "timestamp": datetime.now().isoformat(),
+        }
+
+    @staticmethod
+    def _point_field(point: Any, field: str) -> Any:
+        """
+        Read a field from a PointStruct-like object or a dict.
+        """
+        return point[field] if isinstance(point, dict) else getattr(point, field)
+
+    @staticmethod
+    def _normalize(vector: np.ndarray) -> np.ndarray:
+        """
+        L2-normalize a vector so dot products are cosine similarities.
+        """
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
@@ -0,0 +1,261 @@
+import os
+import time
+import uuid
+import hashlib
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+from backend.config import Config
+from ..utils.embedding_utils import EmbeddingGenerator
+from ..utils.logging_utils import setup_logging
+import logging
+
+# Set up logging for this module
+setup_logging()
+logger = logging.getLogger(__name__)
+
+POLICY_FILE_EXTENSIONS = (".txt", ".md")
+
+class PolicyIngestor:
+    """
+    Loads policy documents into the vector store.
+    Files are streamed line by line and split into paragraph-aligned chunks carrying
+    chunk_id/doc_id/content_hash payloads plus the document's category and jurisdiction.
+    Only chunks whose content hash changed are re-embedded (in large batches) and upserted
+    (in pages); chunks that disappeared are deleted.
+    """
+    def __init__(
+        self,
+        store=None,
+        embedding_generator: Optional[EmbeddingGenerator] = None,
+        policy_path: str = Config.POLICY_DOCS_PATH,
+        chunk_size: int = Config.INGEST_CHUNK_SIZE,
+        embed_batch_size: int = Config.INGEST_EMBED_BATCH_SIZE,
+        upsert_batch_size: int = Config.INGEST_UPSERT_BATCH_SIZE,
+        doc_metadata: Optional[Dict[str, Dict[str, Any]]] = None,
+    ):
+        if store is None:
+            from ..utils.vector_stores import create_vector_store
+            store = create_vector_store()
+        self.store = store
+        self.embedding_generator = embedding_generator or EmbeddingGenerator()
+        self.policy_path = policy_path
+        self.chunk_size = chunk_size
+        self.embed_batch_size = embed_batch_size
+        self.upsert_batch_size = upsert_batch_size
+        self.doc_metadata = Config.POLICY_DOC_METADATA if doc_metadata is None else doc_metadata
+
+    def ingest(self, force: bool = False, prune: bool = True) -> Dict[str, Any]:
+        """
+        Ingest every policy file under policy_path.
+        Files whose hash and metadata match the recorded policy version are skipped unless force is set.
+        With prune, points belonging to deleted files or vanished chunks are removed.
+        Returns ingestion statistics.
+        """
+        start = time.perf_counter()
+        self.store._ensure_collection_exists(self.embedding_generator.dimension)
+        if hasattr(self.store, "ensure_payload_indexes"):
+            self.store.ensure_payload_indexes()
+        metadata = self.store._load_metadata()
+        policy_versions = metadata.get("policy_versions", {})
+
+        # point id -> (doc_id, content_hash) for everything already indexed
+        existing = {
+            document["qdrant_id"]: (document["doc_id"], document["content_hash"])
+            for document in self.store.scroll_documents(payload_fields=["doc_id", "content_hash"])
+        }
+        stats = {
+            "files_scanned": 0,
+            "files_skipped": 0,
+            "chunks_total": 0,
+            "chunks_embedded": 0,
+            "chunks_unchanged": 0,
+            "points_deleted": 0,
+        }
+        seen_docs = set()
+        stale_ids: List[Any] = []
+        pending: List[Dict[str, Any]] = []
+
+        for path in self.iter_policy_files():
+            doc_id = os.path.splitext(os.path.basename(path))[0]
+            seen_docs.add(doc_id)
+            stats["files_scanned"] += 1
+            file_hash = self._file_hash(path)
+            recorded = policy_versions.get(doc_id, {})
+            # Changed metadata rewrites every chunk's payload, even if the text is unchanged
+            refresh = force or recorded.get("metadata") != self.metadata_for(doc_id)
+            if not refresh and recorded.get("content_hash") == file_hash:
+                stats["files_skipped"] += 1
+                continue
+
+            doc_point_ids = {point_id for point_id, (doc, _) in existing.items() if doc == doc_id}
+            chunk_count = 0
+            for chunk in self.iter_chunks(path):
+                chunk_count += 1
+                point_id = chunk["id"]
+                doc_point_ids.discard(point_id)
+                if not refresh and existing.get(point_id, (None, None))[1] == chunk["payload"]["content_hash"]:
+                    stats["chunks_unchanged"] += 1
+                    continue
+                pending.append(chunk)
+                if len(pending) >= self.embed_batch_size:
+                    stats["chunks_embedded"] += self._embed_and_upsert(pending)
+                    pending = []
+            stats["chunks_total"] += chunk_count
+            stale_ids.extend(doc_point_ids)
+            policy_versions[doc_id] = {
+                "content_hash": file_hash,
+                "chunks": chunk_count,
+                "metadata": self.metadata_for(doc_id),
+                "updated": datetime.now().isoformat(),
+            }
+
+        if pending:
+            stats["chunks_embedded"] += self._embed_and_upsert(pending)
+
+        if prune:
+            for point_id, (doc_id, _) in existing.items():
+                if doc_id not in seen_docs:
+                    stale_ids.append(point_id)
+            for doc_id in list(policy_versions):
+                if doc_id not in seen_docs:
+                    del policy_versions[doc_id]
+        if stale_ids:
+            self.store.delete_points(stale_ids)
+            stats["points_deleted"] = len(stale_ids)
+
+        if hasattr(self.store, "save"):
+            self.store.save()
+        metadata["policy_versions"] = policy_versions
+        metadata["last_updated"] = datetime.now().isoformat()
+        self.store._save_metadata(metadata)
+
+        stats["elapsed_seconds"] = round(time.perf_counter() - start, 3)
+        logger.info(f"Policy ingestion finished: {stats}")
+        return stats
+
+    def metadata_for(self, doc_id: str) -> Dict[str, Any]:
+        """
+        Category and jurisdiction payload fields for a policy document.
+        """
+        return {**Config.POLICY_DEFAULT_METADATA, **self.doc_metadata.get(doc_id, {})}
+
+    def iter_policy_files(self) -> Iterator[str]:
+        """
+        Yield policy file paths under policy_path in a stable order.
+        """
+        for root, _, files in sorted(os.walk(self.policy_path)):
+            for name in sorted(files):
+                if name.lower().endswith(POLICY_FILE_EXTENSIONS):
+                    yield os.path.join(root, name)
+
+    def iter_chunks(self, path: str) -> Iterator[Dict[str, Any]]:
+        """
+        Stream a policy file and yield chunks as point dicts (id, payload).
+        Paragraphs are packed into chunks of up to chunk_size characters; longer
+        paragraphs are split on sentence boundaries, then hard-wrapped.
+        A leading '# Title' line becomes the chunk source.
+        """
+        doc_id = os.path.splitext(os.path.basename(path))[0]
+        metadata = self.metadata_for(doc_id)
+        source = doc_id
+        chunk_id = 0
+        buffer: List[str] = []
+        buffer_len = 0
+
+        def make_chunk(content: str) -> Dict[str, Any]:
+            return {
+                "id": str(uuid.uuid5(uuid.NAMESPACE_URL, f"{self.store.collection_name}/{doc_id}/{chunk_id}")),
+                "payload": {
+                    "content": content,
+                    "source": source,
+                    "chunk_id": chunk_id,
+                    "content_hash": EmbeddingGenerator.calculate_content_hash(content),
+                    "doc_id": doc_id,
+                    **metadata,
+                },
+            }
+
+        with open(path, "r", encoding="utf-8") as f:
+            for paragraph in self._iter_paragraphs(f):
+                if chunk_id == 0 and not buffer and paragraph.startswith("# "):
+                    source = paragraph[2:].strip()
+                    continue
+                for piece in self._split_long(paragraph):
+                    if buffer and buffer_len + len(piece) + 2 > self.chunk_size:
+                        yield make_chunk("\n\n".join(buffer))
+                        chunk_id += 1
+                        buffer, buffer_len = [], 0
+                    buffer.append(piece)
+                    buffer_len += len(piece) + 2
+        if buffer:
+            yield make_chunk("\n\n".join(buffer))
+
+    @staticmethod
+    def _iter_paragraphs(lines) -> Iterator[str]:
+        """
+        Group lines into blank-line separated paragraphs.
+        """
+        paragraph: List[str] = []
+        for line in lines:
+            line = line.strip()
+            if line:
+                paragraph.append(line)
+            elif paragraph:
+                yield "\n".join(paragraph)
+                paragraph = []
+        if paragraph:
+            yield "\n".join(paragraph)
+
+    def _split_long(self, paragraph: str) -> Iterator[str]:
+        """
+        Split a paragraph longer than chunk_size on sentence boundaries, hard-wrapping as a last resort.
+        """
+        if len(paragraph) <= self.chunk_size:
+            yield paragraph
+            return
+        current = ""
+        for sentence in paragraph.replace(". ", ".\x00").split("\x00"):
+            while len(sentence) > self.chunk_size:
+                if current:
+                    yield current
+                    current = ""
+                yield sentence[:self.chunk_size]
+                sentence = sentence[self.chunk_size:]
+            if current and len(current) + len(sentence) + 1 > self.chunk_size:
+                yield current
+                current = ""
+            current = f"{current} {sentence}" if current else sentence
+        if current:
+            yield current
+
+    def _embed_and_upsert(self, chunks: List[Dict[str, Any]]) -> int:
+        """
+        Embed a batch of chunks in one call and upsert them in pages of upsert_batch_size.
+        """
+        embeddings = self.embedding_generator.embed_documents([c["payload"]["content"] for c in chunks])
+        points = [self._make_point(chunk, embedding) for chunk, embedding in zip(chunks, embeddings)]
+        for start in range(0, len(points), self.upsert_batch_size):
+            self.store.upsert_documents(points[start:start + self.upsert_batch_size])
+        return len(points)
+
+    @staticmethod
+    def _make_point(chunk: Dict[str, Any], embedding: List[float]):
+        """
+        Build a qdrant PointStruct for a chunk, or a plain dict if qdrant_client is unavailable.
+        """
+        try:
+            from qdrant_client.models import PointStruct
+        except ImportError:
+            return {"id": chunk["id"], "vector": embedding, "payload": chunk["payload"]}
+        return PointStruct(id=chunk["id"], vector=embedding, payload=chunk["payload"])
+
+    @staticmethod
+    def _file_hash(path: str) -> str:
+        """
+        SHA-256 of a file, read in blocks so large files are never fully loaded.
+        """
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
@@ -1,10 +1,17 @@
 import os
 import json
 from datetime import datetime
-from typing import List, Dict, Any, Optional
-from qdrant_client import QdrantClient
-from qdrant_client.models import VectorParams, Distance, PointStruct
+from typing import List, Dict, Any, Iterator, Optional, Union
+from qdrant_client import QdrantClient, AsyncQdrantClient
+from qdrant_client.models import (
+    VectorParams, Distance, PointStruct, PointIdsList, PayloadSchemaType,
+    Filter, FieldCondition, MatchAny, MatchValue, QueryRequest,
+    HnswConfigDiff, ScalarQuantization, ScalarQuantizationConfig, ScalarType,
+    BinaryQuantization, BinaryQuantizationConfig, SearchParams, QuantizationSearchParams,
+    Disabled, VectorParamsDiff,
+)
 from backend.config import Config
+from ..utils.export_utils import export_documents
 from ..utils.logging_utils import setup_logging
 import logging
 
@@ -22,6 +29,8 @@ class QdrantOpenAIStore:
         qdrant_port: int = Config.QDRANT_PORT,
         collection_name: str = Config.COLLECTION_NAME,
         storage_path: str = "logs/policy_embeddings",
+        prefer_grpc: bool = Config.QDRANT_PREFER_GRPC,
+        grpc_port: int = Config.QDRANT_GRPC_PORT,
     ):
         self.logger = logger
         self.storage_path = storage_path
@@ -30,11 +39,25 @@ class QdrantOpenAIStore:
 
         os.makedirs(storage_path, exist_ok=True)
         self.metadata_path = os.path.join(storage_path, "metadata.json")
+        # Local mode searches in this process, so there are no round trips to batch
+        self.in_process = bool(Config.QDRANT_LOCATION)
 
         try:
-            # Connect to Qdrant instance
-            self.qdrant_client = QdrantClient(host=qdrant_host, port=qdrant_port)
-            self.logger.info(f"Successfully connected to Qdrant at {qdrant_host}:{qdrant_port}")
+            if Config.QDRANT_LOCATION:
+                # Local mode runs Qdrant in-process; note that ":memory:" gives the sync and
+                # async clients separate, unshared collections
+                self.qdrant_client = QdrantClient(location=Config.QDRANT_LOCATION)
+                self.async_qdrant_client = AsyncQdrantClient(location=Config.QDRANT_LOCATION)
+                self.logger.info(f"Using in-process Qdrant at {Config.QDRANT_LOCATION}")
+            else:
+                # Connect to Qdrant instance; with prefer_grpc, data calls use gRPC on grpc_port
+                connection = {"host": qdrant_host, "port": qdrant_port, "grpc_port": grpc_port,
+                              "prefer_grpc": prefer_grpc}
+                self.qdrant_client = QdrantClient(**connection)
+                # Async client shares the same endpoint; it connects lazily on first request
+                self.async_qdrant_client = AsyncQdrantClient(**connection)
+                transport = f"gRPC port {grpc_port}" if prefer_grpc else f"REST port {qdrant_port}"
+                self.logger.info(f"Successfully connected to Qdrant at {qdrant_host} ({transport})")
             collections = self.qdrant_client.get_collections()
             self.logger.debug(f"Available collections: {[c.name for c in collections.collections]}")
         except Exception as e:
@@ -64,29 +87,76 @@ class QdrantOpenAIStore:
             self.logger.error(f"Failed to save metadata: {str(e)}")
             raise
 
-    def _ensure_collection_exists(self):
+    def _ensure_collection_exists(self, vector_size: int = Config.EMBEDDING_DIMENSION):
         """
         Ensure the Qdrant collection exists, create if not.
+        vector_size should be the dimension of the active embedding backend.
         """
         try:
             collections = self.qdrant_client.get_collections()
             collection_names = [c.name for c in collections.collections]
             if self.collection_name not in collection_names:
-                self.logger.info(f"Creating collection: {self.collection_name}")
+                self.logger.info(f"Creating collection: {self.collection_name} (vector size {vector_size})")
                 self.qdrant_client.create_collection(
                     collection_name=self.collection_name,
                     vectors_config=VectorParams(
-                        size=1536,  # OpenAI embedding dimension
+                        size=vector_size,
                         distance=Distance.COSINE,
+                        on_disk=Config.QDRANT_VECTORS_ON_DISK,
                     ),
+                    hnsw_config=self._hnsw_config(),
+                    quantization_config=self._quantization_config(),
                 )
                 self.logger.info(f"Collection '{self.collection_name}' created successfully")
             else:
                 self.logger.debug(f"Collection '{self.collection_name}' already exists")
+                existing_size = self.qdrant_client.get_collection(
+                    self.collection_name
+                ).config.params.vectors.size
+                if existing_size != vector_size:
+                    self.logger.error(
+                        f"Collection '{self.collection_name}' has vector size {existing_size} but the "
+                        f"embedding backend produces {vector_size}; re-create the collection and re-ingest policies"
+                    )
         except Exception as e:
             self.logger.error(f"Failed to ensure collection exists: {str(e)}")
             raise
 
+    def ensure_payload_indexes(self, fields: List[str] = Config.PAYLOAD_INDEX_FIELDS):
+        """
+        Create keyword payload indexes so filtered searches only visit matching points.
+        Creating an index that already exists is a no-op.
+        """
+        try:
+            existing = self.qdrant_client.get_collection(self.collection_name).payload_schema or {}
+            for field in fields:
+                if field in existing:
+                    continue
+                self.qdrant_client.create_payload_index(
+                    collection_name=self.collection_name,
+                    field_name=field,
+                    field_schema=PayloadSchemaType.KEYWORD,
+                )
+                self.logger.info(f"Created payload index on '{field}'")
+        except Exception as e:
+            self.logger.error(f"Failed to create payload indexes: {str(e)}")
+            raise
+
+    @staticmethod
+    def _build_filter(filters: Optional[Dict[str, Any]]) -> Optional[Filter]:
+        """
+        Translate {field: value or [values]} into a Qdrant filter requiring every field to match.
+        """
+        if not filters:
+            return None
+        conditions = []
+        for field, accepted in filters.items():
+            if isinstance(accepted, (list, tuple, set)):
+                conditions.append(FieldCondition(key=field, match=MatchAny(any=list(accepted))))
+            else:
+                conditions.append(FieldCondition(key=field, match=MatchValue(value=accepted)))
+        return Filter(must=conditions)
+
     def upsert_documents(self, points: List[PointStruct]):
         """
         Upsert (insert or update) points (embeddings) into the Qdrant collection.
@@ -100,65 +170,187 @@ class QdrantOpenAIStore:
             self.logger.error(f"Failed to upsert points: {str(e)}")
             raise
 
-    def scroll_documents(self, limit=10000) -> List[Dict[str, Any]]:
+    def delete_points(self, point_ids: List[Any]):
         """
-        Retrieve all documents from the Qdrant collection (up to limit).
+        Delete points from the Qdrant collection by id.
         """
         try:
-            response = self.qdrant_client.scroll(
+            self.qdrant_client.delete(
                 collection_name=self.collection_name,
-                limit=limit,
-                with_payload=True,
-                with_vectors=False,
+                points_selector=PointIdsList(points=list(point_ids)),
             )
-            documents = []
-            for point in response[0]:
-                payload = point.payload
-                documents.append(
-                    {
-                        "content": payload["content"],
-                        "source": payload["source"],
-                        "chunk_id": payload["chunk_id"],
-                        "content_hash": payload["content_hash"],
-                        "doc_id": payload["doc_id"],
-                        "qdrant_id": point.id,
-                    }
+            self.logger.info(f"Deleted {len(point_ids)} points from Qdrant")
+        except Exception as e:
+            self.logger.error(f"Failed to delete points: {str(e)}")
+            raise
+
+    def scroll_documents(
+        self,
+        page_size: int = Config.SCROLL_PAGE_SIZE,
+        payload_fields: Optional[List[str]] = None,
+        with_vectors: bool = False,
+        limit: Optional[int] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Stream documents from the Qdrant collection, one page of page_size points at a time,
+        following next_page_offset until the collection (or limit) is exhausted.
+        With payload_fields only those payload keys are fetched and returned; otherwise
+        the standard document fields are returned.
+        """
+        offset = None
+        loaded = 0
+        try:
+            while limit is None or loaded < limit:
+                batch_size = page_size if limit is None else min(page_size, limit - loaded)
+                points, offset = self.qdrant_client.scroll(
+                    collection_name=self.collection_name,
+                    limit=batch_size,
+                    offset=offset,
+                    with_payload=payload_fields if payload_fields else True,
+                    with_vectors=with_vectors,
                 )
-            self.logger.info(f"Loaded {len(documents)} documents from Qdrant")
-            return documents
+                for point in points:
+                    yield self._point_to_document(point, payload_fields, with_vectors)
+                loaded += len(points)
+                if offset is None or not points:
+                    break
+            self.logger.info(f"Loaded {loaded} documents from Qdrant")
         except Exception as e:
-            self.logger.error(f"Failed to load documents from Qdrant: {str(e)}")
-            return []
+            self.logger.error(f"Failed to load documents from Qdrant after {loaded} documents: {str(e)}")
+            raise
 
-    def search(self, query_embedding, limit: int = 7) -> List[Dict[str, Any]]:
+    def export_documents(
+        self,
+        path: str,
+        export_format: Optional[str] = None,
+        page_size: int = Config.SCROLL_PAGE_SIZE,
+        payload_fields: Optional[List[str]] = None,
+        with_vectors: bool = False,
+    ) -> int:
+        """
+        Export the whole collection to a JSONL or Parquet file, page by page.
+        Returns the number of documents written.
+        """
+        return export_documents(
+            self.scroll_documents(page_size=page_size, payload_fields=payload_fields, with_vectors=with_vectors),
+            path,
+            export_format=export_format,
+            batch_size=page_size,
+        )
+
+    @staticmethod
+    def _point_to_document(point, payload_fields: Optional[List[str]], with_vectors: bool) -> Dict[str, Any]:
+        """
+        Convert a scrolled Qdrant point into a document dict.
+        """
+        payload = point.payload or {}
+        if payload_fields:
+            document = {field: payload.get(field) for field in payload_fields}
+        else:
+            document = {
+                "content": payload["content"],
+                "source": payload["source"],
+                "chunk_id": payload["chunk_id"],
+                "content_hash": payload["content_hash"],
+                "doc_id": payload["doc_id"],
+            }
+        document["qdrant_id"] = point.id
+        if with_vectors:
+            document["vector"] = point.vector
+        return document
+
+    def search(self, query_embedding, limit: int = 7, with_vectors: bool = False,
+               filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
         """
         Search for similar documents in Qdrant using a query embedding.
-        Returns a list of matching documents with scores.
+        Returns a list of matching documents with scores (and their vectors if with_vectors).
+        filters ({field: value or [values]}) restricts the search to matching payloads.
+        """
+        return self.search_batch([query_embedding], limit=limit, with_vectors=with_vectors, filters=filters)[0]
+
+    async def asearch(self, query_embedding, limit: int = 7, with_vectors: bool = False,
+                      filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Async variant of search using the AsyncQdrantClient.
+        """
+        results = await self.asearch_batch([query_embedding], limit=limit, with_vectors=with_vectors, filters=filters)
+        return results[0]
+
+    def search_batch(self, query_embeddings, limit: int = 7, with_vectors: bool = False,
+                     filters: Union[Dict[str, Any], List[Optional[Dict[str, Any]]], None] = None
+                     ) -> List[List[Dict[str, Any]]]:
+        """
+        Search with many query embeddings in one request to Qdrant (query_batch_points).
+        filters is one filter for every query or a list with one filter per query.
+        Returns one result list per query, in order.
         """
         try:
-            search_results = self.qdrant_client.search(
+            if len(query_embeddings) == 0:
+                return []
+            responses = self.qdrant_client.query_batch_points(
                 collection_name=self.collection_name,
-                query_vector=query_embedding,
-                limit=limit,
-                with_payload=True,
+                requests=self._batch_requests(query_embeddings, limit, with_vectors, filters),
             )
-            results = []
-            for i, result in enumerate(search_results):
-                results.append(
-                    {
-                        "text": result.payload["content"],
-                        "source": result.payload["source"],
-                        "chunk_id": result.payload["chunk_id"],
-                        "score": round(float(result.score) * 100, 2),
-                        "rank": i + 1,
-                    }
-                )
-            self.logger.info(f"Found {len(results)} matching documents")
-            return results
+            return [self._format_search_results(response.points, with_vectors) for response in responses]
         except Exception as e:
             self.logger.error(f"Search failed: {str(e)}")
             raise
 
+    async def asearch_batch(self, query_embeddings, limit: int = 7, with_vectors: bool = False,
+                            filters: Union[Dict[str, Any], List[Optional[Dict[str, Any]]], None] = None
+                            ) -> List[List[Dict[str, Any]]]:
+        """
+        Async variant of search_batch using the AsyncQdrantClient.
+        """
+        try:
+            if len(query_embeddings) == 0:
+                return []
+            responses = await self.async_qdrant_client.query_batch_points(
+                collection_name=self.collection_name,
+                requests=self._batch_requests(query_embeddings, limit, with_vectors, filters),
+            )
+            return [self._format_search_results(response.points, with_vectors) for response in responses]
+        except Exception as e:
+            self.logger.error(f"Search failed: {str(e)}")
+            raise
+
+    def _batch_requests(self, query_embeddings, limit: int, with_vectors: bool, filters) -> List[QueryRequest]:
+        """
+        Build one QueryRequest per query embedding, each with its own payload filter.
+        """
+        per_query = filters if isinstance(filters, list) else [filters] * len(query_embeddings)
+        return [
+            QueryRequest(
+                query=list(map(float, embedding)),
+                filter=self._build_filter(query_filters),
+                limit=limit,
+                params=self._search_params(),
+                with_payload=True,
+                with_vector=with_vectors,
+            )
+            for embedding, query_filters in zip(query_embeddings, per_query)
+        ]
+
+    def _format_search_results(self, search_results, with_vectors: bool = False) -> List[Dict[str, Any]]:
+        """
+        Convert Qdrant scored points into result dicts.
+        """
+        results = []
+        for i, result in enumerate(search_results):
+            document = {
+                "text": result.payload["content"],
+                "source": result.payload["source"],
+                "chunk_id": result.payload["chunk_id"],
+                "content_hash": result.payload.get("content_hash"),
+                "score": round(float(result.score) * 100, 2),
+                "rank": i + 1,
+            }
+            if with_vectors:
+                document["vector"] = result.vector
+            results.append(document)
+        self.logger.info(f"Found {len(results)} matching documents")
+        return results
+
     def delete_collection(self):
         """
         Delete the Qdrant collection.
@@ -209,31 +401,90 @@ class QdrantOpenAIStore:
             self.logger.error(f"Error getting storage stats: {str(e)}")
             return None
 
-    def optimize_index(self):
+    def optimize_index(self) -> Dict[str, Any]:
         """
-        Placeholder for index optimization logic.
-        Qdrant handles optimization automatically, but this can be extended.
+        Bring the collection's HNSW, quantization and on-disk settings in line with Config.
+        Only settings that differ are sent; Qdrant then rebuilds the affected segments in the
+        background while the collection keeps serving searches. Returns what was changed.
         """
         try:
-            self.logger.info("Triggering Qdrant collection optimization")
             collection_info = self.qdrant_client.get_collection(self.collection_name)
-            current_size = collection_info.points_count
-            if current_size > 1000:
-                self.logger.info(
-                    f"Collection has {current_size} points, optimization may improve performance"
-                )
-                self.logger.info(
-                    "Consider configuring HNSW parameters for large collections"
-                )
+            config = collection_info.config
+            changes: Dict[str, Any] = {}
+
+            hnsw = config.hnsw_config
+            if hnsw is None or (hnsw.m, hnsw.ef_construct) != (Config.QDRANT_HNSW_M, Config.QDRANT_HNSW_EF_CONSTRUCT):
+                changes["hnsw_config"] = self._hnsw_config()
+
+            quantization = self._quantization_config()
+            if quantization is None and config.quantization_config is not None:
+                changes["quantization_config"] = Disabled.DISABLED
+            elif quantization is not None and quantization != config.quantization_config:
+                changes["quantization_config"] = quantization
+
+            vectors = config.params.vectors
+            if bool(getattr(vectors, "on_disk", False)) != Config.QDRANT_VECTORS_ON_DISK:
+                # "" addresses the collection's single unnamed vector
+                changes["vectors_config"] = {"": VectorParamsDiff(on_disk=Config.QDRANT_VECTORS_ON_DISK)}
+
+            if changes:
+                self.qdrant_client.update_collection(collection_name=self.collection_name, **changes)
                 self.logger.info(
-                    "Qdrant automatically handles index optimization in the background"
+                    f"Updated collection '{self.collection_name}' ({collection_info.points_count} points): "
+                    f"{sorted(changes)}; segments are re-indexed in the background"
                 )
             else:
-                self.logger.info("Collection size doesn't require special optimization")
+                self.logger.info(f"Collection '{self.collection_name}' already matches the configured index settings")
+            return {
+                "points_count": collection_info.points_count,
+                "updated": sorted(changes),
+                "hnsw": {"m": Config.QDRANT_HNSW_M, "ef_construct": Config.QDRANT_HNSW_EF_CONSTRUCT},
+                "quantization": Config.QDRANT_QUANTIZATION,
+                "vectors_on_disk": Config.QDRANT_VECTORS_ON_DISK,
+            }
         except Exception as e:
             self.logger.error(f"Failed to optimize collection: {str(e)}")
             raise
 
+    @staticmethod
+    def _hnsw_config() -> HnswConfigDiff:
+        """
+        HNSW graph settings from Config: m links per node and ef_construct build-time beam width.
+        """
+        return HnswConfigDiff(m=Config.QDRANT_HNSW_M, ef_construct=Config.QDRANT_HNSW_EF_CONSTRUCT)
+
+    @staticmethod
+    def _quantization_config():
+        """
+        Quantization settings from Config (None when QDRANT_QUANTIZATION is "none").
+        """
+        mode = Config.QDRANT_QUANTIZATION.lower()
+        if mode == "none":
+            return None
+        if mode == "scalar":
+            return ScalarQuantization(scalar=ScalarQuantizationConfig(
+                type=ScalarType.INT8, always_ram=Config.QDRANT_QUANTIZATION_ALWAYS_RAM,
+            ))
+        if mode == "binary":
+            return BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=Config.QDRANT_QUANTIZATION_ALWAYS_RAM))
+        raise ValueError(f"Unknown QDRANT_QUANTIZATION '{Config.QDRANT_QUANTIZATION}', expected none, scalar or binary")
+
+    @staticmethod
+    def _search_params() -> Optional[SearchParams]:
+        """
+        Search-time parameters: HNSW ef and, with quantization, rescoring of oversampled
+        candidates against the full-precision vectors.
+        """
+        quantization = None
+        if Config.QDRANT_QUANTIZATION.lower() != "none":
+            quantization = QuantizationSearchParams(
+                rescore=Config.QDRANT_QUANTIZATION_RESCORE,
+                oversampling=Config.QDRANT_QUANTIZATION_OVERSAMPLING,
+            )
+        if not Config.QDRANT_SEARCH_EF and quantization is None:
+            return None
+        return SearchParams(hnsw_ef=Config.QDRANT_SEARCH_EF or None, quantization=quantization)
+
     def health_check(self) -> Dict[str, Any]:
         """
         Check the health of the Qdrant instance and collection.
@@ -0,0 +1,342 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+from backend.config import Config
+from ..utils.logging_utils import setup_logging
+import logging
+
+# Set up logging for this module
+setup_logging()
+logger = logging.getLogger(__name__)
+
+# Rough token estimate for English text; only used to pace requests against the TPM limit
+CHARS_PER_TOKEN = 4
+
+class RateLimitExceeded(Exception):
+    """
+    Raised when a call could not be admitted within the maximum queueing time.
+    """
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at rate_per_minute, holding at most one minute's worth.
+    Reservations may drive the balance negative; the caller then waits until the debt
+    is repaid, so queued callers are admitted in order rather than all retrying at once.
+    """
+    def __init__(self, rate_per_minute: float):
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = float(rate_per_minute)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate_per_second)
+        self.updated_at = now
+
+    def reserve(self, amount: float) -> float:
+        """
+        Take amount tokens and return how many seconds the caller must wait before using them.
+        """
+        with self._lock:
+            self._refill()
+            self.tokens -= amount
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate_per_second
+
+    def refund(self, amount: float):
+        """
+        Return tokens (or take more, if amount is negative) after the real cost is known.
+        """
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class _Waiter:
+    """
+    A caller queued for a concurrency slot: a threading.Event for sync callers, or a future
+    on the caller's event loop for async ones. granted is set (under the limiter lock)
+    when a slot has been handed to it.
+    """
+    __slots__ = ("granted", "event", "future", "loop")
+
+    def __init__(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.granted = False
+        self.loop = loop
+        self.event = threading.Event() if loop is None else None
+        self.future = loop.create_future() if loop is not None else None
+
+    def wake(self):
+        if self.event is not None:
+            self.event.set()
+        else:
+            # Slots may be released from another thread (sync calls share the limiter)
+            self.loop.call_soon_threadsafe(self._resolve)
+
+    def _resolve(self):
+        if not self.future.done():
+            self.future.set_result(None)
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD concurrency limit: grows by roughly one slot per round trip while calls succeed
+    within the latency target, and shrinks multiplicatively on 429s (halved) or slow calls.
+    Callers that find no free slot wait in one FIFO queue (threads and coroutines alike);
+    a freed slot is handed to the longest waiting caller, so late arrivals cannot barge in.
+    """
+    def __init__(self, initial_limit: float, min_limit: float, max_limit: float, latency_target: float):
+        self.limit = float(initial_limit)
+        self.min_limit = float(min_limit)
+        self.max_limit = float(max_limit)
+        self.latency_target = latency_target
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._waiters: "deque[_Waiter]" = deque()
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> bool:
+        """
+        Take a slot if one is free under the current limit and nobody is queued for it.
+        """
+        with self._lock:
+            if not self._waiters and self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return True
+            return False
+
+    def acquire(self, timeout: float) -> bool:
+        """
+        Wait in line for a slot for up to timeout seconds. Returns whether one was taken.
+        """
+        waiter = self._enqueue(None)
+        if waiter is None or waiter.event.wait(max(timeout, 0.0)):
+            return True
+        return self._abandon(waiter)
+
+    async def aacquire(self, timeout: float) -> bool:
+        """
+        Async variant of acquire. A cancelled caller leaves the queue (or hands back a slot
+        granted to it meanwhile) before the cancellation propagates.
+        """
+        waiter = self._enqueue(asyncio.get_running_loop())
+        if waiter is None:
+            return True
+        try:
+            await asyncio.wait_for(waiter.future, max(timeout, 0.0))
+            return True
+        except asyncio.TimeoutError:
+            return self._abandon(waiter)
+        except BaseException:
+            if self._abandon(waiter):
+                self.release_unused()
+            raise
+
+    def release(self, latency: float, throttled: bool = False):
+        """
+        Free a slot and adjust the limit from the call's outcome.
+        """
+        with self._lock:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if throttled or latency > self.latency_target:
+                # Many in-flight calls fail together; shrink at most once per latency window
+                if now - self._last_decrease >= min(self.latency_target, 1.0):
+                    factor = 0.5 if throttled else 0.9
+                    self.limit = max(self.min_limit, self.limit * factor)
+                    self._last_decrease = now
+            else:
+                self.limit = min(self.max_limit, self.limit + 1.0 / max(self.limit, 1.0))
+            self._grant_waiters()
+
+    def release_unused(self):
+        """
+        Give back a slot that was never used for a call, without adjusting the limit.
+        """
+        with self._lock:
+            self.in_flight -= 1
+            self._grant_waiters()
+
+    def _enqueue(self, loop: Optional[asyncio.AbstractEventLoop]) -> Optional[_Waiter]:
+        """
+        Take a free slot (returns None) or join the end of the queue (returns the waiter).
+        """
+        with self._lock:
+            if not self._waiters and self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return None
+            waiter = _Waiter(loop)
+            self._waiters.append(waiter)
+            return waiter
+
+    def _abandon(self, waiter: _Waiter) -> bool:
+        """
+        Leave the queue after a timeout or cancellation. Returns True if a slot was granted
+        in the meantime, in which case the caller owns it.
+        """
+        with self._lock:
+            if waiter.granted:
+                return True
+            self._waiters.remove(waiter)
+            return False
+
+    def _grant_waiters(self):
+        """
+        Hand free slots to queued callers in arrival order. Caller must hold the lock.
+        """
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            self.in_flight += 1
+            waiter.granted = True
+            waiter.wake()
+
+
+class DeploymentRateLimiter:
+    """
+    Admission control for one model deployment: RPM and TPM token buckets plus an
+    adaptive concurrency limit. Calls wait in line instead of failing, up to max_queue_seconds.
+    """
+    def __init__(self, deployment: str, rpm: int, tpm: int):
+        self.deployment = deployment
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.concurrency = AdaptiveConcurrencyLimiter(
+            initial_limit=Config.LLM_INITIAL_CONCURRENCY,
+            min_limit=Config.LLM_MIN_CONCURRENCY,
+            max_limit=Config.LLM_MAX_CONCURRENCY,
+            latency_target=Config.LLM_LATENCY_TARGET_SECONDS,
+        )
+        self.max_queue_seconds = Config.LLM_MAX_QUEUE_SECONDS
+        self.stats_counters = {"admitted": 0, "rejected": 0, "throttled": 0, "queued_seconds": 0.0}
+
+    @staticmethod
+    def estimate_tokens(messages: List[Dict[str, Any]], max_tokens: Optional[int] = None) -> int:
+        """
+        Estimate prompt plus completion tokens for a chat request.
+        """
+        prompt_chars = sum(len(str(message.get("content") or "")) for message in messages)
+        return prompt_chars // CHARS_PER_TOKEN + (max_tokens or Config.LLM_DEFAULT_COMPLETION_TOKENS)
+
+    def _reserve(self, estimated_tokens: int) -> float:
+        """
+        Reserve RPM and TPM capacity and return the wait; fail fast if it exceeds the queue limit.
+        """
+        wait = max(self.requests.reserve(1), self.tokens.reserve(estimated_tokens))
+        if wait > self.max_queue_seconds:
+            self._refund(estimated_tokens)
+            self.stats_counters["rejected"] += 1
+            raise RateLimitExceeded(
+                f"Rate limit for {self.deployment} would require waiting {wait:.1f}s "
+                f"(max {self.max_queue_seconds:.1f}s)"
+            )
+        return wait
+
+    def acquire(self, estimated_tokens: int) -> float:
+        """
+        Block until the call may proceed. Returns the admission time for release().
+        The RPM/TPM reservation is refunded if the call is rejected or interrupted while queued.
+        """
+        start = time.monotonic()
+        wait = self._reserve(estimated_tokens)
+        try:
+            time.sleep(wait)
+            if not self.concurrency.acquire(self._remaining(start)):
+                self._reject_no_slot()
+        except BaseException:
+            self._refund(estimated_tokens)
+            raise
+        return self._admitted(start)
+
+    async def aacquire(self, estimated_tokens: int) -> float:
+        """
+        Async variant of acquire; waits without blocking the event loop.
+        A cancelled caller's reservation and queue position are given back.
+        """
+        start = time.monotonic()
+        wait = self._reserve(estimated_tokens)
+        try:
+            await asyncio.sleep(wait)
+            if not await self.concurrency.aacquire(self._remaining(start)):
+                self._reject_no_slot()
+        except BaseException:
+            self._refund(estimated_tokens)
+            raise
+        return self._admitted(start)
+
+    def release(self, admitted_at: float, estimated_tokens: int, actual_tokens: Optional[int] = None,
+                throttled: bool = False, latency: Optional[float] = None):
+        """
+        Free the concurrency slot, feed latency/429 signals to AIMD, and correct the TPM bucket
+        with the real token usage when the response reports it. latency defaults to the time
+        since admission; streams pass their time to first token instead.
+        """
+        if latency is None:
+            latency = time.monotonic() - admitted_at
+        self.concurrency.release(latency, throttled=throttled)
+        if throttled:
+            self.stats_counters["throttled"] += 1
+        if actual_tokens is not None:
+            self.tokens.refund(estimated_tokens - actual_tokens)
+
+    def release_cancelled(self):
+        """
+        Free the concurrency slot of a call that was cancelled or interrupted before it finished.
+        Its latency says nothing about the deployment, so the limit is left alone; the TPM
+        reservation is kept since the request may already have reached the server.
+        """
+        self.concurrency.release_unused()
+
+    def _remaining(self, start: float) -> float:
+        return self.max_queue_seconds - (time.monotonic() - start)
+
+    def _refund(self, estimated_tokens: int):
+        self.requests.refund(1)
+        self.tokens.refund(estimated_tokens)
+
+    def _reject_no_slot(self):
+        self.stats_counters["rejected"] += 1
+        raise RateLimitExceeded(
+            f"No free slot for {self.deployment} within {self.max_queue_seconds:.1f}s"
+        )
+
+    def _admitted(self, start: float) -> float:
+        now = time.monotonic()
+        self.stats_counters["admitted"] += 1
+        self.stats_counters["queued_seconds"] += now - start
+        return now
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return admission counters and the current adaptive limit.
+        """
+        return {
+            **self.stats_counters,
+            "concurrency_limit": round(self.concurrency.limit, 2),
+            "in_flight": self.concurrency.in_flight,
+        }
+
+
+_limiters: Dict[str, DeploymentRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+def get_rate_limiter(deployment: str) -> DeploymentRateLimiter:
+    """
+    Return the process-wide limiter for a deployment, using its limits from Config.LLM_RATE_LIMITS.
+    """
+    limiter = _limiters.get(deployment)
+    if limiter is None:
+        with _limiters_lock:
+            limiter = _limiters.get(deployment)
+            if limiter is None:
+                limits = Config.LLM_RATE_LIMITS.get(deployment, {})
+                limiter = DeploymentRateLimiter(
+                    deployment,
+                    rpm=limits.get("rpm", Config.LLM_DEFAULT_RPM),
+                    tpm=limits.get("tpm", Config.LLM_DEFAULT_TPM),
+                )
+                _limiters[deployment] = limiter
+    return limiter
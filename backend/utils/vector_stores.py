@@ -0,0 +1,117 @@
+import asyncio
+import weakref
+from typing import Any, Dict, List, Optional, Tuple
+from backend.config import Config
+from ..utils.logging_utils import setup_logging
+import logging
+
+# Set up logging for this module
+setup_logging()
+logger = logging.getLogger(__name__)
+
+VECTOR_STORES = ("qdrant", "numpy")
+
+def create_vector_store(name: Optional[str] = None):
+    """
+    Build the vector store named by name (default Config.VECTOR_STORE).
+    "qdrant" is the Qdrant server; "numpy" is the in-process NumpyVectorStore for small corpora.
+    Both expose the same search/upsert_documents/scroll_documents interface.
+    """
+    name = name or Config.VECTOR_STORE
+    if name == "qdrant":
+        from ..utils.qdrant_store import QdrantOpenAIStore
+        return QdrantOpenAIStore()
+    if name == "numpy":
+        from ..utils.numpy_store import NumpyVectorStore
+        return NumpyVectorStore()
+    raise ValueError(f"Unknown vector store '{name}', expected one of {list(VECTOR_STORES)}")
+
+def matches_filters(payload: Dict[str, Any], filters: Optional[Dict[str, Any]]) -> bool:
+    """
+    True if payload satisfies every filter. Filters map a payload field to a value
+    or a list of accepted values (the same semantics as the Qdrant filters built by QdrantOpenAIStore).
+    """
+    for field, accepted in (filters or {}).items():
+        values = accepted if isinstance(accepted, (list, tuple, set)) else [accepted]
+        if payload.get(field) not in values:
+            return False
+    return True
+
+
+class SearchCoalescer:
+    """
+    Merges concurrent async searches into one asearch_batch call on the store.
+    Queries submitted within window_ms of the first pending one (up to max_batch queries)
+    share a single vector-store round trip, so many analyses running at once (e.g. a batch
+    job) need one request per batch instead of one per analysis. A window of 0 disables
+    coalescing (used for in-process stores, where there is no round trip to save).
+    """
+    def __init__(self, store, window_ms: float = Config.VECTOR_SEARCH_COALESCE_MS,
+                 max_batch: int = Config.VECTOR_SEARCH_MAX_BATCH):
+        self.store = store
+        self.window = max(window_ms, 0.0) / 1000
+        self.max_batch = max(max_batch, 1)
+        # Pending requests per event loop: (embeddings, filters, limit, with_vectors, future)
+        self._pending: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, List[Tuple]]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._tasks: set = set()
+
+    async def search(self, query_embeddings, limit: int, with_vectors: bool = False,
+                     filters: Optional[Dict[str, Any]] = None) -> List[List[Dict[str, Any]]]:
+        """
+        Search with the given embeddings (all sharing filters); resolves when the batch they joined returns.
+        """
+        if len(query_embeddings) == 0:
+            return []
+        if self.window == 0:
+            return await self.store.asearch_batch(query_embeddings, limit=limit, with_vectors=with_vectors,
+                                                  filters=filters)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        batch = self._pending.get(loop)
+        if batch is None:
+            batch = self._pending[loop] = []
+            loop.call_later(self.window, self._flush, loop, batch)
+        batch.append((list(query_embeddings), filters, limit, with_vectors, future))
+        if sum(len(request[0]) for request in batch) >= self.max_batch:
+            self._flush(loop, batch)
+        return await future
+
+    def _flush(self, loop: asyncio.AbstractEventLoop, batch: List[Tuple]):
+        """
+        Send a pending batch (unless it was already sent because it filled up).
+        """
+        if self._pending.get(loop) is not batch:
+            return
+        del self._pending[loop]
+        # Requests can only share a call if they agree on limit and with_vectors
+        groups: Dict[Tuple[int, bool], List[Tuple]] = {}
+        for request in batch:
+            groups.setdefault((request[2], request[3]), []).append(request)
+        for (limit, with_vectors), requests in groups.items():
+            task = loop.create_task(self._dispatch(requests, limit, with_vectors))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, requests: List[Tuple], limit: int, with_vectors: bool):
+        """
+        Run one asearch_batch for all requests and hand each caller its slice of the results.
+        """
+        embeddings = [embedding for request in requests for embedding in request[0]]
+        filters = [request[1] for request in requests for _ in request[0]]
+        try:
+            results = await self.store.asearch_batch(embeddings, limit=limit, with_vectors=with_vectors,
+                                                     filters=filters)
+        except Exception as e:
+            for request in requests:
+                if not request[4].done():
+                    request[4].set_exception(e)
+            return
+        logger.debug(f"Coalesced {len(requests)} searches into one batch of {len(embeddings)} queries")
+        offset = 0
+        for request in requests:
+            count = len(request[0])
+            if not request[4].done():
+                request[4].set_result(results[offset:offset + count])
+            offset += count
@@ -0,0 +1,153 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import re
+import time
+from typing import Dict, List
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+LABELS = ["Neutral", "Offensive", "Toxic", "Hate", "Ambiguous"]
+# Share of each label in generated classifications; most real traffic is benign
+LABEL_WEIGHTS = [0.7, 0.12, 0.08, 0.05, 0.05]
+FILLER = ("the content policy prohibits attacks on people based on protected characteristics "
+          "and this text should be reviewed in light of context severity and intent").split()
+
+def _seed(text: str) -> int:
+    return int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+
+def _label_for(text: str) -> Dict:
+    """
+    Deterministic label and confidence for a text, so repeated runs see the same answers.
+    """
+    rng = np.random.default_rng(_seed(text))
+    label = LABELS[int(rng.choice(len(LABELS), p=LABEL_WEIGHTS))]
+    return {"label": label, "confidence": round(float(rng.uniform(0.6, 0.99)), 2),
+            "explanation": f"Synthetic {label.lower()} classification."}
+
+
+class MockLLM:
+    """
+    Latency and token model for the stand-in server.
+    Latency is lognormal around latency_ms; completion length is normal around completion_tokens.
+    """
+    def __init__(self, latency_ms: float = 300.0, latency_sigma: float = 0.3,
+                 completion_tokens: int = 120, embedding_latency_ms: float = 30.0,
+                 dimension: int = 1536, seed: int = 0):
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.completion_tokens = completion_tokens
+        self.embedding_latency_ms = embedding_latency_ms
+        self.dimension = dimension
+        self.rng = np.random.default_rng(seed)
+        self.requests = 0
+
+    def latency(self, median_ms: float) -> float:
+        return float(median_ms * self.rng.lognormal(0.0, self.latency_sigma)) / 1000
+
+    def completion_length(self) -> int:
+        return max(1, int(self.rng.normal(self.completion_tokens, self.completion_tokens * 0.25)))
+
+    def chat_content(self, prompt: str) -> str:
+        """
+        Produce a plausible answer for each prompt the agents send.
+        """
+        batch = re.search(r"Texts to analyze \(JSON array\): (\[.*\])\s*\n", prompt)
+        if batch:
+            items = json.loads(batch.group(1))
+            return json.dumps([{"id": item["id"], **_label_for(item["text"])} for item in items])
+        text_match = re.search(r'Text(?: to analyze)?: "(.*?)"\s*\n', prompt, re.S)
+        text = text_match.group(1) if text_match else prompt
+        if '"keywords"' in prompt:
+            return json.dumps({**_label_for(text), "keywords": FILLER[:6]})
+        if "Respond in JSON format" in prompt:
+            return json.dumps(_label_for(text))
+        if "generate keywords and phrases" in prompt:
+            return " ".join(FILLER[:10])
+        return " ".join(FILLER[i % len(FILLER)] for i in range(self.completion_length()))
+
+    def embedding(self, text: str) -> List[float]:
+        vector = np.random.default_rng(_seed(text)).standard_normal(self.dimension).astype(np.float32)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+
+def create_app(model: MockLLM) -> FastAPI:
+    """
+    OpenAI-compatible app serving the Azure deployment routes used by the gateway and embeddings.
+    """
+    app = FastAPI(title="Mock Azure OpenAI")
+    app.state.model = model
+
+    @app.post("/openai/deployments/{deployment}/chat/completions")
+    async def chat_completions(deployment: str, request: Request):
+        body = await request.json()
+        model.requests += 1
+        prompt = "\n".join(str(message.get("content", "")) for message in body.get("messages", []))
+        content = model.chat_content(prompt)
+        prompt_tokens = len(prompt) // 4
+        completion_tokens = max(1, len(content) // 4)
+        created = int(time.time())
+
+        if body.get("stream"):
+            words = content.split(" ")
+            delay = model.latency(model.latency_ms) / max(len(words), 1)
+
+            async def events():
+                for i, word in enumerate(words):
+                    await asyncio.sleep(delay)
+                    chunk = {
+                        "id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": created,
+                        "model": deployment,
+                        "choices": [{"index": 0, "delta": {"content": word if i == 0 else " " + word},
+                                     "finish_reason": None}],
+                    }
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                yield "data: [DONE]\n\n"
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        await asyncio.sleep(model.latency(model.latency_ms))
+        return JSONResponse({
+            "id": "chatcmpl-mock", "object": "chat.completion", "created": created, "model": deployment,
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        })
+
+    @app.post("/openai/deployments/{deployment}/embeddings")
+    async def embeddings(deployment: str, request: Request):
+        body = await request.json()
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        await asyncio.sleep(model.latency(model.embedding_latency_ms))
+        return JSONResponse({
+            "object": "list", "model": deployment,
+            "data": [{"object": "embedding", "index": i, "embedding": model.embedding(str(text))}
+                     for i, text in enumerate(inputs)],
+            "usage": {"prompt_tokens": 0, "total_tokens": 0},
+        })
+
+    return app
+
+
+def main(argv=None):
+    """
+    Command-line entry point: python -m benchmarks.mock_llm_server [--port PORT] [--latency-ms MS]
+    """
+    parser = argparse.ArgumentParser(description="Run a stand-in Azure OpenAI server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=300.0)
+    parser.add_argument("--latency-sigma", type=float, default=0.3)
+    parser.add_argument("--completion-tokens", type=int, default=120)
+    parser.add_argument("--embedding-latency-ms", type=float, default=30.0)
+    parser.add_argument("--dimension", type=int, default=1536)
+    args = parser.parse_args(argv)
+    model = MockLLM(args.latency_ms, args.latency_sigma, args.completion_tokens,
+                    args.embedding_latency_ms, args.dimension)
+    uvicorn.run(create_app(model), host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, "baseline.json")
+
+# Sentences combined into synthetic moderation traffic
+NEUTRAL_SENTENCES = [
+    "Thanks for sharing the recipe, I will try it this weekend",
+    "The match last night was incredible",
+    "Does anyone know when the library opens on Sunday",
+    "Great photo, the colours are beautiful",
+    "I disagree with the new parking rules but let's discuss it at the meeting",
+]
+SUSPICIOUS_SENTENCES = [
+    "people like you are worthless and should shut up",
+    "those people are vermin and should go back",
+    "I will kill you if you post that again",
+]
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _start_server(app, port: int):
+    """
+    Run a uvicorn server for app on a background thread and wait until it accepts requests.
+    """
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+def _configure_environment(mock_port: int, args, workdir: str):
+    """
+    Point the backend at the mock LLM and an in-process vector store.
+    Must run before any backend module is imported, since Config reads the environment at import.
+    """
+    os.environ["your-api-key"] = "benchmark"
+    os.environ["your-api-endpoint"] = f"http://127.0.0.1:{mock_port}"
+    os.environ["your-api-version"] = "2024-02-01"
+    os.environ["VECTOR_STORE"] = args.vector_store
+    os.environ["QDRANT_LOCATION"] = ":memory:"
+    os.environ["NUMPY_STORE_PATH"] = os.path.join(workdir, "numpy_index")
+    os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(workdir, "embedding_cache")
+    os.environ["ANALYSIS_JOB_STORE_PATH"] = os.path.join(workdir, "jobs.sqlite")
+    os.environ["CLASSIFICATION_CACHE_ENABLED"] = "true" if args.cache else "false"
+    os.environ["EMBEDDING_CACHE_ENABLED"] = "true" if args.cache else "false"
+    os.environ["PIPELINE_MODE"] = args.pipeline_mode
+    os.environ["LLM_HTTP2"] = "false"
+    if not args.respect_rate_limits:
+        # The benchmark measures the pipeline, not the production RPM/TPM quota
+        os.environ["LLM_RPM_LIMIT"] = "10000000"
+        os.environ["LLM_TPM_LIMIT"] = "10000000000"
+
+def make_texts(count: int, unique_ratio: float, seed: int) -> List[str]:
+    """
+    Build count synthetic texts; about unique_ratio of them are distinct.
+    """
+    rng = random.Random(seed)
+    pool_size = max(1, int(count * unique_ratio))
+    pool = []
+    for i in range(pool_size):
+        sentences = rng.sample(NEUTRAL_SENTENCES, 2)
+        if rng.random() < 0.3:
+            sentences.append(rng.choice(SUSPICIOUS_SENTENCES))
+        pool.append(f"{'. '.join(sentences)} (#{i})")
+    return [pool[i % pool_size] for i in range(count)]
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q / 100 * (len(ordered) - 1)))))
+    return round(ordered[index], 2)
+
+def summarize(latencies: List[float]) -> Dict[str, float]:
+    return {
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "mean_ms": round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+    }
+
+async def run_load(base_url: str, path: str, payloads: List[Dict], rps: float, timeout: float) -> Dict:
+    """
+    Open-loop load: request i is sent at start + i / rps whether or not earlier ones finished,
+    so a slow server builds a queue instead of silently lowering the offered load.
+    """
+    import httpx
+
+    latencies: List[float] = []
+    stage_latencies: Dict[str, List[float]] = {}
+    errors = 0
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        async def send(index: int, payload: Dict):
+            nonlocal errors
+            await asyncio.sleep(max(0.0, start + index / rps - time.perf_counter()))
+            sent = time.perf_counter()
+            try:
+                response = await client.post(path, json=payload)
+                response.raise_for_status()
+            except Exception:
+                errors += 1
+                return
+            latencies.append((time.perf_counter() - sent) * 1000)
+            for stage, ms in (response.json().get("timings") or {}).items():
+                stage_latencies.setdefault(stage, []).append(ms)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(send(i, payload) for i, payload in enumerate(payloads)))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "requests": len(payloads),
+        "errors": errors,
+        "offered_rps": rps,
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "latency": summarize(latencies),
+        "stages": {stage: summarize(values) for stage, values in sorted(stage_latencies.items())},
+    }
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """
+    Return a line per latency metric that got slower than baseline by more than tolerance,
+    and per scenario whose throughput dropped by more than tolerance.
+    """
+    regressions = []
+    for scenario, result in results.items():
+        base = baseline.get(scenario)
+        if not base:
+            continue
+        sections = [("latency", result["latency"], base["latency"])]
+        sections += [(f"stage {stage}", values, base.get("stages", {}).get(stage))
+                     for stage, values in result.get("stages", {}).items()]
+        for name, current, previous in sections:
+            if not previous:
+                continue
+            for metric in ("p50_ms", "p95_ms", "p99_ms"):
+                if previous[metric] and current[metric] > previous[metric] * (1 + tolerance):
+                    regressions.append(
+                        f"{scenario} {name} {metric}: {previous[metric]} -> {current[metric]}"
+                    )
+        if base["throughput_rps"] and result["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append(
+                f"{scenario} throughput_rps: {base['throughput_rps']} -> {result['throughput_rps']}"
+            )
+    return regressions
+
+def print_report(results: Dict):
+    for scenario, result in results.items():
+        latency = result["latency"]
+        print(f"\n== {scenario}: {result['requests']} requests at {result['offered_rps']} rps ==")
+        print(f"throughput {result['throughput_rps']} rps, errors {result['errors']}")
+        print(f"latency p50 {latency['p50_ms']} ms  p95 {latency['p95_ms']} ms  p99 {latency['p99_ms']} ms")
+        for stage, values in result.get("stages", {}).items():
+            print(f"  {stage:<22} p50 {values['p50_ms']:>9} ms  p95 {values['p95_ms']:>9} ms")
+
+def main(argv: Optional[List[str]] = None):
+    """
+    Command-line entry point: python -m benchmarks.run_benchmark [--rps N] [--duration S] [--save-baseline]
+    """
+    parser = argparse.ArgumentParser(description="Offline load test of the analysis API")
+    parser.add_argument("--rps", type=float, default=10.0, help="Requests per second for /analyze")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds of load per scenario")
+    parser.add_argument("--batch-size", type=int, default=20, help="Items per /analyze/batch request")
+    parser.add_argument("--batch-rps", type=float, default=1.0, help="Requests per second for /analyze/batch")
+    parser.add_argument("--scenarios", default="analyze,batch", help="Comma-separated: analyze, batch")
+    parser.add_argument("--unique-ratio", type=float, default=1.0, help="Share of distinct texts")
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0)
+    parser.add_argument("--llm-latency-sigma", type=float, default=0.3)
+    parser.add_argument("--completion-tokens", type=int, default=120)
+    parser.add_argument("--embedding-latency-ms", type=float, default=30.0)
+    parser.add_argument("--vector-store", default="numpy", choices=["numpy", "qdrant"])
+    parser.add_argument("--pipeline-mode", default="standard", choices=["standard", "fused"])
+    parser.add_argument("--cache", action="store_true", help="Enable classification and embedding caches")
+    parser.add_argument("--respect-rate-limits", action="store_true", help="Keep the configured RPM/TPM limits")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed slowdown before failing")
+    args = parser.parse_args(argv)
+
+    from .mock_llm_server import MockLLM, create_app
+
+    workdir = tempfile.mkdtemp(prefix="hsd-bench-")
+    mock_port = _free_port()
+    _configure_environment(mock_port, args, workdir)
+    mock = MockLLM(args.llm_latency_ms, args.llm_latency_sigma, args.completion_tokens,
+                   args.embedding_latency_ms, int(os.getenv("EMBEDDING_DIMENSION", "1536")), args.seed)
+    _start_server(create_app(mock), mock_port)
+
+    # Imported only now so the backend picks up the benchmark environment
+    from backend.main import app
+    from backend.utils.policy_ingestion import PolicyIngestor
+    from backend.api.dependencies import get_retriever_agent, warm_up
+
+    warm_up()
+    retriever = get_retriever_agent()
+    stats = PolicyIngestor(store=retriever.Qdrant_store, embedding_generator=retriever.embedding_generator).ingest()
+    print(f"Indexed policies: {stats}")
+    api_port = _free_port()
+    _start_server(app, api_port)
+    base_url = f"http://127.0.0.1:{api_port}"
+
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    results: Dict[str, Dict] = {}
+    if "analyze" in scenarios:
+        count = max(1, int(args.rps * args.duration))
+        texts = make_texts(count, args.unique_ratio, args.seed)
+        payloads = [{"text": text, "include_timings": True} for text in texts]
+        results["analyze"] = asyncio.run(run_load(base_url, "/analyze", payloads, args.rps, args.timeout))
+    if "batch" in scenarios:
+        count = max(1, int(args.batch_rps * args.duration))
+        texts = make_texts(count * args.batch_size, args.unique_ratio, args.seed + 1)
+        payloads = [
+            {"items": [{"text": text} for text in texts[i * args.batch_size:(i + 1) * args.batch_size]]}
+            for i in range(count)
+        ]
+        results["batch"] = asyncio.run(run_load(base_url, "/analyze/batch", payloads, args.batch_rps, args.timeout))
+        results["batch"]["items_per_second"] = round(results["batch"]["throughput_rps"] * args.batch_size, 2)
+
+    print_report(results)
+    print(f"\nMock LLM served {mock.requests} chat completions")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\nRegressions beyond {args.tolerance:.0%} of {args.baseline}:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"\nNo regressions beyond {args.tolerance:.0%} of {args.baseline}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
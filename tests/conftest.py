@@ -2,6 +2,13 @@ import sys
 import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+# Run offline by default: placeholder Azure settings (every LLM call is mocked) and
+# an in-process Qdrant. Set these variables to test against real services.
+os.environ.setdefault("your-api-key", "test-key")
+os.environ.setdefault("your-api-endpoint", "http://localhost:9")
+os.environ.setdefault("your-api-version", "2024-02-01")
+os.environ.setdefault("QDRANT_LOCATION", ":memory:")
+
 
 import pytest
 from backend.agents.action_agent import ActionRecommenderAgent
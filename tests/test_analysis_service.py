@@ -0,0 +1,193 @@
+import pytest
+import asyncio
+from unittest.mock import patch, AsyncMock
+from backend.api import analysis_service
+from backend.utils.job_store import AnalysisJobStore
+
+
+def test_analyze_batch_service_coalesces_duplicates():
+    """
+    Test that analyze_batch_service analyzes identical texts once and
+    returns results in input order with per-item errors.
+    """
+    async def fake_classify(texts, mode="standard", max_concurrency=None):
+        return [{"success": True, "label": "Neutral", "confidence": 0.9, "explanation": ""} for _ in texts]
+
+    async def fake_analyze(text, include_policies=True, include_reasoning=True, classification_result=None):
+        if text == "bad":
+            raise Exception("Classification failed")
+        return {"classification": {"label": "Neutral"}, "timestamp": "now", "text": text}
+
+    items = [{"text": "a"}, {"text": "b"}, {"text": "a"}, {"text": "bad"}]
+    with patch.object(analysis_service.hate_speech_agent, "aclassify_batch", new=AsyncMock(side_effect=fake_classify)) as mock_classify, \
+         patch.object(analysis_service.Config, "PIPELINE_MODE", "standard"), \
+         patch.object(analysis_service, "analyze_text_service_async", new=AsyncMock(side_effect=fake_analyze)) as mock_analyze:
+        result = asyncio.run(analysis_service.analyze_batch_service(items, max_concurrency=2))
+        assert mock_analyze.await_count == 3
+        mock_classify.assert_awaited_once_with(["a", "b", "bad"], mode="standard", max_concurrency=1)
+        assert result["total"] == 4 and result["unique"] == 3
+        assert [r["index"] for r in result["results"]] == [0, 1, 2, 3]
+        assert result["results"][2]["result"]["text"] == "a"
+        assert result["results"][3]["success"] is False
+        assert result["failed"] == 1
+
+def test_fused_mode_skips_expansion_and_reasoning_calls():
+    """
+    Test that fused mode passes the classification keywords to retrieval and only
+    calls the reasoning agent when policies are requested.
+    """
+    classification = {"success": True, "label": "Hate", "confidence": 0.95,
+                      "explanation": "Targets a group.", "keywords": ["hate speech", "protected group"]}
+    retrieval = {"success": True, "documents": [{"text": "policy"}], "total_found": 1}
+    reasoning = {"success": True, "reasoning": "Detailed reasoning.", "policies_referenced": 1}
+    with patch.object(analysis_service.Config, "PIPELINE_MODE", "fused"), \
+         patch.object(analysis_service.hate_speech_agent, "aclassify_and_expand", new=AsyncMock(return_value=classification)), \
+         patch.object(analysis_service.retriever_agent, "aretrieve_policies", new=AsyncMock(return_value=retrieval)) as mock_retrieve, \
+         patch.object(analysis_service.reasoning_agent, "agenerate_reasoning", new=AsyncMock(return_value=reasoning)) as mock_reasoning:
+        result = asyncio.run(analysis_service.analyze_text_service_async("text"))
+        mock_retrieve.assert_awaited_once_with("text", "Hate", expanded_query="hate speech protected group")
+        assert result["reasoning"] == "Detailed reasoning."
+
+        result = asyncio.run(analysis_service.analyze_text_service_async("text", include_policies=False))
+        assert mock_reasoning.await_count == 1
+        assert result["reasoning"] == "Targets a group."
+
+def test_analyze_text_stream_emits_events_in_stage_order():
+    """
+    Test that the stream sends classification and action before policies and reasoning tokens.
+    """
+    classification = {"success": True, "label": "Toxic", "confidence": 0.85, "explanation": "Abusive."}
+    retrieval = {"success": True, "documents": [{"text": "policy", "source": "meta"}], "total_found": 1}
+
+    async def fake_stream(text, classification_result, documents):
+        for token in ["This ", "is ", "toxic."]:
+            yield token
+
+    async def collect():
+        return [event async for event in analysis_service.analyze_text_stream("text")]
+
+    with patch.object(analysis_service.Config, "PIPELINE_MODE", "standard"), \
+         patch.object(analysis_service.hate_speech_agent, "aclassify_text", new=AsyncMock(return_value=classification)), \
+         patch.object(analysis_service.retriever_agent, "aretrieve_policies", new=AsyncMock(return_value=retrieval)), \
+         patch.object(analysis_service.reasoning_agent, "astream_reasoning", new=fake_stream):
+        events = asyncio.run(collect())
+
+    assert [event["event"] for event in events] == [
+        "classification", "recommended_action", "retrieved_policies",
+        "reasoning", "reasoning", "reasoning", "done"
+    ]
+    assert "".join(event["data"] for event in events if event["event"] == "reasoning") == "This is toxic."
+
+def test_analyze_text_early_returns_action_and_enriches_in_background(tmp_path):
+    """
+    Test that the early-return analysis responds before reasoning runs and that the
+    job holds the full result once background enrichment has finished.
+    """
+    classification = {"success": True, "label": "Hate", "confidence": 0.95, "explanation": "Targets a group."}
+    retrieval = {"success": True, "documents": [{"text": "policy"}], "total_found": 1}
+    reasoning = {"success": True, "reasoning": "Detailed reasoning.", "policies_referenced": 1}
+
+    async def run():
+        response = await analysis_service.analyze_text_early("text")
+        pending = analysis_service.get_analysis_job(response["job_id"])
+        await asyncio.gather(*analysis_service._background_tasks)
+        return response, pending, analysis_service.get_analysis_job(response["job_id"])
+
+    store = AnalysisJobStore(path=str(tmp_path / "jobs.sqlite"))
+    with patch.object(analysis_service, "get_job_store", return_value=store), \
+         patch.object(analysis_service, "aget_job_store", new=AsyncMock(return_value=store)), \
+         patch.object(analysis_service.Config, "PIPELINE_MODE", "standard"), \
+         patch.object(analysis_service.hate_speech_agent, "aclassify_text", new=AsyncMock(return_value=classification)), \
+         patch.object(analysis_service.retriever_agent, "aretrieve_policies", new=AsyncMock(return_value=retrieval)), \
+         patch.object(analysis_service.reasoning_agent, "agenerate_reasoning", new=AsyncMock(return_value=reasoning)):
+        response, pending, job = asyncio.run(run())
+
+    assert response["status"] == "pending"
+    assert response["recommended_action"]["severity"] == "Critical"
+    assert "reasoning" not in pending
+    assert job["status"] == "completed"
+    assert job["reasoning"] == "Detailed reasoning."
+    assert job["retrieved_policies"] == [{"text": "policy"}]
+
+def test_early_job_reports_failed_stages_and_shutdown_marks_running_jobs_failed(tmp_path):
+    """
+    Test that a job whose reasoning failed ends "partial" with the error, and that
+    enrichment still running at shutdown is cancelled and its job marked failed.
+    """
+    classification = {"success": True, "label": "Hate", "confidence": 0.95, "explanation": "Targets a group."}
+    retrieval = {"success": True, "documents": [{"text": "policy"}], "total_found": 1}
+    failed_reasoning = {"success": False, "message": "LLM unavailable"}
+    never_finishes = asyncio.Event()
+
+    async def slow_retrieval(*args, **kwargs):
+        await never_finishes.wait()
+
+    async def run():
+        partial = await analysis_service.analyze_text_early("text")
+        await asyncio.gather(*analysis_service._background_tasks)
+        with patch.object(analysis_service.retriever_agent, "aretrieve_policies", new=AsyncMock(side_effect=slow_retrieval)):
+            interrupted = await analysis_service.analyze_text_early("text")
+            await asyncio.sleep(0.05)
+            await analysis_service.shutdown_background_tasks()
+        return store.get(partial["job_id"]), store.get(interrupted["job_id"])
+
+    store = AnalysisJobStore(path=str(tmp_path / "jobs.sqlite"))
+    with patch.object(analysis_service, "get_job_store", return_value=store), \
+         patch.object(analysis_service, "aget_job_store", new=AsyncMock(return_value=store)), \
+         patch.object(analysis_service.Config, "PIPELINE_MODE", "standard"), \
+         patch.object(analysis_service.hate_speech_agent, "aclassify_text", new=AsyncMock(return_value=classification)), \
+         patch.object(analysis_service.retriever_agent, "aretrieve_policies", new=AsyncMock(return_value=retrieval)), \
+         patch.object(analysis_service.reasoning_agent, "agenerate_reasoning", new=AsyncMock(return_value=failed_reasoning)):
+        partial, interrupted = asyncio.run(run())
+
+    assert partial["status"] == "partial"
+    assert partial["error"] == "reasoning: LLM unavailable"
+    assert partial["result"]["retrieved_policies"] == [{"text": "policy"}]
+    assert interrupted["status"] == "failed"
+    assert interrupted["error"] == analysis_service.SHUTDOWN_ERROR
+    assert not analysis_service._background_tasks
+
+def test_callback_urls_to_internal_or_unlisted_hosts_are_rejected():
+    """
+    Test that analyze_text_early refuses callback URLs aimed at loopback, link-local
+    or private addresses, or at hosts outside the allowlist, before classifying.
+    """
+    async def run(url):
+        with pytest.raises(analysis_service.CallbackURLRejected):
+            await analysis_service.analyze_text_early("text", callback_url=url)
+
+    with patch.object(analysis_service.hate_speech_agent, "aclassify_text", new=AsyncMock()) as mock_classify, \
+         patch.object(analysis_service.Config, "PIPELINE_MODE", "standard"), \
+         patch.object(analysis_service.Config, "ANALYSIS_CALLBACK_ALLOW_PRIVATE", False):
+        for url in ("http://169.254.169.254/latest/meta-data", "http://localhost:8000/hook",
+                    "http://10.0.0.5/hook", "http://[::ffff:127.0.0.1]/hook", "ftp://93.184.216.34/hook"):
+            asyncio.run(run(url))
+        with patch.object(analysis_service.Config, "ANALYSIS_CALLBACK_ALLOWLIST", ["hooks.example.com"]):
+            asyncio.run(run("https://93.184.216.34/hook"))
+    assert mock_classify.await_count == 0
+
+    with patch.object(analysis_service.Config, "ANALYSIS_CALLBACK_ALLOWLIST", ["https://93.184.216.34/hooks/"]):
+        asyncio.run(analysis_service.validate_callback_url("https://93.184.216.34/hooks/done"))
+    with patch.object(analysis_service.Config, "ANALYSIS_CALLBACK_ALLOW_PRIVATE", True):
+        asyncio.run(analysis_service.validate_callback_url("http://10.0.0.5/hook"))
+
+def test_analyze_batch_service_classifies_individually_when_a_chunk_fails():
+    """
+    Test that a chunk whose batched classification raises falls back to one
+    aclassify_text call per text instead of failing every item in it.
+    """
+    async def fake_classify_text(text):
+        return {"success": True, "label": "Neutral", "confidence": 0.9, "explanation": text}
+
+    async def fake_analyze(text, include_policies=True, include_reasoning=True, classification_result=None):
+        return {"classification": classification_result, "timestamp": "now"}
+
+    items = [{"text": "a"}, {"text": "b"}]
+    with patch.object(analysis_service.hate_speech_agent, "aclassify_batch", new=AsyncMock(side_effect=TimeoutError("batch timed out"))), \
+         patch.object(analysis_service.Config, "PIPELINE_MODE", "standard"), \
+         patch.object(analysis_service.hate_speech_agent, "aclassify_text", new=AsyncMock(side_effect=fake_classify_text)) as mock_single, \
+         patch.object(analysis_service, "analyze_text_service_async", new=AsyncMock(side_effect=fake_analyze)):
+        result = asyncio.run(analysis_service.analyze_batch_service(items))
+    assert mock_single.await_count == 2
+    assert result["failed"] == 0
+    assert [r["result"]["classification"]["explanation"] for r in result["results"]] == ["a", "b"]
@@ -0,0 +1,33 @@
+import pytest
+from unittest.mock import MagicMock
+from benchmarks.mock_llm_server import MockLLM
+from benchmarks.run_benchmark import compare
+
+
+def test_mock_llm_answers_agent_prompts(test_hatespeech_agent):
+    """
+    Test that the stand-in LLM returns batch classifications the agent can parse.
+    """
+    mock = MockLLM(latency_ms=0)
+    messages = test_hatespeech_agent._build_batch_messages(["hello", 'say "hi"\nthere'])
+    response = MagicMock()
+    response.choices = [MagicMock()]
+    response.choices[0].message.content = mock.chat_content("\n".join(m["content"] for m in messages))
+    parsed = test_hatespeech_agent._parse_batch_response(response, 2)
+    assert all(result is not None and result["success"] for result in parsed)
+
+def test_compare_flags_latency_and_throughput_regressions():
+    """
+    Test that results slower than baseline beyond the tolerance are reported.
+    """
+    baseline = {"analyze": {"throughput_rps": 10.0,
+                            "latency": {"p50_ms": 100.0, "p95_ms": 200.0, "p99_ms": 300.0},
+                            "stages": {"reasoning": {"p50_ms": 50.0, "p95_ms": 80.0, "p99_ms": 90.0}}}}
+    results = {"analyze": {"throughput_rps": 7.0,
+                           "latency": {"p50_ms": 105.0, "p95_ms": 260.0, "p99_ms": 300.0},
+                           "stages": {"reasoning": {"p50_ms": 70.0, "p95_ms": 80.0, "p99_ms": 90.0}}}}
+    regressions = compare(results, baseline, tolerance=0.15)
+    assert len(regressions) == 3
+    assert any("latency p95_ms" in line for line in regressions)
+    assert any("stage reasoning p50_ms" in line for line in regressions)
+    assert any("throughput_rps" in line for line in regressions)
@@ -0,0 +1,36 @@
+import pytest
+from backend.utils.bm25_index import BM25Index, reciprocal_rank_fusion, tokenize
+
+
+def test_bm25_ranks_exact_term_matches():
+    """
+    Test that BM25 ranks chunks containing rare query terms (e.g. section numbers) first
+    and never returns chunks without any query term.
+    """
+    index = BM25Index()
+    index.build([
+        {"content": "Section 153A punishes promoting enmity between groups", "source": "IPC", "chunk_id": 0},
+        {"content": "Section 295A covers insults to religious beliefs", "source": "IPC", "chunk_id": 1},
+        {"content": "Users must not post spam", "source": "Community", "chunk_id": 0},
+    ])
+    assert tokenize("Section 153A of the IPC") == ["section", "153a", "ipc"]
+    results = index.search("is this a 153A offence under the section", limit=5)
+    assert [r["chunk_id"] for r in results] == [0, 1]
+    assert results[0]["text"].startswith("Section 153A")
+    assert results[0]["score"] > results[1]["score"]
+    assert index.search("weather forecast") == []
+    assert index.get_stats()["documents"] == 3
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    """
+    Test that documents found by several retrievers outrank documents found by one,
+    and that duplicates are merged by source and chunk id.
+    """
+    a = {"text": "A", "source": "s", "chunk_id": 1}
+    b = {"text": "B", "source": "s", "chunk_id": 2}
+    c = {"text": "C", "source": "s", "chunk_id": 3}
+    fused = reciprocal_rank_fusion([[a, b], [c, b]], k=60)
+    assert [doc["text"] for doc in fused] == ["B", "A", "C"]
+    assert fused[0]["rrf_score"] == pytest.approx(2 / 62, abs=1e-6)
+    assert [doc["rank"] for doc in fused] == [1, 2, 3]
@@ -0,0 +1,57 @@
+import pytest
+import asyncio
+from backend.utils.cache_utils import ClassificationCache
+
+
+def test_memory_tier_evicts_least_recently_used():
+    """
+    Test that the in-process tier is bounded and evicts the least recently used entry.
+    """
+    cache = ClassificationCache(max_entries=2, disk_path=None)
+    result = {"success": True, "label": "Neutral", "confidence": 0.9, "explanation": ""}
+    cache.set("a", result)
+    cache.set("b", result)
+    assert cache.get("a") is not None
+    cache.set("c", result)
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.stats()["evictions"] == 1
+
+def test_disk_tier_survives_new_instance(tmp_path):
+    """
+    Test that entries written to the SQLite tier are visible to a new cache instance,
+    and that failed results and expired entries are not served.
+    """
+    path = str(tmp_path / "classification.sqlite")
+    writer = ClassificationCache(disk_path=path)
+    writer.set("spam", {"success": True, "label": "Toxic", "confidence": 0.9, "explanation": ""})
+    writer.set("broken", {"success": False, "message": "Classification failed"})
+
+    reader = ClassificationCache(disk_path=path)
+    assert reader.get("spam")["label"] == "Toxic"
+    assert reader.get("broken") is None
+    assert reader.stats()["disk_hits"] == 1
+
+    expired = ClassificationCache(disk_path=path, ttl_seconds=-1)
+    expired.set("old", {"success": True, "label": "Neutral", "confidence": 0.9, "explanation": ""})
+    assert ClassificationCache(disk_path=path).get("old") is None
+
+def test_disk_reads_buffer_access_times_and_aget_uses_disk_tier(tmp_path):
+    """
+    Test that disk-tier hits do not write on every read, that buffered access times are
+    written by flush, and that aget finds entries written by another instance.
+    """
+    path = str(tmp_path / "classification.sqlite")
+    result = {"success": True, "label": "Toxic", "confidence": 0.9, "explanation": ""}
+    ClassificationCache(disk_path=path).set("spam", result)
+
+    reader = ClassificationCache(disk_path=path, access_flush_interval=3600)
+    written_at = reader._disk.execute("SELECT accessed_at FROM classification_cache").fetchone()[0]
+    assert asyncio.run(reader.aget("spam"))["label"] == "Toxic"
+    assert reader.stats()["disk_hits"] == 1
+    assert reader._disk.execute("SELECT accessed_at FROM classification_cache").fetchone()[0] == written_at
+
+    reader.flush()
+    assert reader._disk.execute("SELECT accessed_at FROM classification_cache").fetchone()[0] > written_at
+    assert asyncio.run(reader.aget("spam")) is not None
+    assert reader.stats()["memory_hits"] == 1
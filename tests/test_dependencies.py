@@ -0,0 +1,60 @@
+import pytest
+import asyncio
+import threading
+import httpx
+from unittest.mock import MagicMock, patch
+from backend.api import dependencies
+from backend.api.api_main import app
+from backend.api.dependencies import LazyResource
+
+
+def test_lazy_resource_builds_once_and_retries_after_failure():
+    """
+    Test that a resource is built on first use only, and that a failed build is retried.
+    """
+    instance = object()
+    factory = MagicMock(side_effect=[ConnectionError("qdrant down"), instance])
+    resource = LazyResource("retriever_agent", factory)
+    assert resource.status == "not_loaded"
+    factory.assert_not_called()
+
+    with pytest.raises(ConnectionError):
+        resource.get()
+    assert resource.status == "failed"
+
+    assert resource.get() is instance
+    assert resource.get() is instance
+    assert resource.status == "ready"
+    assert factory.call_count == 2
+
+def test_health_answers_while_a_slow_build_is_in_progress():
+    """
+    Test that async callers wait for a slow build off the event loop, so /health still
+    answers (reporting "loading"), and that concurrent callers share one build.
+    """
+    release = threading.Event()
+    instance = object()
+
+    def slow_factory():
+        release.wait(5)
+        return instance
+
+    factory = MagicMock(side_effect=slow_factory)
+    resource = LazyResource("retriever_agent", factory)
+
+    async def run():
+        waiting = [asyncio.create_task(resource.aget()) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await asyncio.wait_for(client.get("/health"), timeout=2)
+        release.set()
+        return response, await asyncio.gather(*waiting)
+
+    with patch.dict(dependencies._resources, {"retriever_agent": resource}):
+        response, results = asyncio.run(run())
+
+    assert response.status_code == 200
+    assert response.json()["dependencies"]["retriever_agent"] == "loading"
+    assert all(result is instance for result in results)
+    assert factory.call_count == 1
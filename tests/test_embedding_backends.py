@@ -0,0 +1,41 @@
+import sys
+import pytest
+import numpy as np
+from unittest.mock import patch, MagicMock
+from backend.utils.embedding_backends import EmbeddingBackend, SentenceTransformerBackend, create_embedding_backend
+
+
+def test_sentence_transformer_backend_batches_and_reports_dimension():
+    """
+    Test that the local backend encodes in batches, normalizes, and reports the model dimension.
+    """
+    model = MagicMock()
+    model.get_sentence_embedding_dimension.return_value = 384
+    model.encode.return_value = np.zeros((2, 384), dtype=np.float32)
+    fake_module = MagicMock(SentenceTransformer=MagicMock(return_value=model))
+    with patch.dict(sys.modules, {"sentence_transformers": fake_module}):
+        backend = SentenceTransformerBackend(model_name="mini", batch_size=16, runtime="onnx")
+        vectors = backend.embed_documents(["a", "b"])
+        assert backend.dimension == 384
+        assert len(vectors) == 2 and len(vectors[0]) == 384
+        assert model.encode.call_args.kwargs["batch_size"] == 16
+        assert fake_module.SentenceTransformer.call_args.kwargs["backend"] == "onnx"
+        assert backend.name == "sentence-transformers:mini:onnx"
+
+def test_create_embedding_backend_rejects_unknown_name():
+    """
+    Test that an unknown backend name raises a ValueError.
+    """
+    with pytest.raises(ValueError):
+        create_embedding_backend("does-not-exist")
+
+def test_embedding_backend_requires_the_sync_methods():
+    """
+    Test that a backend missing embed_documents, embed_query or dimension cannot be created.
+    """
+    class QueryOnlyBackend(EmbeddingBackend):
+        def embed_query(self, query):
+            return [0.0]
+
+    with pytest.raises(TypeError):
+        QueryOnlyBackend()
@@ -0,0 +1,55 @@
+import pytest
+import numpy as np
+from unittest.mock import patch
+from backend.utils.embedding_cache import EmbeddingCache
+from backend.utils.embedding_utils import EmbeddingGenerator
+
+
+def test_cache_shared_between_instances_and_evicts(tmp_path):
+    """
+    Test that vectors written by one instance are read by another (as a second worker would)
+    and that the least recently used row is reused once the file is full.
+    """
+    writer = EmbeddingCache(path=str(tmp_path), capacity=2, eviction_policy="lru")
+    writer.put_many({"a": [1.0, 0.0, 0.0], "b": [0.0, 1.0, 0.0]})
+
+    reader = EmbeddingCache(path=str(tmp_path), capacity=2, eviction_policy="lru")
+    found = reader.get_many(["a", "b", "missing"])
+    assert found["a"].dtype == np.float32
+    np.testing.assert_array_equal(found["b"], [0.0, 1.0, 0.0])
+
+    reader.get("a")
+    reader.put("c", [0.0, 0.0, 1.0])
+    assert reader.get("b") is None
+    assert reader.get("a") is not None and reader.get("c") is not None
+    assert reader.stats()["evictions"] == 1
+
+def test_embedding_generator_skips_cached_texts(tmp_path):
+    """
+    Test that embed_documents only sends texts missing from the cache to the embedding service.
+    """
+    generator = EmbeddingGenerator()
+    generator.cache = EmbeddingCache(path=str(tmp_path), capacity=10)
+    with patch.object(generator.backend, "embed_documents", side_effect=lambda texts: [[float(len(t)), 1.0] for t in texts]) as mock_embed:
+        first = generator.embed_documents(["one", "three"])
+        second = generator.embed_documents(["three", "seven", "one"])
+        assert mock_embed.call_args_list[1].args[0] == ["seven"]
+        assert second[0] == first[1]
+        assert second[1] == [5.0, 1.0]
+
+def test_reads_are_buffered_and_applied_before_eviction(tmp_path):
+    """
+    Test that LRU read times are not written on every hit, and that the next write
+    applies them before choosing a row to evict.
+    """
+    cache = EmbeddingCache(path=str(tmp_path), capacity=2, eviction_policy="lru", touch_interval=3600)
+    cache.put_many({"a": [1.0, 0.0], "b": [0.0, 1.0]})
+    with patch.object(cache, "_flush_touches", wraps=cache._flush_touches) as mock_flush:
+        cache.get("a")
+        cache.get("a")
+        mock_flush.assert_not_called()
+    assert "a" in cache._pending_touches
+
+    cache.put("c", [1.0, 1.0])
+    assert not cache._pending_touches
+    assert cache.get("b") is None and cache.get("a") is not None
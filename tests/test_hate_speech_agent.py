@@ -1,5 +1,7 @@
 import pytest
-from unittest.mock import patch, MagicMock
+import asyncio
+from unittest.mock import patch, MagicMock, AsyncMock
+from backend.utils.cache_utils import ClassificationCache
 # from .conftest import test_hatespeech_agent as agent  # Import the agent fixture from conftest.py
 
 
@@ -38,4 +40,116 @@ def test_classify_text_invalid_json(test_hatespeech_agent):
     with patch.object(test_hatespeech_agent.client.chat.completions, 'create', return_value=mock_response):
         result = test_hatespeech_agent.classify_text("Some text")
         assert result["success"] is False
-        assert "Invalid JSON" in result["message"]
\ No newline at end of file
+        assert "Invalid JSON" in result["message"]
+
+def test_aclassify_text_success(test_hatespeech_agent):
+    """
+    Test that aclassify_text awaits the async client and parses the JSON response.
+    """
+    mock_response = MagicMock()
+    mock_response.choices = [MagicMock()]
+    mock_response.choices[0].message.content = '```json\n{"label": "Toxic", "confidence": 0.85, "explanation": "Abusive."}\n```'
+    with patch.object(test_hatespeech_agent.async_client.chat.completions, 'create', new=AsyncMock(return_value=mock_response)):
+        result = asyncio.run(test_hatespeech_agent.aclassify_text("Some abusive text"))
+        assert result["success"] is True
+        assert result["label"] == "Toxic"
+
+
+def test_classify_batch_falls_back_for_malformed_items(test_hatespeech_agent):
+    """
+    Test that classify_batch parses a packed JSON array and retries malformed items singly.
+    """
+    batch_response = MagicMock()
+    batch_response.choices = [MagicMock()]
+    batch_response.choices[0].message.content = (
+        '```json\n[{"id": 0, "label": "Neutral", "confidence": 0.97, "explanation": "Benign."},'
+        ' {"id": 1, "label": "Unknown", "confidence": "high"}]\n```'
+    )
+    single_response = MagicMock()
+    single_response.choices = [MagicMock()]
+    single_response.choices[0].message.content = '{"label": "Offensive", "confidence": 0.8, "explanation": "Rude."}'
+    with patch.object(test_hatespeech_agent.client.chat.completions, 'create', side_effect=[batch_response, single_response]) as mock_create:
+        results = test_hatespeech_agent.classify_batch(["hello there", "you fool"])
+        assert mock_create.call_count == 2
+        assert results[0]["label"] == "Neutral"
+        assert results[1]["label"] == "Offensive"
+
+
+def test_classify_text_served_from_cache(test_hatespeech_agent):
+    """
+    Test that a repeated text (after whitespace normalization) is answered from the cache.
+    """
+    mock_response = MagicMock()
+    mock_response.choices = [MagicMock()]
+    mock_response.choices[0].message.content = '{"label": "Neutral", "confidence": 0.98, "explanation": "Benign."}'
+    with patch.object(test_hatespeech_agent.client.chat.completions, 'create', return_value=mock_response) as mock_create:
+        first = test_hatespeech_agent.classify_text("Have a nice day")
+        second = test_hatespeech_agent.classify_text("  Have a   nice day ")
+        assert mock_create.call_count == 1
+        assert second == first
+        assert test_hatespeech_agent.cache.stats()["hits"] == 1
+
+def test_classify_and_expand_returns_keywords(test_hatespeech_agent):
+    """
+    Test that the fused call returns the classification together with retrieval keywords.
+    """
+    mock_response = MagicMock()
+    mock_response.choices = [MagicMock()]
+    mock_response.choices[0].message.content = (
+        '{"label": "Toxic", "confidence": 0.9, "explanation": "Abusive.", "keywords": ["harassment", "abuse"]}'
+    )
+    test_hatespeech_agent.cache = None
+    with patch.object(test_hatespeech_agent.client.chat.completions, 'create', return_value=mock_response) as mock_create:
+        result = test_hatespeech_agent.classify_and_expand("Some abusive text")
+        assert result["label"] == "Toxic"
+        assert result["keywords"] == ["harassment", "abuse"]
+        assert mock_create.call_args.kwargs["response_format"] == {"type": "json_object"}
+
+def test_classify_and_expand_ignores_cached_standard_result(test_hatespeech_agent):
+    """
+    Test that a classification cached by classify_text is not served to the fused call,
+    which needs keywords, and that the fused result is cached on its own.
+    """
+    standard_response = MagicMock()
+    standard_response.choices = [MagicMock()]
+    standard_response.choices[0].message.content = '{"label": "Toxic", "confidence": 0.9, "explanation": "Abusive."}'
+    fused_response = MagicMock()
+    fused_response.choices = [MagicMock()]
+    fused_response.choices[0].message.content = (
+        '{"label": "Toxic", "confidence": 0.9, "explanation": "Abusive.", "keywords": ["harassment"]}'
+    )
+    test_hatespeech_agent.cache = ClassificationCache(disk_path=None)
+    test_hatespeech_agent.prefilter = None
+    with patch.object(test_hatespeech_agent.client.chat.completions, 'create',
+                      side_effect=[standard_response, fused_response]) as mock_create:
+        test_hatespeech_agent.classify_text("Some abusive text")
+        fused = test_hatespeech_agent.classify_and_expand("Some abusive text")
+        cached = test_hatespeech_agent.classify_and_expand("Some abusive text")
+        assert mock_create.call_count == 2
+        assert fused["keywords"] == ["harassment"]
+        assert cached["keywords"] == ["harassment"]
+        assert "keywords" not in test_hatespeech_agent.classify_text("Some abusive text")
+
+def test_aclassify_batch_bounds_fused_fallbacks(test_hatespeech_agent):
+    """
+    Test that when a fused batch call fails, its texts are retried with classify-and-expand
+    calls, no more than max_concurrency at a time.
+    """
+    running, peak = 0, 0
+
+    async def fake_expand(text):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return {"success": True, "label": "Neutral", "confidence": 0.9, "explanation": "", "keywords": [text]}
+
+    test_hatespeech_agent.cache = None
+    test_hatespeech_agent.prefilter = None
+    texts = [f"text {i}" for i in range(6)]
+    with patch.object(test_hatespeech_agent.gateway, "achat_completion", new=AsyncMock(side_effect=TimeoutError("batch timed out"))), \
+         patch.object(test_hatespeech_agent, "aclassify_and_expand", new=AsyncMock(side_effect=fake_expand)):
+        results = asyncio.run(test_hatespeech_agent.aclassify_batch(texts, mode="fused", max_concurrency=2))
+    assert peak == 2
+    assert [result["keywords"] for result in results] == [[text] for text in texts]
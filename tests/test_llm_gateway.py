@@ -0,0 +1,72 @@
+import pytest
+import asyncio
+import httpx
+from unittest.mock import patch, MagicMock
+from openai import RateLimitError, BadRequestError
+from backend.config import Config
+from backend.utils.llm_gateway import get_llm_gateway
+from backend.utils.rate_limiter import get_rate_limiter
+
+
+def _api_error(error_class, status_code):
+    response = httpx.Response(status_code, request=httpx.Request("POST", "http://localhost/chat"))
+    return error_class("error", response=response, body=None)
+
+def test_gateway_is_shared_across_agents(test_hatespeech_agent, test_policy_agent):
+    """
+    Test that agents share one gateway and therefore one HTTP connection pool.
+    """
+    assert test_hatespeech_agent.gateway is test_policy_agent.gateway is get_llm_gateway()
+    assert test_hatespeech_agent.client is test_policy_agent.client
+
+def test_chat_completion_retries_only_429_and_5xx():
+    """
+    Test that a 429 is retried with backoff while a 400 is raised immediately.
+    """
+    gateway = get_llm_gateway()
+    response = MagicMock()
+    with patch.object(Config, "LLM_BACKOFF_MAX_SECONDS", 0), \
+         patch.object(gateway.client.chat.completions, "create", side_effect=[_api_error(RateLimitError, 429), response]) as mock_create:
+        assert gateway.chat_completion(messages=[]) is response
+        assert mock_create.call_count == 2
+
+    with patch.object(gateway.client.chat.completions, "create", side_effect=_api_error(BadRequestError, 400)) as mock_create:
+        with pytest.raises(BadRequestError):
+            gateway.chat_completion(messages=[])
+        assert mock_create.call_count == 1
+
+def test_cancelled_calls_give_back_their_concurrency_slot():
+    """
+    Test that cancelling achat_completion, or a stream that has not opened yet, while the
+    request is in flight frees the limiter slot.
+    """
+    gateway = get_llm_gateway()
+    limiter = get_rate_limiter(Config.DEPLOYMENT_NAME)
+    started = asyncio.Event()
+
+    async def hang(*args, **kwargs):
+        started.set()
+        await asyncio.sleep(60)
+
+    async def cancel(coroutine):
+        started.clear()
+        task = asyncio.ensure_future(coroutine)
+        await started.wait()
+        assert limiter.concurrency.in_flight >= 1
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    async def first_token():
+        async for token in gateway.astream_chat_completion(messages=[]):
+            return token
+
+    async def run():
+        for _ in range(3):
+            await cancel(gateway.achat_completion(messages=[]))
+        await cancel(first_token())
+
+    before = limiter.concurrency.in_flight
+    with patch.object(gateway.async_client.chat.completions, "create", side_effect=hang):
+        asyncio.run(run())
+    assert limiter.concurrency.in_flight == before == 0
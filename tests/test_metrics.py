@@ -0,0 +1,83 @@
+import pytest
+import asyncio
+import json
+from unittest.mock import MagicMock, patch
+from backend.utils import metrics
+from backend.utils.metrics import (
+    Counter,
+    Histogram,
+    LLM_TOKENS,
+    STAGE_SECONDS,
+    collect_request_timings,
+    render_metrics,
+    timed_stage,
+)
+from backend.utils.llm_gateway import get_llm_gateway
+
+
+def test_stage_timings_are_collected_per_request_and_exported():
+    """
+    Test that timed stages in concurrent tasks add up in the request timings and appear in /metrics output.
+    """
+    @timed_stage("test_search")
+    async def search():
+        await asyncio.sleep(0.01)
+
+    async def request():
+        with collect_request_timings() as timings:
+            await asyncio.gather(search(), search())
+        return timings
+
+    before = STAGE_SECONDS.count(stage="test_search")
+    timings = asyncio.run(request())
+    assert timings["test_search"] >= 20
+    assert timings["total"] >= 10
+    assert STAGE_SECONDS.count(stage="test_search") == before + 2
+    assert 'hate_speech_stage_duration_seconds_bucket{stage="test_search",le="+Inf"}' in render_metrics()
+
+def test_gateway_counts_tokens_for_current_stage():
+    """
+    Test that LLM token usage is attributed to the stage that made the call.
+    """
+    gateway = get_llm_gateway()
+    response = MagicMock()
+    response.usage.prompt_tokens = 120
+    response.usage.completion_tokens = 30
+    response.usage.total_tokens = 150
+    before = LLM_TOKENS.value(stage="test_reasoning", kind="prompt")
+
+    @timed_stage("test_reasoning")
+    def call():
+        return gateway.chat_completion(messages=[])
+
+    with patch.object(gateway.client.chat.completions, "create", return_value=response):
+        call()
+    assert LLM_TOKENS.value(stage="test_reasoning", kind="prompt") == before + 120
+    assert LLM_TOKENS.value(stage="test_reasoning", kind="completion") == 30
+
+def test_render_metrics_sums_snapshots_from_other_workers(tmp_path):
+    """
+    Test that with a shared snapshot directory /metrics reports the sum over all workers,
+    whichever worker answers the scrape.
+    """
+    counter = Counter("test_worker_requests_total", "Requests", labels=("route",))
+    histogram = Histogram("test_worker_seconds", "Latency", buckets=(0.1, 1.0))
+    counter.inc(2, route="/analyze")
+    histogram.observe(0.05)
+    other_worker = {counter.name: counter.snapshot(), histogram.name: histogram.snapshot()}
+    (tmp_path / "metrics_999_abcd1234.json").write_text(json.dumps(other_worker))
+    counter.inc(1, route="/analyze")
+    histogram.observe(0.5)
+
+    with patch.object(metrics, "REGISTRY", [counter, histogram]):
+        metrics.enable_multiprocess(str(tmp_path), interval=0)
+        try:
+            output = render_metrics()
+            assert len(list(tmp_path.glob("metrics_*.json"))) == 2
+        finally:
+            metrics._multiprocess_dir = metrics._snapshot_path = None
+
+    assert 'test_worker_requests_total{route="/analyze"} 5.0' in output
+    assert 'test_worker_seconds_bucket{le="0.1"} 2' in output
+    assert 'test_worker_seconds_bucket{le="+Inf"} 3' in output
+    assert "test_worker_seconds_count 3" in output
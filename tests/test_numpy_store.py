@@ -0,0 +1,77 @@
+import pytest
+import numpy as np
+from backend.utils.numpy_store import NumpyVectorStore
+
+
+def _point(point_id, vector, source):
+    return {
+        "id": point_id,
+        "vector": vector,
+        "payload": {
+            "content": f"policy {point_id}",
+            "source": source,
+            "chunk_id": point_id,
+            "content_hash": f"hash{point_id}",
+            "doc_id": source,
+        },
+    }
+
+def test_search_ranks_by_cosine_similarity(tmp_path):
+    """
+    Test that search returns the top-k documents ordered by cosine similarity,
+    and that search_batch answers several queries at once.
+    """
+    store = NumpyVectorStore(storage_path=str(tmp_path))
+    store.upsert_documents([
+        _point(1, [1.0, 0.0, 0.0], "a"),
+        _point(2, [0.7, 0.7, 0.0], "b"),
+        _point(3, [0.0, 0.0, 5.0], "c"),
+    ])
+    results = store.search([2.0, 0.1, 0.0], limit=2)
+    assert [r["chunk_id"] for r in results] == [1, 2]
+    assert results[0]["rank"] == 1 and results[0]["score"] > results[1]["score"]
+
+    batch = store.search_batch([[0.0, 0.0, 1.0], [0.0, 1.0, 0.0]], limit=1)
+    assert batch[0][0]["chunk_id"] == 3
+    assert batch[1][0]["chunk_id"] == 2
+
+    filtered = store.search_batch([[1.0, 0.0, 0.0], [1.0, 0.0, 0.0]], limit=1, filters=[{"source": "c"}, None])
+    assert [r[0]["chunk_id"] for r in filtered] == [3, 1]
+
+def test_save_and_memory_mapped_load(tmp_path):
+    """
+    Test that a saved index is memory-mapped on load and that upserts replace existing ids.
+    """
+    store = NumpyVectorStore(storage_path=str(tmp_path))
+    store.upsert_documents([_point(1, [1.0, 0.0], "a"), _point(2, [0.0, 1.0], "b")])
+    store.save()
+
+    reloaded = NumpyVectorStore(storage_path=str(tmp_path))
+    assert isinstance(reloaded._vectors, np.memmap)
+    assert len(list(reloaded.scroll_documents())) == 2
+
+    reloaded.upsert_documents([_point(1, [0.0, 1.0], "a")])
+    assert len(list(reloaded.scroll_documents())) == 2
+    assert {r["chunk_id"] for r in reloaded.search([0.0, 1.0], limit=2) if r["score"] > 99} == {1, 2}
+
+def test_running_store_picks_up_an_index_saved_by_another_process(tmp_path):
+    """
+    Test that a store remaps vectors.npy after another process saves a newer index,
+    but never discards its own unsaved changes.
+    """
+    ingest = NumpyVectorStore(storage_path=str(tmp_path))
+    ingest.upsert_documents([_point(1, [1.0, 0.0], "a")])
+    ingest.save()
+
+    worker = NumpyVectorStore(storage_path=str(tmp_path), refresh_seconds=0)
+    assert [r["chunk_id"] for r in worker.search([0.0, 1.0], limit=5)] == [1]
+
+    ingest.upsert_documents([_point(2, [0.0, 1.0], "b")])
+    ingest.save()
+    assert worker.search([0.0, 1.0], limit=1)[0]["chunk_id"] == 2
+    assert isinstance(worker._vectors, np.memmap)
+
+    worker.upsert_documents([_point(3, [1.0, 1.0], "c")])
+    ingest.upsert_documents([_point(4, [1.0, 0.0], "d")])
+    ingest.save()
+    assert {r["chunk_id"] for r in worker.search([1.0, 0.0], limit=5)} == {1, 2, 3}
@@ -0,0 +1,63 @@
+import pytest
+from unittest.mock import MagicMock
+from backend.utils.numpy_store import NumpyVectorStore
+from backend.utils.policy_ingestion import PolicyIngestor
+
+
+def _fake_embedder():
+    generator = MagicMock()
+    generator.dimension = 3
+    generator.embed_documents.side_effect = lambda texts: [[float(len(t)), 1.0, 0.5] for t in texts]
+    return generator
+
+def test_ingest_only_reembeds_changed_chunks(tmp_path):
+    """
+    Test that ingestion chunks files with the payload fields the stores expect,
+    skips unchanged files and chunks on refresh, and prunes points of deleted files.
+    """
+    policies = tmp_path / "policies"
+    policies.mkdir()
+    (policies / "alpha.txt").write_text("# Alpha Policy\n\nFirst paragraph.\n\nSecond paragraph.\n")
+    (policies / "beta.txt").write_text("Beta rule one.\n")
+    store = NumpyVectorStore(storage_path=str(tmp_path / "index"))
+    generator = _fake_embedder()
+    ingestor = PolicyIngestor(store=store, embedding_generator=generator, policy_path=str(policies), chunk_size=20)
+
+    first = ingestor.ingest()
+    assert first["chunks_embedded"] == first["chunks_total"] == 3
+    documents = list(store.scroll_documents())
+    assert {d["doc_id"] for d in documents} == {"alpha", "beta"}
+    assert {d["source"] for d in documents if d["doc_id"] == "alpha"} == {"Alpha Policy"}
+    assert {(d["category"], d["jurisdiction"]) for d in store.scroll_documents(payload_fields=["category", "jurisdiction"])} \
+        == {("platform", "global")}
+
+    second = ingestor.ingest()
+    assert second["files_skipped"] == 2 and second["chunks_embedded"] == 0
+
+    (policies / "alpha.txt").write_text("# Alpha Policy\n\nFirst paragraph.\n\nChanged paragraph.\n")
+    (policies / "beta.txt").unlink()
+    third = ingestor.ingest()
+    assert third["chunks_embedded"] == 1 and third["chunks_unchanged"] == 1
+    assert third["points_deleted"] == 1
+    assert {d["doc_id"] for d in store.scroll_documents()} == {"alpha"}
+
+
+def test_ingest_rewrites_payloads_when_metadata_changes(tmp_path):
+    """
+    Test that changing a document's category/jurisdiction re-ingests it even though
+    its text is unchanged, and that filtered search then sees the new subset.
+    """
+    policies = tmp_path / "policies"
+    policies.mkdir()
+    (policies / "code.txt").write_text("Section 153A prohibits promoting enmity.\n")
+    store = NumpyVectorStore(storage_path=str(tmp_path / "index"))
+    generator = _fake_embedder()
+    PolicyIngestor(store=store, embedding_generator=generator, policy_path=str(policies)).ingest()
+    assert store.search([1.0, 1.0, 0.5], filters={"category": "law"}) == []
+
+    metadata = {"code": {"category": "law", "jurisdiction": "IN"}}
+    stats = PolicyIngestor(store=store, embedding_generator=generator, policy_path=str(policies),
+                           doc_metadata=metadata).ingest()
+    assert stats["files_skipped"] == 0 and stats["chunks_embedded"] == 1
+    results = store.search([1.0, 1.0, 0.5], filters={"category": "law", "jurisdiction": ["IN", "global"]})
+    assert [r["text"] for r in results] == ["Section 153A prohibits promoting enmity."]
@@ -0,0 +1,41 @@
+import pytest
+from unittest.mock import patch
+from backend.agents.prefilter_agent import PreFilterAgent, train_prefilter
+
+
+@pytest.fixture
+def trained_prefilter(tmp_path):
+    """
+    Fixture to create a PreFilterAgent with a model trained on a tiny labelled set.
+    """
+    neutral = ["have a nice day", "the weather is lovely today", "thanks for the great recipe",
+               "see you at the meeting tomorrow", "what a beautiful photo"]
+    harmful = ["you people are vermin", "those people should leave our country",
+               "people like you are worthless", "your kind is a disease"]
+    path = str(tmp_path / "prefilter.npy")
+    train_prefilter(neutral + harmful, [True] * len(neutral) + [False] * len(harmful), path,
+                    n_features=4096, epochs=30)
+    return PreFilterAgent(model_path=path, threshold=0.8)
+
+def test_prefilter_short_circuits_only_confident_neutral(trained_prefilter):
+    """
+    Test that benign text is answered as Neutral while lexicon hits and uncertain texts go to the LLM.
+    """
+    result = trained_prefilter.check("Have a lovely day at the meeting")
+    assert result["label"] == "Neutral" and result["source"] == "prefilter"
+    assert trained_prefilter.check("I will KILL them all") is None
+    assert trained_prefilter.check("those people are a disease") is None
+
+    stats = trained_prefilter.stats()
+    assert stats["checked"] == 3 and stats["short_circuited"] == 1 and stats["lexicon_hits"] == 1
+
+def test_classify_text_skips_llm_for_prefiltered_text(test_hatespeech_agent, trained_prefilter):
+    """
+    Test that classify_text does not call the LLM when the pre-filter answers.
+    """
+    test_hatespeech_agent.cache = None
+    test_hatespeech_agent.prefilter = trained_prefilter
+    with patch.object(test_hatespeech_agent.client.chat.completions, "create") as mock_create:
+        result = test_hatespeech_agent.classify_text("what a beautiful day")
+        assert result["label"] == "Neutral"
+        mock_create.assert_not_called()
@@ -0,0 +1,106 @@
+import json
+import pytest
+from unittest.mock import patch, MagicMock
+from backend.utils.qdrant_store import QdrantOpenAIStore
+
+
+def _point(point_id):
+    point = MagicMock()
+    point.id = point_id
+    point.payload = {"content": f"c{point_id}", "source": "s", "chunk_id": point_id, "content_hash": "h", "doc_id": "d"}
+    return point
+
+def test_scroll_documents_follows_next_page_offset(tmp_path):
+    """
+    Test that scroll_documents pages through the collection via next_page_offset
+    and that export_documents writes every page to JSONL.
+    """
+    store = QdrantOpenAIStore(storage_path=str(tmp_path))
+    pages = [([_point(1), _point(2)], 3), ([_point(3)], None)]
+    with patch.object(store.qdrant_client, "scroll", side_effect=pages) as mock_scroll:
+        count = store.export_documents(str(tmp_path / "export.jsonl"), page_size=2)
+        assert count == 3
+        assert mock_scroll.call_args_list[1].kwargs["offset"] == 3
+    lines = (tmp_path / "export.jsonl").read_text().splitlines()
+    assert [json.loads(line)["qdrant_id"] for line in lines] == [1, 2, 3]
+
+    with patch.object(store.qdrant_client, "scroll", return_value=([_point(1)], None)) as mock_scroll:
+        documents = list(store.scroll_documents(payload_fields=["doc_id"]))
+        assert documents == [{"doc_id": "d", "qdrant_id": 1}]
+        assert mock_scroll.call_args.kwargs["with_payload"] == ["doc_id"]
+
+
+def test_filtered_search_and_payload_indexes(tmp_path):
+    """
+    Test that ensure_payload_indexes indexes the configured fields once and that
+    search only returns points matching the payload filters.
+    """
+    from qdrant_client.models import PointStruct
+    store = QdrantOpenAIStore(storage_path=str(tmp_path), collection_name="filter_test")
+    store._ensure_collection_exists(2)
+    store.upsert_documents([
+        PointStruct(id=i, vector=vector, payload={"content": f"c{i}", "source": "s", "chunk_id": i,
+                                                   "content_hash": f"h{i}", "category": category,
+                                                   "jurisdiction": jurisdiction})
+        for i, (vector, category, jurisdiction) in enumerate([
+            ([1.0, 0.0], "law", "IN"), ([0.9, 0.1], "platform", "global"), ([0.8, 0.2], "law", "US"),
+        ])
+    ])
+    with patch.object(store.qdrant_client, "create_payload_index", wraps=store.qdrant_client.create_payload_index) as create:
+        store.ensure_payload_indexes(["category", "jurisdiction"])
+        assert {c.kwargs["field_name"] for c in create.call_args_list} == {"category", "jurisdiction"}
+
+    assert [r["chunk_id"] for r in store.search([1.0, 0.0], limit=3)] == [0, 1, 2]
+    assert [r["chunk_id"] for r in store.search([1.0, 0.0], limit=3, filters={"category": "platform"})] == [1]
+    filtered = store.search([1.0, 0.0], limit=3, filters={"category": ["law"], "jurisdiction": ["US", "global"]})
+    assert [r["chunk_id"] for r in filtered] == [2]
+
+
+def test_search_batch_sends_one_request_with_per_query_filters(tmp_path):
+    """
+    Test that search_batch answers several queries with one query_batch_points call,
+    applying each query's own filter.
+    """
+    from qdrant_client.models import PointStruct
+    store = QdrantOpenAIStore(storage_path=str(tmp_path), collection_name="batch_test")
+    store._ensure_collection_exists(2)
+    store.upsert_documents([
+        PointStruct(id=1, vector=[1.0, 0.0], payload={"content": "c1", "source": "s", "chunk_id": 1, "category": "law"}),
+        PointStruct(id=2, vector=[0.0, 1.0], payload={"content": "c2", "source": "s", "chunk_id": 2, "category": "platform"}),
+    ])
+    with patch.object(store.qdrant_client, "query_batch_points", wraps=store.qdrant_client.query_batch_points) as batch:
+        results = store.search_batch([[1.0, 0.0], [1.0, 0.0]], limit=1, filters=[None, {"category": "platform"}])
+        assert batch.call_count == 1
+    assert [r[0]["chunk_id"] for r in results] == [1, 2]
+    assert store.search_batch([]) == []
+
+
+def test_optimize_index_applies_only_changed_settings(tmp_path):
+    """
+    Test that optimize_index sends HNSW and quantization updates only when the collection
+    differs from Config, and that quantized searches request rescoring.
+    """
+    from qdrant_client.models import HnswConfig, ScalarQuantization
+    store = QdrantOpenAIStore(storage_path=str(tmp_path), collection_name="optimize_test")
+    info = MagicMock(points_count=10)
+    info.config.hnsw_config = HnswConfig(m=16, ef_construct=100, full_scan_threshold=10000)
+    info.config.quantization_config = None
+    info.config.params.vectors.on_disk = False
+    with patch.object(store.qdrant_client, "get_collection", return_value=info), \
+         patch.object(store.qdrant_client, "update_collection") as update, \
+         patch.multiple("backend.utils.qdrant_store.Config", QDRANT_HNSW_M=16, QDRANT_HNSW_EF_CONSTRUCT=100,
+                        QDRANT_QUANTIZATION="none", QDRANT_VECTORS_ON_DISK=False, QDRANT_SEARCH_EF=0):
+        assert store.optimize_index()["updated"] == []
+        update.assert_not_called()
+        assert store._search_params() is None
+
+    with patch.object(store.qdrant_client, "get_collection", return_value=info), \
+         patch.object(store.qdrant_client, "update_collection") as update, \
+         patch.multiple("backend.utils.qdrant_store.Config", QDRANT_HNSW_M=32, QDRANT_HNSW_EF_CONSTRUCT=100,
+                        QDRANT_QUANTIZATION="scalar", QDRANT_VECTORS_ON_DISK=False, QDRANT_SEARCH_EF=128):
+        assert store.optimize_index()["updated"] == ["hnsw_config", "quantization_config"]
+        kwargs = update.call_args.kwargs
+        assert kwargs["hnsw_config"].m == 32
+        assert isinstance(kwargs["quantization_config"], ScalarQuantization)
+        params = store._search_params()
+        assert params.hnsw_ef == 128 and params.quantization.rescore is True
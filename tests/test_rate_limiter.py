@@ -0,0 +1,94 @@
+import pytest
+import asyncio
+from unittest.mock import patch
+from backend.config import Config
+from backend.utils.rate_limiter import (
+    AdaptiveConcurrencyLimiter,
+    DeploymentRateLimiter,
+    RateLimitExceeded,
+    TokenBucket,
+)
+
+
+def test_token_bucket_and_adaptive_concurrency():
+    """
+    Test that the bucket paces callers once drained and that a 429 halves the concurrency limit.
+    """
+    bucket = TokenBucket(rate_per_minute=60)
+    assert bucket.reserve(60) == 0.0
+    assert bucket.reserve(2) == pytest.approx(2.0, abs=0.1)
+
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=8, min_limit=1, max_limit=16, latency_target=5)
+    assert limiter.try_acquire()
+    limiter.release(latency=0.1, throttled=True)
+    assert limiter.limit == 4
+    assert limiter.try_acquire()
+    limiter.release(latency=0.1)
+    assert limiter.limit == pytest.approx(4.25)
+
+def test_deployment_limiter_fails_fast_when_queue_is_too_long():
+    """
+    Test that a call needing more than LLM_MAX_QUEUE_SECONDS of TPM capacity is rejected, not queued.
+    """
+    with patch.object(Config, "LLM_MAX_QUEUE_SECONDS", 1.0):
+        limiter = DeploymentRateLimiter("test-deployment", rpm=600, tpm=1000)
+    admitted_at = limiter.acquire(900)
+    limiter.release(admitted_at, estimated_tokens=900, actual_tokens=300)
+
+    with pytest.raises(RateLimitExceeded):
+        limiter.acquire(5000)
+    assert limiter.stats()["rejected"] == 1
+    assert limiter.stats()["in_flight"] == 0
+
+def test_waiters_are_admitted_in_arrival_order():
+    """
+    Test that queued callers get freed slots first come, first served, and that a caller
+    arriving while others wait cannot take a slot ahead of them.
+    """
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=1, min_limit=1, max_limit=1, latency_target=5)
+    order = []
+
+    async def waiter(name):
+        assert await limiter.aacquire(timeout=2)
+        order.append(name)
+        limiter.release(latency=0.01)
+
+    async def run():
+        assert limiter.try_acquire()
+        tasks = []
+        for name in ("first", "second", "third"):
+            tasks.append(asyncio.create_task(waiter(name)))
+            await asyncio.sleep(0)
+        assert not limiter.try_acquire()
+        limiter.release(latency=0.01)
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+    assert order == ["first", "second", "third"]
+    assert limiter.in_flight == 0
+
+def test_reservation_is_refunded_when_no_slot_frees_up_in_time():
+    """
+    Test that a caller rejected at the queueing deadline, or cancelled while queued,
+    gives back its RPM/TPM reservation and its place in line.
+    """
+    with patch.object(Config, "LLM_MAX_QUEUE_SECONDS", 0.05):
+        limiter = DeploymentRateLimiter("test-deployment", rpm=600, tpm=1000)
+    while limiter.concurrency.try_acquire():
+        pass
+
+    with pytest.raises(RateLimitExceeded):
+        limiter.acquire(400)
+    assert limiter.tokens.tokens == pytest.approx(1000, abs=1)
+    assert limiter.requests.tokens == pytest.approx(600, abs=1)
+
+    async def cancelled():
+        task = asyncio.create_task(limiter.aacquire(400))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancelled())
+    assert limiter.tokens.tokens == pytest.approx(1000, abs=1)
+    assert not limiter.concurrency._waiters
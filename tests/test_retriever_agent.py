@@ -1,5 +1,6 @@
 import pytest
-from unittest.mock import patch, MagicMock
+import asyncio
+from unittest.mock import patch, MagicMock, AsyncMock
 # from .conftest import test_retriever_agent as agent  # Import the agent fixture from conftest.py
 
 
@@ -9,7 +10,7 @@ def test_retrieve_policies_success(test_retriever_agent):
     when embedding and search methods are mocked.
     """
     with patch.object(test_retriever_agent.embedding_generator, 'embed_query', return_value=[0.1, 0.2]), \
-         patch.object(test_retriever_agent.Qdrant_store, 'search', return_value=[{"text": "Policy1"}, {"text": "Policy2"}]), \
+         patch.object(test_retriever_agent.Qdrant_store, 'search_batch', return_value=[[{"text": "Policy1"}, {"text": "Policy2"}]]), \
          patch.object(test_retriever_agent, '_expand_query', return_value="expanded query"):
         result = test_retriever_agent.retrieve_policies("test", "Hate")
         assert result["success"] is True
@@ -30,4 +31,151 @@ def test_deduplicate_results(test_retriever_agent):
     """
     results = [{"text": "abc"}, {"text": "abc"}, {"text": "def"}]
     unique = test_retriever_agent._deduplicate_results(results)
-    assert len(unique) == 2
\ No newline at end of file
+    assert len(unique) == 2
+
+def test_aretrieve_policies_success(test_retriever_agent):
+    """
+    Test that aretrieve_policies awaits the async embedding and search methods.
+    """
+    with patch.object(test_retriever_agent.embedding_generator, 'aembed_query', new=AsyncMock(return_value=[0.1, 0.2])), \
+         patch.object(test_retriever_agent.Qdrant_store, 'asearch_batch', new=AsyncMock(return_value=[[{"text": "Policy1"}, {"text": "Policy2"}]])), \
+         patch.object(test_retriever_agent, '_aexpand_query', new=AsyncMock(return_value="expanded query")):
+        result = asyncio.run(test_retriever_agent.aretrieve_policies("test", "Hate"))
+        assert result["success"] is True
+        assert result["total_found"] == 2
+
+
+def test_retrieve_policies_reports_branch_timings(test_retriever_agent):
+    """
+    Test that retrieve_policies sends the raw and expanded query vectors in one batched
+    search and reports per-branch timings.
+    """
+    with patch.object(test_retriever_agent.embedding_generator, 'embed_query', return_value=[0.1, 0.2]), \
+         patch.object(test_retriever_agent.Qdrant_store, 'search_batch',
+                      return_value=[[{"text": "Policy1"}], [{"text": "Policy2"}]]) as search_batch:
+        result = test_retriever_agent.retrieve_policies("test", "Hate", expanded_query="expanded query")
+        search_batch.assert_called_once()
+        assert len(search_batch.call_args.args[0]) == 2
+        assert result["success"] is True
+        assert result["total_found"] == 2
+        assert set(result["timings"]) == {
+            "vector_branch_ms", "lexical_branch_ms", "expansion_branch_ms", "search_ms", "total_ms", "saved_ms"
+        }
+
+
+def test_concurrent_async_searches_share_one_request(test_retriever_agent):
+    """
+    Test that concurrent aretrieve_policies calls are coalesced into a single asearch_batch call.
+    """
+    from backend.utils.vector_stores import SearchCoalescer
+    async def fake_search_batch(embeddings, limit=7, with_vectors=False, filters=None):
+        return [[{"text": f"Policy{embedding[0]}"}] for embedding in embeddings]
+
+    async def run():
+        return await asyncio.gather(*(test_retriever_agent.aretrieve_policies(f"text {i}", "Hate") for i in range(3)))
+
+    embeddings = {f"text {i}": [float(i), 1.0] for i in range(3)}
+    with patch.object(test_retriever_agent.embedding_generator, 'aembed_query',
+                      new=AsyncMock(side_effect=lambda text: embeddings[text])), \
+         patch.object(test_retriever_agent.Qdrant_store, 'asearch_batch',
+                      new=AsyncMock(side_effect=fake_search_batch)) as search_batch, \
+         patch.object(test_retriever_agent, '_search_coalescer', SearchCoalescer(test_retriever_agent.Qdrant_store, window_ms=5)):
+        results = asyncio.run(run())
+        search_batch.assert_awaited_once()
+        assert [r["documents"][0]["text"] for r in results] == ["Policy0.0", "Policy1.0", "Policy2.0"]
+
+
+def test_retrieve_policies_fuses_keyword_matches(test_retriever_agent):
+    """
+    Test that BM25 keyword matches are fused with vector results and that the
+    LLM expansion is skipped when query expansion is disabled.
+    """
+    from backend.utils.bm25_index import BM25Index
+    index = BM25Index()
+    index.build([
+        {"content": "Section 153A IPC: promoting enmity between groups", "source": "IPC", "chunk_id": 0},
+        {"content": "Harassment and bullying policy", "source": "Community", "chunk_id": 0},
+    ])
+    vector_results = [{"text": "Harassment and bullying policy", "source": "Community", "chunk_id": 0, "score": 80.0}]
+    with patch.object(test_retriever_agent, '_lexical_index', return_value=index), \
+         patch.object(test_retriever_agent.embedding_generator, 'embed_query', return_value=[0.1, 0.2]), \
+         patch.object(test_retriever_agent.Qdrant_store, 'search_batch', return_value=[vector_results]), \
+         patch.object(test_retriever_agent, '_expand_query') as expand, \
+         patch("backend.agents.retriever_agent.Config.RETRIEVER_QUERY_EXPANSION", False):
+        result = test_retriever_agent.retrieve_policies("this breaks section 153a", "Hate")
+        expand.assert_not_called()
+        assert result["success"] is True
+        assert [doc["source"] for doc in result["documents"]] == ["Community", "IPC"]
+        assert all("rrf_score" in doc for doc in result["documents"])
+
+
+def test_deduplicate_results_keeps_best_copy_and_reranks(test_retriever_agent):
+    """
+    Test that duplicates are merged by content hash, keeping the best-scored copy,
+    and that the merged list is re-ranked by score.
+    """
+    results = [
+        {"text": "Policy A", "content_hash": "a", "score": 70.0},
+        {"text": "Policy B", "content_hash": "b", "score": 75.0},
+        {"text": "Policy A (other chunk)", "content_hash": "a", "score": 90.0},
+    ]
+    merged = test_retriever_agent._deduplicate_results(results)
+    assert [(r["text"], r["score"], r["rank"]) for r in merged] == [
+        ("Policy A (other chunk)", 90.0, 1), ("Policy B", 75.0, 2)
+    ]
+
+
+def test_diversify_prefers_dissimilar_results(test_retriever_agent):
+    """
+    Test that MMR moves a near-duplicate of the top result below a less relevant but different one.
+    """
+    results = [
+        {"text": "A", "rrf_score": 0.030, "vector": [1.0, 0.0]},
+        {"text": "A'", "rrf_score": 0.029, "vector": [0.99, 0.05]},
+        {"text": "B", "rrf_score": 0.020, "vector": [0.0, 1.0]},
+    ]
+    diversified = test_retriever_agent._diversify(results, top_k=2, mmr_lambda=0.5)
+    assert [r["text"] for r in diversified] == ["A", "B", "A'"]
+    assert test_retriever_agent._diversify(results, top_k=2, mmr_lambda=1.0)[1]["text"] == "A'"
+
+
+def test_policy_filters_follow_label_and_jurisdictions(test_retriever_agent):
+    """
+    Test that labels map to policy subsets and that configured jurisdictions always include global policies.
+    """
+    with patch("backend.agents.retriever_agent.Config.RETRIEVER_JURISDICTIONS", ["IN"]):
+        assert test_retriever_agent.policy_filters("Offensive") == {
+            "category": ["platform"], "jurisdiction": ["global", "IN"]
+        }
+    with patch("backend.agents.retriever_agent.Config.RETRIEVER_JURISDICTIONS", []):
+        assert test_retriever_agent.policy_filters("Hate") == {}
+
+
+def test_keyword_index_follows_store_content_and_failures_degrade_to_vector_results(test_retriever_agent):
+    """
+    Test that the BM25 index is rebuilt when the store's content changes (not a local
+    metadata file), and that a failing keyword branch leaves the vector results intact.
+    """
+    documents = [{"qdrant_id": "1", "content": "Section 153A IPC", "source": "IPC", "chunk_id": 0, "content_hash": "h1"}]
+
+    def scroll_documents(payload_fields=None, **kwargs):
+        return iter([dict(document) for document in documents])
+
+    vector_results = [{"text": "Harassment and bullying policy", "source": "Community", "chunk_id": 0, "score": 80.0}]
+    with patch.object(test_retriever_agent.Qdrant_store, 'scroll_documents', side_effect=scroll_documents), \
+         patch("backend.agents.retriever_agent.Config.BM25_REFRESH_SECONDS", 0):
+        first = test_retriever_agent._lexical_index()
+        assert test_retriever_agent._lexical_index() is first
+        documents[0] = {**documents[0], "content": "Section 295A IPC", "content_hash": "h2"}
+        second = test_retriever_agent._lexical_index()
+        assert second is not first
+        assert second.search("295a")[0]["text"] == "Section 295A IPC"
+
+    with patch.object(test_retriever_agent, '_lexical_index', side_effect=ConnectionError("qdrant down")), \
+         patch.object(test_retriever_agent, '_bm25_needs_refresh', return_value=True), \
+         patch.object(test_retriever_agent.embedding_generator, 'aembed_query', new=AsyncMock(return_value=[0.1, 0.2])), \
+         patch.object(test_retriever_agent.Qdrant_store, 'asearch_batch', new=AsyncMock(return_value=[vector_results])), \
+         patch("backend.agents.retriever_agent.Config.RETRIEVER_QUERY_EXPANSION", False):
+        result = asyncio.run(test_retriever_agent.aretrieve_policies("text", "Hate"))
+        assert result["success"] is True
+        assert [doc["source"] for doc in result["documents"]] == ["Community"]